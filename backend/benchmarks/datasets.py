@@ -0,0 +1,76 @@
+# synthetic Hebrew feedback exports in the shape of the real CSV (ID, ServiceName, Level, Text, CreationDate).
+# the same seed always writes the same file.
+import csv
+import random
+from datetime import datetime, timedelta
+from typing import Dict
+
+# ServiceName values are "<CamelCaseName>@<office>", the indexer translates the name part to Hebrew
+SERVICES: Dict[str, str] = {
+    "AddressChange": "שינוי כתובת",
+    "AppointmentForVisas": "זימון תור לוויזה",
+    "VisaRenewal": "חידוש ויזה",
+    "BiometricPassport": "דרכון ביומטרי",
+    "CannabisRequest": "בקשה לרישיון קנאביס רפואי",
+    "App4aBirthCertificate": "בקשה לתעודת לידה",
+    "ApprovedImporter": "יבואן מאושר",
+    "AgraPikuahAviri": "אגרת פיקוח אווירי",
+    "SubsidyRequest": "בקשת סובסידיה",
+    "DriverLicenseRenewal": "חידוש רישיון נהיגה",
+    "VehicleOwnershipTransfer": "העברת בעלות על רכב",
+    "IdCardReplacement": "הנפקת תעודת זהות חלופית",
+    "TaxRefund": "החזר מס",
+    "UnemploymentBenefits": "דמי אבטלה",
+    "BuildingPermit": "היתר בנייה",
+    "FishingLicense": "רישיון דיג",
+    "GunLicense": "רישיון לנשק",
+    "StudentGrant": "מענק סטודנטים",
+    "PensionInquiry": "בירור קצבת זקנה",
+    "MarriageRegistration": "רישום נישואין",
+}
+OFFICES = ["MOIN", "MOT", "MOF", "MOH", "MOAG"]
+
+OPENINGS = ["", "שלום, ", "רציתי לציין ש", "בקצרה: ", "לגבי השירות, "]
+POSITIVE = [
+    "השירות היה מהיר ויעיל",
+    "קיבלתי מענה תוך דקות",
+    "הטופס היה ברור ונוח למילוי",
+    "הנציגה הייתה אדיבה מאוד",
+    "התהליך עבר בלי תקלות",
+]
+NEGATIVE = [
+    "זמן ההמתנה למענה היה ארוך מאוד",
+    "האתר נתקע באמצע מילוי הטופס",
+    "קיבלתי הודעת שגיאה 404 כשניסיתי להעלות קבצים",
+    "לא הצלחתי להתחבר לאזור האישי",
+    "ההנחיות לא היו ברורות ונאלצתי להתקשר",
+    "הקבצים שהעליתי נמחקו ונאלצתי להעלות מחדש",
+    "התשלום נכשל פעמיים",
+]
+CLOSINGS = ["", " תודה.", " ממליץ לשפר.", " מאוכזב.", " בסך הכל בסדר."]
+
+
+def feedback_text(rng: random.Random, level: int) -> str:
+    pool = POSITIVE if level >= 4 else NEGATIVE if level <= 2 else POSITIVE + NEGATIVE
+    parts = rng.sample(pool, k=rng.choice((1, 1, 2)))
+    return rng.choice(OPENINGS) + " ו".join(parts) + rng.choice(CLOSINGS)
+
+
+def write_feedback_csv(path: str, rows: int, seed: int = 7, services: int = len(SERVICES)) -> str:
+    rng = random.Random(seed)
+    names = list(SERVICES)[:max(1, services)]
+    start = datetime(2023, 1, 1)
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["ID", "ServiceName", "Level", "Text", "CreationDate"])
+        for i in range(rows):
+            level = rng.choices((1, 2, 3, 4, 5), weights=(2, 2, 2, 3, 4))[0]
+            created = start + timedelta(minutes=rng.randrange(2 * 365 * 24 * 60))
+            writer.writerow([
+                i + 1,
+                f"{rng.choice(names)}@{rng.choice(OFFICES)}",
+                level,
+                feedback_text(rng, level),
+                created.strftime("%Y-%m-%d %H:%M:%S"),
+            ])
+    return path
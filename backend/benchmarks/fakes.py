@@ -0,0 +1,180 @@
+# offline stand-ins for the NVIDIA endpoints, used by the tests and the benchmark suite.
+#
+# FakeEmbeddingProvider: deterministic feature-hashing vectors (texts that share words get similar
+# vectors, so semantic search still returns sensible rows), registered with register_provider.
+# FakeChatClient / FakeAsyncChatClient: OpenAI-shaped chat clients that answer the planner, schema,
+# analyst and translation prompts of this repo with fixed JSON, after a configurable latency.
+import re
+import json
+import time
+import asyncio
+import hashlib
+from types import SimpleNamespace
+from typing import Dict, List, Optional
+import numpy as np
+from utils.embedding_providers import EmbeddingProvider
+
+WORD = re.compile(r"\w+")
+
+
+class FakeEmbeddingProvider(EmbeddingProvider):
+    name = "fake"
+
+    def __init__(self, dimension: int = 128, latency_ms: float = 0.0, per_text_ms: float = 0.0):
+        self.model = f"fake-hash-{dimension}"
+        self._dimension = dimension
+        self.latency_ms = latency_ms
+        self.per_text_ms = per_text_ms
+
+    @property
+    def dimension(self) -> int:
+        return self._dimension
+
+    def _vector(self, text: str) -> List[float]:
+        vec = np.zeros(self._dimension, dtype=np.float32)
+        for word in WORD.findall(str(text).lower()):
+            digest = hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest()
+            bucket = int.from_bytes(digest[:4], "little") % self._dimension
+            vec[bucket] += 1.0 if digest[4] & 1 else -1.0
+        norm = np.linalg.norm(vec)
+        if not norm:
+            vec[0] = 1.0
+            norm = 1.0
+        return (vec / norm).tolist()
+
+    def _delay(self, count: int) -> float:
+        return (self.latency_ms + self.per_text_ms * count) / 1000
+
+    def embed(self, texts: List[str], input_type: str = "query") -> List[List[float]]:
+        time.sleep(self._delay(len(texts)))
+        return [self._vector(t) for t in texts]
+
+    async def aembed(self, texts: List[str], input_type: str = "query") -> List[List[float]]:
+        await asyncio.sleep(self._delay(len(texts)))
+        return [self._vector(t) for t in texts]
+
+
+# ---------------- chat ---------------- #
+
+DEFAULT_SCHEMA = {
+    "summary": "string",
+    "main_issues": [{"title": "string", "description": "string", "count": "number"}],
+}
+
+
+class FakeLLM:
+
+    def __init__(self, plans: Optional[Dict[str, dict]] = None, translations: Optional[Dict[str, str]] = None,
+                 latency_ms: float = 0.0, per_token_ms: float = 0.0):
+        self.plans = plans or {}
+        self.translations = translations or {}
+        self.latency_ms = latency_ms
+        self.per_token_ms = per_token_ms
+        self.calls = 0
+
+    # a plan for questions the suite did not map: filter, then a semantic answer
+    @staticmethod
+    def default_plan(question: str) -> dict:
+        return {"steps": [
+            {"fn": "fetch_all_feedbacks"},
+            {"fn": "filter_by_level", "args": {"operator": "lt", "value": 3}},
+            {"fn": "get_texts"},
+            {"fn": "semantic_dynamic", "args": {"prompt": question}},
+            {"fn": "render_text"},
+        ]}
+
+    def answer(self, messages: List[Dict[str, str]]) -> str:
+        self.calls += 1
+        system = next((m["content"] for m in messages if m["role"] == "system"), "")
+        user = next((m["content"] for m in reversed(messages) if m["role"] == "user"), "")
+
+        if "DSL Planning Engine" in system:
+            return json.dumps(self.plans.get(user.strip()) or self.default_plan(user.strip()), ensure_ascii=False)
+        if "Schema Planning LLM" in system:
+            return json.dumps(DEFAULT_SCHEMA, ensure_ascii=False)
+        if "analytics engine" in system:
+            lines = [line for line in user.splitlines() if line.strip()]
+            return json.dumps({
+                "summary": "המשתמשים מתלוננים בעיקר על זמני המתנה ועל תקלות באתר",
+                "main_issues": [
+                    {"title": "זמני המתנה", "description": "המתנה ארוכה למענה", "count": len(lines) // 2},
+                    {"title": "תקלות באתר", "description": "שגיאות בזמן מילוי הטופס", "count": len(lines) // 3},
+                ],
+            }, ensure_ascii=False)
+        if "translate the following service name" in user:
+            name = user.strip().splitlines()[-1].strip()
+            return self.translations.get(name, f"שירות {name}")
+        return "{}"
+
+    def _delay(self, content: str) -> float:
+        return (self.latency_ms + self.per_token_ms * max(len(content) // 4, 1)) / 1000
+
+    @staticmethod
+    def _completion(messages, content: str):
+        prompt_tokens = sum(len(m["content"]) for m in messages) // 4
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=content))],
+            usage=SimpleNamespace(prompt_tokens=prompt_tokens, completion_tokens=max(len(content) // 4, 1)),
+        )
+
+
+class _Completions:
+
+    def __init__(self, llm: FakeLLM):
+        self._llm = llm
+
+    def create(self, model=None, messages=None, temperature=None, max_tokens=None, stream=False, **kwargs):
+        content = self._llm.answer(messages)
+        time.sleep(self._llm._delay(content))
+        return self._llm._completion(messages, content)
+
+
+class _AsyncCompletions:
+
+    def __init__(self, llm: FakeLLM):
+        self._llm = llm
+
+    async def create(self, model=None, messages=None, temperature=None, max_tokens=None, stream=False, **kwargs):
+        content = self._llm.answer(messages)
+        delay = self._llm._delay(content)
+        if not stream:
+            await asyncio.sleep(delay)
+            return self._llm._completion(messages, content)
+        return self._stream(content, delay)
+
+    @staticmethod
+    async def _stream(content: str, delay: float, piece: int = 16):
+        pieces = [content[i:i + piece] for i in range(0, len(content), piece)] or [""]
+        for text in pieces:
+            await asyncio.sleep(delay / len(pieces))
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text))])
+
+
+class FakeChatClient:
+
+    def __init__(self, llm: FakeLLM):
+        self.chat = SimpleNamespace(completions=_Completions(llm))
+
+    def close(self):
+        pass
+
+
+class FakeAsyncChatClient:
+
+    def __init__(self, llm: FakeLLM):
+        self.chat = SimpleNamespace(completions=_AsyncCompletions(llm))
+
+    async def close(self):
+        pass
+
+
+# route every embedding and LLM call of this process to the fakes
+def install_fakes(llm: FakeLLM, dimension: int = 128, embed_latency_ms: float = 0.0, embed_per_text_ms: float = 0.0):
+    from utils import llm_utils
+    from utils.embedding_providers import register_provider, PROVIDER_FOR_USE
+
+    register_provider(FakeEmbeddingProvider.name, lambda: FakeEmbeddingProvider(dimension, embed_latency_ms, embed_per_text_ms))
+    for use in PROVIDER_FOR_USE:
+        PROVIDER_FOR_USE[use] = FakeEmbeddingProvider.name
+    llm_utils.client = FakeChatClient(llm)
+    llm_utils.async_client = FakeAsyncChatClient(llm)
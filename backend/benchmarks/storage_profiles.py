@@ -0,0 +1,147 @@
+# recall / latency comparison of the vector storage profiles (utils/storage_profiles.py)
+#
+# copies a sample of the feedback collection into one collection per profile, runs the search
+# that filter_by_text_semantic (text_vector, top 1500) makes, and compares it with an exact
+# (brute force) search. service names are resolved in memory by utils/service_index.py, not by a
+# Qdrant search, so the storage profile does not change their latency.
+#
+# usage, from the backend directory:
+#   python -m benchmarks.storage_profiles --points 20000 --queries 50
+import argparse
+import json
+import os
+import random
+import statistics
+import time
+from typing import Dict, List
+from qdrant_client.models import PointStruct, SearchParams
+from utils.config import QDRANT_COLLECTION
+from utils.embedding_utils import get_embedding
+from utils.qdrant_utils import qdrant, search_points
+from utils.storage_profiles import STORAGE_PROFILES, vectors_config, collection_config, vector_ram_bytes
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+# (vector name, top_k) as used by the DSL functions
+SEARCHES = {
+    "filter_by_text_semantic": ("text_vector", 1500),
+}
+
+
+def load_sample(limit: int) -> List[PointStruct]:
+    points, offset = [], None
+    while len(points) < limit:
+        page, offset = qdrant.scroll(
+            collection_name=QDRANT_COLLECTION,
+            limit=min(1000, limit - len(points)),
+            offset=offset,
+            with_payload=True,
+            with_vectors=True,
+        )
+        points.extend(PointStruct(id=p.id, vector=p.vector, payload=p.payload) for p in page)
+        if offset is None:
+            break
+    return points
+
+
+def build_collection(name: str, profile: str, points: List[PointStruct], size: Dict[str, int]):
+    qdrant.recreate_collection(collection_name=name, vectors_config=vectors_config(profile, size), **collection_config(profile))
+    qdrant.upload_points(collection_name=name, points=points, batch_size=256, wait=True)
+    # wait for the optimizer to finish building the HNSW graph / quantized vectors
+    while str(qdrant.get_collection(name).status).lower().endswith("yellow"):
+        time.sleep(1)
+
+
+def exact_ids(collection: str, vector_name: str, vector, top_k: int) -> List:
+    hits = qdrant.search(
+        collection_name=collection,
+        query_vector=(vector_name, vector),
+        limit=top_k,
+        with_payload=False,
+        search_params=SearchParams(exact=True),
+    )
+    return [h.id for h in hits]
+
+
+def percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * q), len(ordered) - 1)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--profiles", nargs="+", default=list(STORAGE_PROFILES))
+    parser.add_argument("--points", type=int, default=20000, help="how many points to copy from the collection")
+    parser.add_argument("--queries", type=int, default=50, help="queries per search type")
+    parser.add_argument("--keep", action="store_true", help="keep the benchmark collections")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    points = load_sample(args.points)
+    if not points:
+        raise SystemExit(f"collection '{QDRANT_COLLECTION}' is empty")
+    size = {name: len(vector) for name, vector in points[0].vector.items()}
+    print(f"loaded {len(points)} points ({size})")
+
+    # queries: feedback snippets
+    texts = [str(p.payload.get("text", ""))[:120] for p in random.sample(points, min(args.queries, len(points)))]
+    queries = {"filter_by_text_semantic": [t for t in texts if t.strip()]}
+    vectors = {kind: [get_embedding(q, input_type="query", use="text") for q in qs] for kind, qs in queries.items()}
+
+    baseline = f"{QDRANT_COLLECTION}__bench_exact"
+    build_collection(baseline, "default", points, size)
+    truth = {
+        kind: [exact_ids(baseline, SEARCHES[kind][0], v, SEARCHES[kind][1]) for v in vecs]
+        for kind, vecs in vectors.items()
+    }
+
+    report: Dict[str, Dict] = {}
+    for profile in args.profiles:
+        name = f"{QDRANT_COLLECTION}__bench_{profile}"
+        started = time.perf_counter()
+        build_collection(name, profile, points, size)
+        report[profile] = {
+            "build_seconds": round(time.perf_counter() - started, 1),
+            "vector_ram_bytes_per_point": vector_ram_bytes(profile, size),
+        }
+
+        for kind, vecs in vectors.items():
+            vector_name, top_k = SEARCHES[kind]
+            latencies, recalls = [], []
+            for vector, expected in zip(vecs, truth[kind]):
+                t0 = time.perf_counter()
+                hits = search_points(vector, vector_name=vector_name, top_k=top_k, collection_name=name, profile=profile)
+                latencies.append((time.perf_counter() - t0) * 1000)
+                if expected:
+                    recalls.append(len({h.id for h in hits} & set(expected)) / len(expected))
+            report[profile][kind] = {
+                "recall": round(statistics.mean(recalls), 4) if recalls else None,
+                "p50_ms": round(percentile(latencies, 0.5), 2),
+                "p95_ms": round(percentile(latencies, 0.95), 2),
+            }
+
+        if not args.keep:
+            qdrant.delete_collection(name)
+
+    if not args.keep:
+        qdrant.delete_collection(baseline)
+
+    print(f"\n{'profile':<10} {'search':<24} {'recall':>7} {'p50 ms':>8} {'p95 ms':>8} {'RAM/point':>10}")
+    for profile, r in report.items():
+        for kind in SEARCHES:
+            row = r[kind]
+            print(
+                f"{profile:<10} {kind:<24} {str(row['recall']):>7} {row['p50_ms']:>8} {row['p95_ms']:>8} "
+                f"{r['vector_ram_bytes_per_point']:>10}"
+            )
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    out = os.path.join(RESULTS_DIR, f"storage_profiles-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump({"points": len(points), "queries": {k: len(v) for k, v in queries.items()}, "profiles": report}, f, indent=2)
+    print(f"\nsaved {out}")
+
+
+if __name__ == "__main__":
+    main()
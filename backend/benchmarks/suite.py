@@ -0,0 +1,404 @@
+# offline benchmark suite: ingest rows/sec, latency of every DSL function, /query p50/p99 and peak memory
+#
+# nothing leaves the machine: Qdrant runs in-process (QDRANT_PATH=:memory:), embeddings and LLM answers
+# come from the deterministic fakes in benchmarks/fakes.py (with configurable latency), and the data is a
+# synthetic Hebrew export from benchmarks/datasets.py. every dataset size runs in its own process, so its
+# peak memory is not mixed with the other sizes. results are saved in benchmarks/results/ and compared
+# with the previous run made with the same settings (or --baseline) to show regressions. p99 is only
+# reported for at least MIN_P99_SAMPLES samples, smaller runs report max_ms instead.
+#
+# usage, from the backend directory:
+#   python -m benchmarks.suite --sizes 1000 10000 100000
+#   python -m benchmarks.suite --sizes 1000000 --repeats 3 --query-samples 100 --llm-latency-ms 800 --embed-latency-ms 40
+import argparse
+import glob
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+# questions answered by the deterministic fast path
+FAST_PATH_QUESTIONS = [
+    "כמה ביקורות יש לכל שירות?",
+    "מה הדירוג הממוצע של שירות חידוש ויזה",
+    "כמה ביקורות מתחת ל־3?",
+    "תראה לי את כל הביקורות של שירות דרכון ביומטרי",
+]
+
+# questions that go to the (fake) planner LLM, with the plan it answers
+PLANNED_QUESTIONS = {
+    "מה הבעיה העיקרית בשירות שינוי כתובת?": {"steps": [
+        {"fn": "fetch_all_feedbacks"},
+        {"fn": "filter_by_service", "args": {"service_name": "שינוי כתובת"}},
+        {"fn": "get_texts"},
+        {"fn": "semantic_dynamic", "args": {"prompt": "מה הבעיה העיקרית בשירות שינוי כתובת?"}},
+        {"fn": "render_text"},
+    ]},
+    "תציג ביקורות שמכילות את המילה קבצים": {"steps": [
+        {"fn": "fetch_all_feedbacks"},
+        {"fn": "filter_by_text_contains", "args": {"keyword": "קבצים"}},
+        {"fn": "render_table", "args": {"columns": ["text", "Level", "service_demended_hebrew", "CreationDate"]}},
+    ]},
+    "תלונות על איטיות האתר בשירות חידוש ויזה": {"steps": [
+        {"fn": "fetch_all_feedbacks"},
+        {"fn": "filter_by_service", "args": {"service_name": "חידוש ויזה"}},
+        {"fn": "filter_by_text_semantic", "args": {"query": "האתר נתקע"}},
+        {"fn": "render_table", "args": {"columns": ["text", "Level", "service_demended_hebrew", "score"]}},
+    ]},
+    "השווה את התלונות בשירות שינוי כתובת ובשירות חידוש ויזה": {"steps": [
+        {"id": "all", "fn": "fetch_all_feedbacks"},
+        {"id": "a", "fn": "filter_by_service", "inputs": ["all"], "args": {"service_name": "שינוי כתובת"}},
+        {"id": "a_texts", "fn": "get_texts", "inputs": ["a"]},
+        {"id": "a_answer", "fn": "semantic_dynamic", "inputs": ["a_texts"], "args": {"prompt": "מה התלונות העיקריות בשירות שינוי כתובת?"}},
+        {"id": "b", "fn": "filter_by_service", "inputs": ["all"], "args": {"service_name": "חידוש ויזה"}},
+        {"id": "b_texts", "fn": "get_texts", "inputs": ["b"]},
+        {"id": "b_answer", "fn": "semantic_dynamic", "inputs": ["b_texts"], "args": {"prompt": "מה התלונות העיקריות בשירות חידוש ויזה?"}},
+        {"id": "joined", "fn": "join_results", "inputs": ["a_answer", "b_answer"], "args": {"labels": ["שינוי כתובת", "חידוש ויזה"]}},
+        {"fn": "render_text", "inputs": ["joined"]},
+    ]},
+}
+
+
+# below this many samples the 99th percentile is just the maximum, so only max_ms is reported
+MIN_P99_SAMPLES = 100
+
+# settings that don't change the measurements; runs that differ in anything else are not compared
+NOT_COMPARED_SETTINGS = ("sizes", "threshold")
+
+
+# ---------------- worker: one dataset size, in its own process ---------------- #
+
+def _latency(samples_ms) -> Dict[str, float]:
+    from benchmarks.storage_profiles import percentile
+    report = {
+        "samples": len(samples_ms),
+        "p50_ms": round(percentile(samples_ms, 0.5), 2),
+        "mean_ms": round(sum(samples_ms) / len(samples_ms), 2),
+        "max_ms": round(max(samples_ms), 2),
+    }
+    if len(samples_ms) >= MIN_P99_SAMPLES:
+        report["p99_ms"] = round(percentile(samples_ms, 0.99), 2)
+    return report
+
+
+def _peak_rss_mb() -> float:
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # KiB on Linux, bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+async def _bench_functions(repeats: int) -> Dict[str, Any]:
+    from query_service.dsl.functions import DSL_FUNCTIONS
+    from query_service.dsl.executor import _call_step
+    from query_service.dsl.events import result_rows
+    from query_service.dsl.snapshot import feedback_snapshot
+
+    df = await DSL_FUNCTIONS["fetch_all_feedbacks"]()
+    service_df = await DSL_FUNCTIONS["filter_by_service"](df, service_name="שינוי כתובת")
+    texts = DSL_FUNCTIONS["get_texts"](service_df)
+    grouped = DSL_FUNCTIONS["group_by_service"](df, calc="avg", field="Level")
+    answer = await DSL_FUNCTIONS["semantic_dynamic"](texts, prompt="מה הבעיה העיקרית?")
+
+    # function -> (inputs, args); a function added to DSL_FUNCTIONS without a case here is reported as skipped.
+    # fetch_all_feedbacks is served from the in-memory snapshot, its cold case below reloads it from Qdrant
+    cases: Dict[str, Tuple[list, dict]] = {
+        "fetch_all_feedbacks": ([], {}),
+        "resolve_service_name": ([], {"service_name": "חידוש ויזה"}),
+        "filter_by_level": ([df], {"operator": "lt", "value": 3}),
+        "filter_by_value": ([df], {"field": "Level", "operator": "gte", "value": 4}),
+        "filter_by_service": ([df], {"service_name": "שינוי כתובת"}),
+        "filter_by_text_contains": ([df], {"keyword": "הודעת שגיאה"}),
+        "filter_by_text_semantic": ([service_df], {"query": "האתר נתקע"}),
+        "group_by_service": ([df], {"calc": "count", "field": "Level"}),
+        "sort_results": ([grouped], {"order": "desc", "field": "avg_Level"}),
+        "count_records": ([df], {}),
+        "get_texts": ([service_df], {}),
+        "semantic_dynamic": ([texts], {"prompt": "מה הבעיה העיקרית?"}),
+        "render_table": ([service_df], {}),
+        "render_text": ([answer], {}),
+        "join_results": ([grouped, grouped], {"labels": ["a", "b"]}),
+    }
+
+    # report name -> (function, setup run before every sample, outside the timing)
+    runs = [(name, name, None) for name in DSL_FUNCTIONS]
+    runs.append(("fetch_all_feedbacks_cold", "fetch_all_feedbacks", feedback_snapshot.invalidate))
+
+    report: Dict[str, Any] = {}
+    for label, name, setup in runs:
+        if name not in cases:
+            report[label] = {"skipped": "no benchmark case"}
+            continue
+        inputs, args = cases[name]
+        samples, rows_out = [], None
+        for _ in range(repeats):
+            if setup:
+                setup()
+            started = time.perf_counter()
+            result = await _call_step(name, list(inputs), dict(args))
+            samples.append((time.perf_counter() - started) * 1000)
+            rows_out = result_rows(result)
+        report[label] = {**_latency(samples), "rows_in": result_rows(inputs[0]) if inputs else None, "rows_out": rows_out}
+    # leave the snapshot loaded for the /query runs
+    await feedback_snapshot.get()
+    return report
+
+
+# `samples` /query requests per mode, cycling through the questions
+async def _bench_queries(samples: int) -> Dict[str, Any]:
+    import httpx
+    from query_service.app import app
+    from query_service.dsl.plan_cache import plan_cache
+    from query_service.dsl.result_cache import result_cache
+
+    questions = FAST_PATH_QUESTIONS + list(PLANNED_QUESTIONS)
+    report: Dict[str, Any] = {"questions": len(questions)}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        # cold: no cached plans or results, every request plans and executes in full
+        for mode in ("cold", "warm"):
+            latencies, errors = [], 0
+            for i in range(samples):
+                question = questions[i % len(questions)]
+                if mode == "cold":
+                    plan_cache.invalidate(include_pinned=True)
+                    result_cache.invalidate()
+                started = time.perf_counter()
+                response = await client.post("/query", json={"question": question})
+                latencies.append((time.perf_counter() - started) * 1000)
+                errors += response.status_code != 200
+            report[mode] = {**_latency(latencies), "requests": len(latencies), "errors": errors}
+    return report
+
+
+async def _run_worker(args) -> Dict[str, Any]:
+    from benchmarks.fakes import FakeLLM, install_fakes
+    from benchmarks.datasets import write_feedback_csv, SERVICES
+
+    llm = FakeLLM(plans=PLANNED_QUESTIONS, translations=SERVICES, latency_ms=args.llm_latency_ms, per_token_ms=args.llm_per_token_ms)
+    install_fakes(llm, dimension=args.dim, embed_latency_ms=args.embed_latency_ms, embed_per_text_ms=args.embed_per_text_ms)
+
+    from indexing_service.indexing_worker import process_csv_to_qdrant
+    from utils.dataset_version import bump_dataset_version
+    from utils.service_index import service_index
+    from query_service.dsl.snapshot import feedback_snapshot
+
+    result: Dict[str, Any] = {"rows": args.size}
+
+    started = time.perf_counter()
+    csv_path = write_feedback_csv(os.path.join(args.workdir, "feedback.csv"), args.size, seed=args.seed)
+    result["dataset_seconds"] = round(time.perf_counter() - started, 2)
+
+    started = time.perf_counter()
+    ingest = process_csv_to_qdrant(csv_path)
+    bump_dataset_version()
+    seconds = time.perf_counter() - started
+    result["ingest"] = {
+        "seconds": round(seconds, 2),
+        "rows_per_sec": round(args.size / seconds, 1) if seconds else None,
+        "inserted": ingest["inserted"],
+        "failed": ingest["failed"],
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+
+    started = time.perf_counter()
+    await feedback_snapshot.get()
+    await service_index.load()
+    result["snapshot_load_seconds"] = round(time.perf_counter() - started, 2)
+
+    result["functions"] = await _bench_functions(args.repeats)
+    result["query"] = await _bench_queries(args.query_samples)
+    result["llm_calls"] = llm.calls
+    result["peak_rss_mb"] = _peak_rss_mb()
+    return result
+
+
+def worker(args):
+    import asyncio
+    result = asyncio.run(_run_worker(args))
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+
+
+# ---------------- parent: runs the sizes, saves and compares ---------------- #
+
+def _worker_env(workdir: str) -> Dict[str, str]:
+    env = dict(os.environ)
+    env.update({
+        "QDRANT_PATH": ":memory:",
+        "DATA_DIR": os.path.join(workdir, "data"),
+        "EMBED_PROVIDER_TEXT": "fake",
+        "EMBED_PROVIDER_SERVICE": "fake",
+        "NVIDIA_API_KEY": env.get("NVIDIA_API_KEY") or "offline-benchmark",
+        "DEBUG_MODE": "false",
+        "PYTHONPATH": BACKEND_DIR + os.pathsep + env.get("PYTHONPATH", ""),
+    })
+    return env
+
+
+def _run_size(size: int, args) -> Dict[str, Any]:
+    with tempfile.TemporaryDirectory(prefix=f"inda-bench-{size}-") as workdir:
+        out = os.path.join(workdir, "result.json")
+        command = [
+            sys.executable, "-m", "benchmarks.suite", "--worker",
+            "--size", str(size), "--workdir", workdir, "--out", out,
+            "--repeats", str(args.repeats), "--query-samples", str(args.query_samples), "--dim", str(args.dim), "--seed", str(args.seed),
+            "--embed-latency-ms", str(args.embed_latency_ms), "--embed-per-text-ms", str(args.embed_per_text_ms),
+            "--llm-latency-ms", str(args.llm_latency_ms), "--llm-per-token-ms", str(args.llm_per_token_ms),
+        ]
+        log_path = os.path.join(RESULTS_DIR, f"suite-{size}.log")
+        with open(log_path, "w", encoding="utf-8") as log:
+            proc = subprocess.run(command, cwd=BACKEND_DIR, env=_worker_env(workdir), stdout=log, stderr=subprocess.STDOUT)
+        if proc.returncode != 0:
+            return {"rows": size, "error": f"worker exited with {proc.returncode}, see {log_path}"}
+        with open(out, encoding="utf-8") as f:
+            return json.load(f)
+
+
+# (metric path, value, higher is better) for every number worth comparing between runs
+def _metrics(report: Dict[str, Any], prefix: str = "") -> Iterable[Tuple[str, float, bool]]:
+    for key, value in report.items():
+        path = f"{prefix}.{key}" if prefix else key
+        if isinstance(value, dict):
+            yield from _metrics(value, path)
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            if key == "rows_per_sec":
+                yield path, value, True
+            elif key.endswith("_ms") or key.endswith("seconds") or key == "peak_rss_mb":
+                yield path, value, False
+
+
+def _compared_settings(report: Dict[str, Any]) -> Dict[str, Any]:
+    return {k: v for k, v in report.get("settings", {}).items() if k not in NOT_COMPARED_SETTINGS}
+
+
+# settings that differ between the runs, as name -> (baseline, current)
+def settings_diff(current: Dict[str, Any], baseline: Dict[str, Any]) -> Dict[str, Tuple[Any, Any]]:
+    now, before = _compared_settings(current), _compared_settings(baseline)
+    return {k: (before.get(k), now.get(k)) for k in sorted(set(now) | set(before)) if now.get(k) != before.get(k)}
+
+
+# the latest earlier run made with the same settings and at least one of the same sizes
+def _previous_run(current: Dict[str, Any], exclude: str) -> Optional[str]:
+    runs = sorted(p for p in glob.glob(os.path.join(RESULTS_DIR, "suite-*.json")) if p != exclude)
+    for path in reversed(runs):
+        try:
+            with open(path, encoding="utf-8") as f:
+                run = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if not settings_diff(current, run) and set(run.get("sizes", {})) & set(current["sizes"]):
+            return path
+    return None
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float):
+    differences = settings_diff(current, baseline)
+    if differences:
+        print("not compared, the runs used different settings:")
+        for name, (old, new) in differences.items():
+            print(f"  {name}: {old} -> {new}")
+        return
+    shared = set(current.get("sizes", {})) & set(baseline.get("sizes", {}))
+    if not shared:
+        print("not compared, the runs share no dataset size")
+        return
+    print(f"compared sizes: {', '.join(sorted(shared, key=int))}")
+    before = {path: value for path, value, _ in _metrics(baseline.get("sizes", {}))}
+    regressions = []
+    for path, value, higher_is_better in _metrics(current.get("sizes", {})):
+        old = before.get(path)
+        if not old or old <= 0:
+            continue
+        change = (value - old) / old
+        worse = -change if higher_is_better else change
+        if worse > threshold:
+            regressions.append((path, old, value, change))
+    if not regressions:
+        print(f"no regressions above {threshold:.0%}")
+        return
+    print(f"\n{'regression':<60} {'before':>10} {'now':>10} {'change':>8}")
+    for path, old, value, change in regressions:
+        print(f"{path:<60} {old:>10} {value:>10} {change:>+8.0%}")
+
+
+def print_summary(report: Dict[str, Any]):
+    print(f"\n{'rows':>9} {'ingest rows/s':>14} {'query p50 cold':>15} {'query p99 cold':>15} {'query max cold':>15} {'query p50 warm':>15} {'peak MB':>8}")
+    for size, r in report["sizes"].items():
+        if "error" in r:
+            print(f"{size:>9} {r['error']}")
+            continue
+        cold, warm = r["query"]["cold"], r["query"]["warm"]
+        print(
+            f"{size:>9} {r['ingest']['rows_per_sec']:>14} {cold['p50_ms']:>15} {cold.get('p99_ms', '-'):>15} "
+            f"{cold['max_ms']:>15} {warm['p50_ms']:>15} {r['peak_rss_mb']:>8}"
+        )
+    slowest = {}
+    for r in report["sizes"].values():
+        for name, f in r.get("functions", {}).items():
+            if "p50_ms" in f:
+                slowest[name] = max(slowest.get(name, 0), f["p50_ms"])
+    print(f"\n{'DSL function (largest size)':<28} {'p50 ms':>10}")
+    for name, ms in sorted(slowest.items(), key=lambda x: -x[1]):
+        print(f"{name:<28} {ms:>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="offline INDA benchmark suite")
+    parser.add_argument("--sizes", nargs="+", type=int, default=[1000, 10000, 100000], help="dataset sizes in rows (up to 1000000)")
+    parser.add_argument("--repeats", type=int, default=5, help="runs per DSL function")
+    parser.add_argument("--query-samples", type=int, default=2 * MIN_P99_SAMPLES,
+                        help=f"/query requests per mode, cold and warm (p99 is reported from {MIN_P99_SAMPLES} samples)")
+    parser.add_argument("--dim", type=int, default=128, help="dimension of the fake embeddings")
+    parser.add_argument("--embed-latency-ms", type=float, default=0.0, help="fake embedding latency per request")
+    parser.add_argument("--embed-per-text-ms", type=float, default=0.0, help="fake embedding latency per text")
+    parser.add_argument("--llm-latency-ms", type=float, default=0.0, help="fake LLM latency per call")
+    parser.add_argument("--llm-per-token-ms", type=float, default=0.0, help="fake LLM latency per output token")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--baseline", help="result file to compare with (default: the previous run)")
+    parser.add_argument("--threshold", type=float, default=0.2, help="relative change reported as a regression")
+    # internal: run one size inside this process
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--size", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--workdir", help=argparse.SUPPRESS)
+    parser.add_argument("--out", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        worker(args)
+        return
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    report = {
+        "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "settings": {k: v for k, v in vars(args).items() if k not in ("worker", "size", "workdir", "out", "baseline")},
+        "sizes": {},
+    }
+    for size in args.sizes:
+        print(f"running {size} rows...")
+        report["sizes"][str(size)] = _run_size(size, args)
+
+    out = os.path.join(RESULTS_DIR, f"suite-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print_summary(report)
+    print(f"\nsaved {out}")
+
+    baseline_path = args.baseline or _previous_run(report, exclude=out)
+    if not baseline_path:
+        print("no earlier run with the same settings to compare with")
+    else:
+        with open(baseline_path, encoding="utf-8") as f:
+            baseline = json.load(f)
+        print(f"compared with {baseline_path}")
+        compare(report, baseline, args.threshold)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,14 @@
 from fastapi import FastAPI, UploadFile, File, HTTPException
-from indexing_service.indexing_worker import process_csv_to_qdrant
+from fastapi.concurrency import run_in_threadpool
+from indexing_service.jobs import job_manager, JobQueueFull
 import tempfile
+import shutil
 import os
+from utils.config import UPLOAD_SPOOL_BYTES
+from utils.embedding_providers import warm_up_providers
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
+from utils.metrics import render_metrics
 
 app = FastAPI(title="Indexing Service")
 
@@ -14,17 +20,62 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-@app.post("/ingest_csv")
-async def ingest_csv(file: UploadFile = File(...)):
-    try:
-        suffix = os.path.splitext(file.filename)[1]
-        with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
-            tmp.write(await file.read())
-            tmp_path = tmp.name
 
-        result = process_csv_to_qdrant(tmp_path)
-        os.remove(tmp_path)
-        print(f"Indexed file {file.filename} successfully.")
-        return {"status": "success", **result}
+# load local embedding models once, before the first request needs them
+@app.on_event("startup")
+def load_embedding_providers():
+    warm_up_providers()
+
+
+# Prometheus text format: ingest jobs, embedding and Qdrant write histograms of this process
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    return render_metrics()
+
+
+# copy the upload to disk block by block instead of reading it into memory
+def spool_upload(file: UploadFile) -> str:
+    suffix = os.path.splitext(file.filename)[1]
+    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
+        shutil.copyfileobj(file.file, tmp, UPLOAD_SPOOL_BYTES)
+        return tmp.name
+
+
+# the ingestion runs in the background, the response only carries the job id.
+# with delete_missing=true, feedbacks that are not in the uploaded export are removed from the index
+@app.post("/ingest_csv", status_code=202)
+async def ingest_csv(file: UploadFile = File(...), delete_missing: bool = False):
+    try:
+        tmp_path = await run_in_threadpool(spool_upload, file)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+    try:
+        job = job_manager.submit(tmp_path, file.filename, delete_missing)
+    except JobQueueFull as e:
+        os.remove(tmp_path)
+        raise HTTPException(status_code=429, detail=str(e))
+
+    print(f"queued file {file.filename} as job {job.id}")
+    return {"status": job.status, "job_id": job.id}
+
+
+@app.get("/jobs")
+def list_jobs():
+    return {"jobs": [job.to_dict() for job in job_manager.list()]}
+
+
+@app.get("/jobs/{job_id}")
+def job_status(job_id: str):
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"job '{job_id}' not found")
+    return job.to_dict()
+
+
+@app.post("/jobs/{job_id}/cancel")
+def cancel_job(job_id: str):
+    job = job_manager.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"job '{job_id}' not found")
+    return job.to_dict()
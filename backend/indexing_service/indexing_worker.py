@@ -1,47 +1,68 @@
 import os
+import csv
+import json
+import hashlib
+import threading
 import uuid
 import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
 from tqdm import tqdm
-from typing import Dict
-from utils.embedding_utils import get_embedding
-from utils.qdrant_utils import upsert_point
+from typing import Any, Callable, Dict, Optional
+from utils.embedding_utils import get_embeddings
+from utils.embedding_providers import provider_for
+from utils.qdrant_utils import PointBuffer, get_content_hashes, iter_point_ids, delete_points
 from utils.llm_utils import call_llm
-from utils.config import debug_log
+from utils.config import debug_log, EMBED_BATCH_SIZE, CSV_CHUNK_ROWS, TRANSLATE_CONCURRENCY, TRANSLATE_MAX_TOKENS
+from indexing_service.translation_store import translation_store
 
-from qdrant_client.models import VectorParams, Distance
-from utils.config import QDRANT_COLLECTION
-from qdrant_client import QdrantClient
+from qdrant_client.models import PayloadSchemaType
+from utils.config import QDRANT_COLLECTION, QDRANT_STORAGE_PROFILE
+from utils.storage_profiles import vectors_config, collection_config
+from utils.qdrant_utils import qdrant, SERVICE_HE_FIELD
+from utils.service_index import update_service_index, rebuild_service_index
 
-qdrant = QdrantClient()
-VECTOR_SIZE = 2048
+# dimension of each vector field, given by the provider that embeds it
+def vector_sizes() -> Dict[str, int]:
+    return {
+        "text_vector": provider_for("text").dimension,
+        "service_vector": provider_for("service").dimension,
+    }
 
-# check and create collection if not exists
-def ensure_collection_exists():
+# payload fields the DSL filters on, indexed so the filters can run inside Qdrant
+PAYLOAD_INDEXES = {
+    "Level": PayloadSchemaType.INTEGER,
+    SERVICE_HE_FIELD: PayloadSchemaType.KEYWORD,
+    "CreationDate": PayloadSchemaType.DATETIME,
+}
+
+# check and create collection if not exists, new collections use the configured storage profile
+def ensure_collection_exists(profile: str = QDRANT_STORAGE_PROFILE):
     try:
-        qdrant.get_collection(QDRANT_COLLECTION)
+        info = qdrant.get_collection(QDRANT_COLLECTION)
         print(f"Collection '{QDRANT_COLLECTION}' already exists.")
+        existing_indexes = set((info.payload_schema or {}).keys())
     except Exception:
-        print(f"Creating new collection '{QDRANT_COLLECTION}'...")
+        print(f"Creating new collection '{QDRANT_COLLECTION}' (storage profile '{profile}')...")
         qdrant.recreate_collection(
             collection_name=QDRANT_COLLECTION,
-            vectors_config={
-                "text_vector": VectorParams(size=VECTOR_SIZE, distance=Distance.COSINE),
-                "service_vector": VectorParams(size=VECTOR_SIZE, distance=Distance.COSINE),
-            },
+            vectors_config=vectors_config(profile, vector_sizes()),
+            **collection_config(profile),
         )
+        existing_indexes = set()
 
-# split service_demended to service name and service office and translate service names to Hebrew using LLM
-def translate_service_names(df: pd.DataFrame) -> pd.DataFrame:
-    col = next((c for c in df.columns if c.lower() == "servicename"), None)
-    if not col:
-        return df
-
-    df["service_demended"] = df[col].apply(lambda x: x.split("@")[0] if isinstance(x, str) and "@" in x else x)
-    services = df["service_demended"].dropna().unique().tolist()
+    for field, schema in PAYLOAD_INDEXES.items():
+        if field not in existing_indexes:
+            print(f"Creating payload index on '{field}' ({schema})")
+            qdrant.create_payload_index(
+                collection_name=QDRANT_COLLECTION,
+                field_name=field,
+                field_schema=schema,
+                wait=True,
+            )
 
-    translations = {}
-    for s in tqdm(services):
-        prompt = f"""You are a professional translator and data normalization assistant working for an Israeli government feedback analytics system.
+# translate one service name to Hebrew, falls back to the raw name if the LLM call fails
+def translate_service_name(service: str) -> str:
+    prompt = f"""You are a professional translator and data normalization assistant working for an Israeli government feedback analytics system.
 
                     You receive a *service name* written in CamelCase or mixed English form (for example: `App4aBirthCertificate`, `CannabisRequest`, `AppointmentForVisas`, `AgraPikuahAviri`).
                     Each service name refers to a real Israeli government service, form, or online process.
@@ -61,47 +82,223 @@ def translate_service_names(df: pd.DataFrame) -> pd.DataFrame:
                     - `ApprovedImporter` → יבואן מאושר
 
                     Now translate the following service name to clear Hebrew only:
-                    {s}"""
-        try:
-            result = call_llm([{"role": "user", "content": prompt}], max_tokens=9000)
-            translations[s] = result.strip()
-        except Exception as e:
-            print(f"error in translate {s}: {e}")
-            translations[s] = s
+                    {service}"""
+    try:
+        result = call_llm([{"role": "user", "content": prompt}], max_tokens=TRANSLATE_MAX_TOKENS)
+        hebrew = result.strip()
+        translation_store.put(service, hebrew)
+        return hebrew
+    except Exception as e:
+        print(f"error in translate {service}: {e}")
+        return service
+
+
+# split service_demended to service name and service office and translate service names to Hebrew using LLM
+# `translations` carries already translated names between calls (e.g. between CSV chunks),
+# names translated in earlier ingests come from the translation store, the rest are translated concurrently
+def translate_service_names(df: pd.DataFrame, translations: Dict[str, str] = None) -> pd.DataFrame:
+    col = next((c for c in df.columns if c.lower() == "servicename"), None)
+    if not col:
+        return df
+
+    df["service_demended"] = df[col].apply(lambda x: x.split("@")[0] if isinstance(x, str) and "@" in x else x)
+    if translations is None:
+        translations = {}
+    services = [s for s in df["service_demended"].dropna().unique().tolist() if s not in translations]
+
+    stored = translation_store.get_many(services)
+    translations.update(stored)
+    services = [s for s in services if s not in stored]
+    debug_log(f"{len(stored)} service names from the translation store, {len(services)} to translate")
+
+    if services:
+        with ThreadPoolExecutor(max_workers=TRANSLATE_CONCURRENCY) as pool:
+            for s, hebrew in tqdm(zip(services, pool.map(translate_service_name, services)), total=len(services)):
+                translations[s] = hebrew
 
     df["service_demended_hebrew"] = df["service_demended"].map(translations)
     print("done translating service names to Hebrew")
     return df
 
+# namespace for the deterministic point ids, must never change or re-ingests stop matching
+POINT_ID_NAMESPACE = uuid.UUID("6f1c3a52-8a0e-4d8b-9c39-2f4f5d1e7a10")
+
+
+# pandas infers dtypes per chunk (3 vs 3.0, nan vs None), normalize so ids and hashes are stable
+def _normalize_value(value):
+    if isinstance(value, float):
+        if value != value:
+            return None
+        if value.is_integer():
+            return int(value)
+    if hasattr(value, "item"):
+        return _normalize_value(value.item())
+    return value
+
+
+# hash of the raw CSV row, stored in the payload to detect changed rows on re-ingest
+def content_hash(raw_row: Dict[str, Any]) -> str:
+    normalized = {str(k): _normalize_value(v) for k, v in raw_row.items()}
+    encoded = json.dumps(normalized, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+# the same feedback always gets the same point id: from its ID column, or from its content
+def point_id_for(raw_row: Dict[str, Any], row_hash: str) -> str:
+    row_id = _normalize_value(raw_row.get("ID"))
+    if row_id is not None and row_id != "":
+        return str(uuid.uuid5(POINT_ID_NAMESPACE, f"id:{row_id}"))
+    return str(uuid.uuid5(POINT_ID_NAMESPACE, f"hash:{row_hash}"))
+
+
+# translate, embed and build the points of one CSV chunk
+# `translations` and `service_vectors` are shared between the chunks of one file.
+# rows whose content hash is already stored in Qdrant are skipped, ids of all rows are added to `seen_ids`.
+def embed_chunk(df: pd.DataFrame, translations: Dict[str, str], service_vectors: Dict[str, list], seen_ids: set = None):
+    raw_rows = df.to_dict(orient="records")
+    hashes = [content_hash(r) for r in raw_rows]
+    ids = [point_id_for(r, h) for r, h in zip(raw_rows, hashes)]
+    if seen_ids is not None:
+        seen_ids.update(ids)
+
+    stored = get_content_hashes(ids)
+    changed = [pos for pos, (pid, h) in enumerate(zip(ids, hashes)) if stored.get(pid) != h]
+    unchanged = len(df) - len(changed)
+    if unchanged:
+        debug_log(f"{unchanged}/{len(df)} rows unchanged since the last ingest")
+    if not changed:
+        return [], 0, unchanged
+
+    df = df.iloc[changed].copy()
+    df["content_hash"] = [hashes[pos] for pos in changed]
+    df["_point_id"] = [ids[pos] for pos in changed]
+    df = translate_service_names(df, translations)
+
+    for col in ("Text", "service_demended_hebrew"):
+        df[col] = df[col].astype(str).str.strip() if col in df.columns else ""
+
+    # there are only a few hundred services, embed every distinct one once per file
+    new_services = [s for s in df["service_demended_hebrew"].unique().tolist() if s not in service_vectors]
+    if new_services:
+        service_vectors.update(zip(new_services, get_embeddings(new_services, input_type="passage", use="service")))
+
+    points = []
+    failed_rows = 0
+    for start in range(0, len(df), EMBED_BATCH_SIZE):
+        batch = df.iloc[start:start + EMBED_BATCH_SIZE]
+        try:
+            text_vectors = get_embeddings(batch["Text"].tolist(), input_type="passage", cache=False)
+        except Exception as e:
+            print(f"error in lines {batch.index[0]}-{batch.index[-1]}: {e}")
+            failed_rows += len(batch)
+            continue
+
+        for (_, row), text_vec in zip(batch.iterrows(), text_vectors):
+            text = row["Text"]
+            service = row["service_demended_hebrew"]
+
+            # plain python values, so Level is stored as an integer the payload index can use
+            payload = {k: _normalize_value(v) for k, v in row.to_dict().items()}
+            payload.pop("Text", None)
+            point_id = payload.pop("_point_id")
+
+            points.append({
+                "id": point_id,
+                "vector": {"text_vector": text_vec, "service_vector": service_vectors[service]},
+                "payload": {**payload, "text": text},
+            })
+
+    return points, failed_rows, unchanged
+
+
+# count data rows, the csv module handles quoted new lines inside the feedback text
+def count_csv_rows(csv_path: str) -> int:
+    with open(csv_path, newline="", encoding="utf-8", errors="replace") as f:
+        return max(sum(1 for _ in csv.reader(f)) - 1, 0)
+
+
 # main function to process CSV and upload to Qdrant
-def process_csv_to_qdrant(csv_path: str) -> Dict[str, int]:
+# the file is read in chunks of `chunk_size` rows, so memory does not grow with the file size.
+# while one chunk is written to Qdrant the next one is already read and embedded.
+# re-ingesting an export only embeds new or changed rows; with `delete_missing` the points of rows
+# that are no longer in the file are deleted.
+# `progress(rows_done, rows_failed)` is called after every chunk, `cancel_event` stops between chunks.
+def process_csv_to_qdrant(
+    csv_path: str,
+    chunk_size: int = CSV_CHUNK_ROWS,
+    progress: Optional[Callable[[int, int], None]] = None,
+    cancel_event: Optional[threading.Event] = None,
+    delete_missing: bool = False,
+) -> Dict[str, Any]:
     if not os.path.exists(csv_path):
         raise FileNotFoundError(f"File not found: {csv_path}")
 
-    df = pd.read_csv(csv_path)
     ensure_collection_exists()
-    df = translate_service_names(df)
 
-    for i, row in df.iterrows():
-        text = str(row.get("Text", "")).strip()
-        service = str(row.get("service_demended_hebrew", "")).strip()
+    translations: Dict[str, str] = {}
+    service_vectors: Dict[str, list] = {}
+    seen_ids: set = set()
+    failed_rows = 0
+    unchanged_rows = 0
+    chunks = 0
+    cancelled = False
 
-        try:
-            text_vec = get_embedding(text, input_type="passage")
-            service_vec = get_embedding(service, input_type="passage")
+    with ThreadPoolExecutor(max_workers=1) as embedder, PointBuffer() as buffer:
+        pending = None
+        for chunk in pd.read_csv(csv_path, chunksize=chunk_size):
+            if cancel_event is not None and cancel_event.is_set():
+                cancelled = True
+                break
+            future = embedder.submit(embed_chunk, chunk, translations, service_vectors, seen_ids)
+            if pending is not None:
+                failed, unchanged = _write_chunk(buffer, pending.result(), progress)
+                failed_rows += failed
+                unchanged_rows += unchanged
+            pending = future
+            chunks += 1
 
-            payload = row.to_dict()
-            payload.pop("Text", None)
+        if pending is not None:
+            failed, unchanged = _write_chunk(buffer, pending.result(), progress)
+            failed_rows += failed
+            unchanged_rows += unchanged
+        failures = buffer.flush()
+
+    failed_rows += sum(f["count"] for f in failures)
+
+    # a partial run has not seen the whole export, never delete in that case
+    deleted = 0
+    if delete_missing and not cancelled:
+        stale = [pid for pid in iter_point_ids() if str(pid) not in seen_ids]
+        deleted = delete_points(stale)
+
+    # keep the one-vector-per-service index in sync, it must never fail the ingest itself
+    try:
+        if deleted:
+            rebuild_service_index()
+        else:
+            update_service_index(service_vectors)
+    except Exception as e:
+        print(f"could not update the service index: {e}")
+
+    print(
+        f"done, {buffer.written} feedbacks indexed to Qdrant, {unchanged_rows} unchanged, {deleted} deleted "
+        f"({chunks} chunks{', cancelled' if cancelled else ''})"
+    )
+    return {
+        "inserted": buffer.written,
+        "unchanged": unchanged_rows,
+        "deleted": deleted,
+        "cancelled": cancelled,
+        "failed": failed_rows,
+        "failed_batches": [{k: f[k] for k in ("batch", "count", "error")} for f in failures],
+    }
 
-            upsert_point(
-                point_id=str(uuid.uuid4()),
-                vector_dict={"text_vector": text_vec, "service_vector": service_vec},
-                payload={**payload, "text": text}
-            )
-            debug_log(f"Indexed {service}")
-        except Exception as e:
-            print(f"error in line {i}: {e}")
-            continue
 
-    print(f"done, {len(df)} feedbacks indexed to Qdrant")
-    return {"inserted": len(df)}
+def _write_chunk(buffer: PointBuffer, embedded, progress=None):
+    points, failed_rows, unchanged = embedded
+    for p in points:
+        buffer.add(p["id"], p["vector"], p["payload"])
+    debug_log(f"queued {len(points)} points for upsert")
+    if progress is not None:
+        progress(len(points) + unchanged, failed_rows)
+    return failed_rows, unchanged
@@ -0,0 +1,175 @@
+import os
+import time
+import uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+from indexing_service.indexing_worker import process_csv_to_qdrant, count_csv_rows
+from utils.dataset_version import bump_dataset_version
+from utils.config import MAX_CONCURRENT_JOBS, MAX_QUEUED_JOBS, FINISHED_JOB_RETENTION_SECONDS, MAX_FINISHED_JOBS, debug_log
+from utils.metrics import record
+
+QUEUED = "queued"
+RUNNING = "running"
+CANCELLING = "cancelling"
+CANCELLED = "cancelled"
+DONE = "done"
+FAILED = "failed"
+
+FINISHED = (CANCELLED, DONE, FAILED)
+
+
+class JobQueueFull(Exception):
+    pass
+
+
+# state of one background ingestion, updated by the worker thread and read by the API
+class IngestJob:
+
+    def __init__(self, path: str, filename: str, delete_missing: bool = False):
+        self.id = uuid.uuid4().hex
+        self.path = path
+        self.filename = filename
+        self.delete_missing = delete_missing
+        self.status = QUEUED
+        self.rows_total: Optional[int] = None
+        self.rows_done = 0
+        self.rows_failed = 0
+        self.errors: List[str] = []
+        self.result: Optional[Dict[str, Any]] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.cancel_event = threading.Event()
+
+    def on_progress(self, rows_done: int, rows_failed: int):
+        self.rows_done += rows_done
+        self.rows_failed += rows_failed
+
+    def to_dict(self) -> Dict[str, Any]:
+        end = self.finished_at or time.time()
+        elapsed = end - self.started_at if self.started_at else 0.0
+        rows_per_sec = self.rows_done / elapsed if elapsed > 0 else 0.0
+
+        eta = None
+        if self.status == RUNNING and self.rows_total is not None and rows_per_sec > 0:
+            eta = max(self.rows_total - self.rows_done - self.rows_failed, 0) / rows_per_sec
+
+        return {
+            "job_id": self.id,
+            "filename": self.filename,
+            "status": self.status,
+            "rows_total": self.rows_total,
+            "rows_done": self.rows_done,
+            "rows_failed": self.rows_failed,
+            "rows_per_sec": round(rows_per_sec, 2),
+            "eta_seconds": round(eta, 1) if eta is not None else None,
+            "elapsed_seconds": round(elapsed, 1),
+            "errors": self.errors[-20:],
+            "result": self.result,
+        }
+
+
+# runs ingestion jobs on a fixed size worker pool, extra jobs wait in the queue.
+# finished jobs stay listed for a retention period (and at most max_finished of them), then they are dropped
+class JobManager:
+
+    def __init__(self, max_concurrent: int = MAX_CONCURRENT_JOBS, max_queued: int = MAX_QUEUED_JOBS,
+                 retention: float = FINISHED_JOB_RETENTION_SECONDS, max_finished: int = MAX_FINISHED_JOBS):
+        self.max_queued = max_queued
+        self.retention = retention
+        self.max_finished = max_finished
+        self._jobs: Dict[str, IngestJob] = {}
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max_concurrent, thread_name_prefix="ingest")
+
+    def submit(self, path: str, filename: str, delete_missing: bool = False) -> IngestJob:
+        with self._lock:
+            self._prune()
+            queued = sum(1 for j in self._jobs.values() if j.status == QUEUED)
+            if queued >= self.max_queued:
+                raise JobQueueFull(f"{queued} jobs already waiting, try again later")
+            job = IngestJob(path, filename, delete_missing)
+            self._jobs[job.id] = job
+        self._pool.submit(self._run, job)
+        debug_log(f"job {job.id} queued for {filename}")
+        return job
+
+    def get(self, job_id: str) -> Optional[IngestJob]:
+        return self._jobs.get(job_id)
+
+    def list(self) -> List[IngestJob]:
+        with self._lock:
+            self._prune()
+            jobs = list(self._jobs.values())
+        return sorted(jobs, key=lambda j: j.created_at, reverse=True)
+
+    # caller holds the lock
+    def _prune(self):
+        finished = sorted(
+            (j for j in self._jobs.values() if j.status in FINISHED and j.finished_at is not None),
+            key=lambda j: j.finished_at,
+            reverse=True,
+        )
+        cutoff = time.time() - self.retention
+        for i, job in enumerate(finished):
+            if i >= self.max_finished or job.finished_at < cutoff:
+                del self._jobs[job.id]
+
+    def cancel(self, job_id: str) -> Optional[IngestJob]:
+        job = self._jobs.get(job_id)
+        if job is None or job.status in FINISHED:
+            return job
+        job.cancel_event.set()
+        with self._lock:
+            # a queued job never started, finish it right away
+            if job.status == QUEUED:
+                job.status = CANCELLED
+                job.finished_at = time.time()
+            else:
+                job.status = CANCELLING
+        return job
+
+    def _run(self, job: IngestJob):
+        try:
+            with self._lock:
+                if job.cancel_event.is_set():
+                    return
+                job.status = RUNNING
+                job.started_at = time.time()
+
+            job.rows_total = count_csv_rows(job.path)
+            result = process_csv_to_qdrant(
+                job.path,
+                progress=job.on_progress,
+                cancel_event=job.cancel_event,
+                delete_missing=job.delete_missing,
+            )
+            job.result = result
+            job.errors.extend(f["error"] for f in result.get("failed_batches", []))
+            job.status = CANCELLED if result.get("cancelled") else DONE
+            print(f"Indexed file {job.filename} ({job.status}).")
+        except Exception as e:
+            print(f"job {job.id} failed: {e}")
+            job.errors.append(str(e))
+            job.status = FAILED
+        finally:
+            # tell the query service its cached copy of the data is stale. a failed job may
+            # have written part of the file, so only a clean run without changes skips this
+            if job.started_at and (job.result is None or job.result.get("inserted") or job.result.get("deleted")):
+                try:
+                    bump_dataset_version()
+                except Exception as e:
+                    print(f"job {job.id}: could not bump the dataset version: {e}")
+            if job.finished_at is None:
+                job.finished_at = time.time()
+            if job.started_at:
+                record("ingest", job.status, job.finished_at - job.started_at,
+                       rows_in=job.rows_total, rows_out=(job.result or {}).get("inserted"))
+            if os.path.exists(job.path):
+                os.remove(job.path)
+            with self._lock:
+                self._prune()
+
+
+job_manager = JobManager()
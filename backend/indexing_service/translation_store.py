@@ -0,0 +1,41 @@
+import os
+import sqlite3
+import threading
+from typing import Dict, Iterable
+from utils.config import TRANSLATION_DB_PATH
+
+
+# persistent table of raw ServiceName prefix -> Hebrew name, so every service is translated only once
+class TranslationStore:
+
+    def __init__(self, path: str = TRANSLATION_DB_PATH):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS translations (service TEXT PRIMARY KEY, hebrew TEXT NOT NULL)"
+        )
+        self._db.commit()
+
+    def get_many(self, services: Iterable[str]) -> Dict[str, str]:
+        services = list(services)
+        found = {}
+        with self._lock:
+            for start in range(0, len(services), 500):
+                part = services[start:start + 500]
+                placeholders = ",".join("?" * len(part))
+                rows = self._db.execute(
+                    f"SELECT service, hebrew FROM translations WHERE service IN ({placeholders})", part
+                ).fetchall()
+                found.update(rows)
+        return found
+
+    def put(self, service: str, hebrew: str):
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO translations (service, hebrew) VALUES (?, ?)", (service, hebrew)
+            )
+            self._db.commit()
+
+
+translation_store = TranslationStore()
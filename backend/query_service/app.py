@@ -1,9 +1,23 @@
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import StreamingResponse, PlainTextResponse
 from pydantic import BaseModel
 from query_service.dsl.interpreter import interpret_question_to_dsl
 from query_service.dsl.executor import execute_dsl_flow
+from query_service.dsl.plan_cache import plan_cache
+from query_service.dsl.result_cache import result_cache
+from query_service.dsl.schema_library import schema_library
+from query_service.dsl.fast_path import fast_path_stats
+from query_service.dsl.events import start_stream, emit
+from typing import Optional
+import asyncio
+import json
 from fastapi.middleware.cors import CORSMiddleware
 import traceback
+from utils.embedding_providers import warm_up_providers
+from utils.llm_utils import async_client as async_llm_client
+from utils.qdrant_utils import async_qdrant
+from utils.service_index import service_index
+from utils.metrics import start_timings, timed, timings_summary, render_metrics
 
 app = FastAPI(title="Query Service")
 
@@ -17,38 +31,197 @@ app.add_middleware(
 
 class QueryRequest(BaseModel):
     question: str
+    # add a per-request breakdown of step, LLM, embedding and Qdrant timings to the response
+    include_timings: bool = False
 
 
 class QueryResponse(BaseModel):
     status: str
     dsl: dict
     result: dict
+    timings: Optional[dict] = None
+
+
+class PlanCacheRequest(BaseModel):
+    question: Optional[str] = None
+    plan: Optional[dict] = None
+    include_pinned: bool = False
+
+# load local embedding models once, before the first request needs them
+@app.on_event("startup")
+def load_embedding_providers():
+    warm_up_providers()
+
+
+# service names are resolved against an in-memory matrix, load it before the first query
+@app.on_event("startup")
+async def load_service_index():
+    await service_index.load()
+
+
+# close the pooled connections of the async clients
+@app.on_event("shutdown")
+async def close_clients():
+    await async_llm_client.close()
+    await async_qdrant.close()
+
 
 @app.get("/health")
 def health():
     return {"status": "ok"}
 
+
+# Prometheus text format: step, LLM, embedding and Qdrant histograms of this process
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    return render_metrics()
+
+# async end to end: LLM, embedding and Qdrant calls use pooled async clients,
+# so one worker can hold many concurrent queries that are waiting on I/O
 @app.post("/query", response_model=QueryResponse)
-def query_endpoint(req: QueryRequest):
+async def query_endpoint(req: QueryRequest):
 
     question = req.question.strip()
     print(f"\nnew user query: {question}")
+    timings = start_timings()
 
     try:
-        dsl_plan = interpret_question_to_dsl(question)
-        if "error" in dsl_plan:
-            raise Exception("DSL interpretation failed")
+        with timed("request", "query"):
+            with timed("planner", "interpret_question_to_dsl"):
+                dsl_plan = await interpret_question_to_dsl(question)
+            if "error" in dsl_plan:
+                raise Exception("DSL interpretation failed")
 
-        result = execute_dsl_flow(dsl_plan)
-        print(f"the DSL flow is: {result}")
+            result = await execute_dsl_flow(dsl_plan)
+            print(f"the DSL flow is: {result}")
 
         return {
             "status": "success",
             "dsl": dsl_plan,
             "result": result,
+            "timings": timings_summary(timings) if req.include_timings else None,
         }
 
     except Exception as e:
         print(f"error: {e}")
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=str(e))
+
+
+
+def sse_event(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+
+# same as /query, but sends Server-Sent Events while it runs:
+# plan, step_start / step_end (with row counts), token (pieces of the LLM answer), result or error
+@app.post("/query/stream")
+async def query_stream_endpoint(req: QueryRequest):
+
+    question = req.question.strip()
+    print(f"\nnew user query (stream): {question}")
+
+    async def run():
+        timings = start_timings()
+        try:
+            with timed("request", "query_stream"):
+                with timed("planner", "interpret_question_to_dsl"):
+                    dsl_plan = await interpret_question_to_dsl(question)
+                if "error" in dsl_plan:
+                    raise Exception("DSL interpretation failed")
+                emit("plan", dsl_plan)
+                result = await execute_dsl_flow(dsl_plan)
+            emit("result", {
+                "status": "success",
+                "dsl": dsl_plan,
+                "result": result,
+                "timings": timings_summary(timings) if req.include_timings else None,
+            })
+        except Exception as e:
+            print(f"error: {e}")
+            traceback.print_exc()
+            emit("error", {"detail": str(e)})
+
+    async def events():
+        queue = start_stream()
+        # the task copies the current context, so its emit() calls land in this queue
+        task = asyncio.create_task(run())
+        task.add_done_callback(lambda _: queue.put_nowait(None))
+        try:
+            while True:
+                item = await queue.get()
+                if item is None:
+                    break
+                yield sse_event(*item)
+        finally:
+            # client went away: stop the work instead of finishing it for nobody
+            if not task.done():
+                task.cancel()
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+# ---------------- plan cache management ---------------- #
+
+@app.get("/fast_path/stats")
+def fast_path_stats_endpoint():
+    return fast_path_stats.stats()
+
+
+@app.get("/plan_cache/stats")
+def plan_cache_stats():
+    return plan_cache.stats()
+
+
+# pin a question's plan so it is never evicted. without a plan, the current plan is pinned
+# (and created by the interpreter if the question is not cached yet)
+@app.post("/plan_cache/pin")
+async def plan_cache_pin(req: PlanCacheRequest):
+    if not req.question:
+        raise HTTPException(status_code=400, detail="question is required")
+    if req.plan is not None and "steps" not in req.plan:
+        raise HTTPException(status_code=400, detail="plan must contain 'steps'")
+    if req.plan is None and not await plan_cache.pin(req.question):
+        plan = await interpret_question_to_dsl(req.question)
+        if "error" in plan:
+            raise HTTPException(status_code=500, detail="DSL interpretation failed")
+        await plan_cache.pin(req.question, plan)
+    elif req.plan is not None:
+        await plan_cache.pin(req.question, req.plan)
+    return {"status": "pinned", **plan_cache.stats()}
+
+
+@app.post("/plan_cache/unpin")
+def plan_cache_unpin(req: PlanCacheRequest):
+    if not req.question:
+        raise HTTPException(status_code=400, detail="question is required")
+    if not plan_cache.unpin(req.question):
+        raise HTTPException(status_code=404, detail="question is not cached")
+    return {"status": "unpinned", **plan_cache.stats()}
+
+
+# drop one question, or the whole cache when no question is given
+@app.post("/plan_cache/invalidate")
+def plan_cache_invalidate(req: PlanCacheRequest):
+    removed = plan_cache.invalidate(req.question, include_pinned=req.include_pinned)
+    return {"status": "invalidated", "removed": removed, **plan_cache.stats()}
+
+
+# ---------------- result cache management ---------------- #
+
+@app.get("/result_cache/stats")
+def result_cache_stats():
+    return result_cache.stats()
+
+
+@app.post("/result_cache/invalidate")
+def result_cache_invalidate():
+    return {"status": "invalidated", "removed": result_cache.invalidate()}
+
+
+@app.get("/schema_library/stats")
+def schema_library_stats():
+    return schema_library.stats()
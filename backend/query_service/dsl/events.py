@@ -0,0 +1,48 @@
+import asyncio
+from contextvars import ContextVar
+from typing import Any, Dict, Optional
+
+# queue of the request that is being streamed, None for regular (non streaming) requests.
+# a context variable, so concurrent requests never see each other's events
+_event_queue: ContextVar[Optional[asyncio.Queue]] = ContextVar("dsl_event_queue", default=None)
+# the step being executed (its "step" in the step events). every DAG step runs in its own task,
+# so the token events of concurrent branches say which answer they belong to
+_current_step: ContextVar[Optional[int]] = ContextVar("dsl_current_step", default=None)
+
+
+def start_stream() -> asyncio.Queue:
+    queue: asyncio.Queue = asyncio.Queue()
+    _event_queue.set(queue)
+    return queue
+
+
+def is_streaming() -> bool:
+    return _event_queue.get() is not None
+
+
+def set_current_step(step: Optional[int]):
+    _current_step.set(step)
+
+
+def current_step() -> Optional[int]:
+    return _current_step.get()
+
+
+# send an event to the client of the current request, does nothing when it isn't streaming
+def emit(event: str, data: Dict[str, Any]):
+    queue = _event_queue.get()
+    if queue is not None:
+        queue.put_nowait((event, data))
+
+
+# number of rows in a step result, for the step progress events
+def result_rows(result: Any) -> Optional[int]:
+    if hasattr(result, "shape"):
+        return int(result.shape[0])
+    if isinstance(result, dict):
+        for key in ("data", "texts"):
+            if isinstance(result.get(key), list):
+                return len(result[key])
+    if isinstance(result, list):
+        return len(result)
+    return None
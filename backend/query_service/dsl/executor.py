@@ -1,9 +1,60 @@
-import json
-from typing import Dict, Any, Callable
+import time
+import asyncio
+import inspect
+from typing import Dict, Any, Callable, List
 from query_service.dsl.functions import DSL_FUNCTIONS
+from query_service.dsl.planner import push_down_filters
+from query_service.dsl.result_cache import result_cache, canonical_steps, canonical_node
+from query_service.dsl.snapshot import feedback_snapshot
+from query_service.dsl.events import emit, result_rows, set_current_step
+from utils.config import DAG_MAX_PARALLEL
+from utils.metrics import timed
+
+
+# a plain fetch is served by the feedback snapshot already, caching it would only pin old snapshots
+def _cacheable(step: Dict[str, Any]) -> bool:
+    return not (step.get("fn") == "fetch_all_feedbacks" and not step.get("args"))
+
+
+# call one DSL function with the results of its inputs: none, the previous step's context, or
+# several branch results for a join. (a TypeError from binding the arguments is raised before an
+# async function starts, then the function is called without context)
+async def _call_step(fn_name: str, inputs: List[Any], args: Dict[str, Any]) -> Any:
+    # check if function exists
+    if fn_name not in DSL_FUNCTIONS:
+        raise ValueError(f"function '{fn_name}' not found in DSL_FUNCTIONS")
+
+    fn: Callable = DSL_FUNCTIONS[fn_name]
+
+    rows_in = [result_rows(i) for i in inputs]
+    with timed("step", fn_name, rows_in=sum(r for r in rows_in if r is not None) if inputs else None) as m:
+        try:
+            result = fn(*inputs, **args)
+        except TypeError:
+            if not inputs:
+                raise
+            result = fn(**args)
+        except Exception as e:
+            print(f"error in {fn_name} {e}")
+            raise e
+        if inspect.isawaitable(result):
+            try:
+                result = await result
+            except Exception as e:
+                print(f"error in {fn_name} {e}")
+                raise e
+        m["rows_out"] = result_rows(result)
+    return result
+
+
+# a plan is a DAG as soon as one step is named or lists its inputs
+def is_dag_plan(steps: List[Dict[str, Any]]) -> bool:
+    return any("id" in s or "inputs" in s for s in steps)
+
 
 # run the DSL flow step-by-step
-def execute_dsl_flow(dsl_plan: Dict[str, Any]) -> Any:
+# results are cached per plan prefix and dataset version, a plan continues from its longest cached prefix
+async def execute_dsl_flow(dsl_plan: Dict[str, Any]) -> Any:
 
     print(f"starting DSL flow")
 
@@ -12,31 +63,128 @@ def execute_dsl_flow(dsl_plan: Dict[str, Any]) -> Any:
     if not steps:
         raise ValueError("No steps found in DSL plan")
 
-    for i, step in enumerate(steps):
-        fn_name = step.get("fn")
-        args = step.get("args", {})
+    version = await feedback_snapshot.dataset_version()
+    if is_dag_plan(steps):
+        return await execute_dag(steps, version)
 
-        print(f"step {i+1}/{len(steps)}: {fn_name}({args})")
+    done, context, columns = result_cache.longest_prefix(version, steps)
+    if done:
+        emit("cached", {"steps": done, "rows": result_rows(context)})
 
-        # check if function exists
-        if fn_name not in DSL_FUNCTIONS:
-            raise ValueError(f"function '{fn_name}' not found in DSL_FUNCTIONS")
+    # stages: (step to run, number of original steps done after it)
+    # a pushed down fetch may leave columns out, everything computed from it is cached under that projection
+    if done == 0:
+        rewritten, absorbed = await push_down_filters(steps)
+        stages = [(rewritten[0], absorbed)] + [(s, absorbed + i + 1) for i, s in enumerate(rewritten[1:])]
+        columns = (rewritten[0].get("args") or {}).get("columns")
+    else:
+        stages = [(s, done + i + 1) for i, s in enumerate(steps[done:])]
 
-        fn: Callable = DSL_FUNCTIONS[fn_name]
+    for i, (step, covered) in enumerate(stages):
+        fn_name = step.get("fn")
+        args = step.get("args", {})
+
+        print(f"step {covered}/{len(steps)}: {fn_name}({args})")
+        emit("step_start", {"step": covered, "total": len(steps), "fn": fn_name, "args": args})
+        set_current_step(covered)
+        started = time.perf_counter()
 
         # get the context from previous step if needed 
-        try:
-            if context is not None:
-                result = fn(context, **args)
-            else:
-                result = fn(**args)
-        except TypeError:
-            result = fn(**args)
-        except Exception as e:
-            print(f"error in {fn_name} {e}")
-            raise e
+        result = await _call_step(fn_name, [] if context is None else [context], args)
         # save the context for the next step
         context = result 
+        emit("step_end", {
+            "step": covered,
+            "fn": fn_name,
+            "rows": result_rows(context),
+            "seconds": round(time.perf_counter() - started, 3),
+        })
+
+        if covered > 1 or _cacheable(step):
+            result_cache.put(version, steps[:covered], context, columns=columns)
 
     print(f"Flow executed successfully.")
     return context
+
+
+# DAG plans: steps can have an "id" and "inputs" (ids of earlier steps); a step without "inputs"
+# consumes the step before it, like in a linear plan. the result is the last step's result.
+# steps are started when the last step needs them, independent branches run concurrently
+# (at most DAG_MAX_PARALLEL steps at once), and every step is cached under the key of its ancestry.
+async def execute_dag(steps: List[Dict[str, Any]], version: int, max_parallel: int = DAG_MAX_PARALLEL) -> Any:
+    ids = [str(s.get("id") or f"step_{i + 1}") for i, s in enumerate(steps)]
+    if len(set(ids)) != len(ids):
+        raise ValueError("step ids must be unique")
+    position = {step_id: i for i, step_id in enumerate(ids)}
+
+    parents: List[List[int]] = []
+    for i, step in enumerate(steps):
+        inputs = step.get("inputs")
+        if inputs is None:
+            inputs = [ids[i - 1]] if i > 0 else []
+        if isinstance(inputs, str):
+            inputs = [inputs]
+        for name in inputs:
+            if position.get(str(name), i) >= i:
+                raise ValueError(f"step '{ids[i]}' uses '{name}', which is not an earlier step")
+        parents.append([position[str(name)] for name in inputs])
+
+    # a step with a single chain of ancestors shares its cache key with the same linear plan prefix
+    chains: List[Any] = []
+    keys: List[str] = []
+    for i, step in enumerate(steps):
+        if not parents[i]:
+            chains.append([step])
+        elif len(parents[i]) == 1 and chains[parents[i][0]] is not None:
+            chains.append(chains[parents[i][0]] + [step])
+        else:
+            chains.append(None)
+        keys.append(canonical_steps(chains[i]) if chains[i] is not None else canonical_node(step, [keys[p] for p in parents[i]]))
+
+    semaphore = asyncio.Semaphore(max(1, max_parallel))
+    tasks: Dict[int, asyncio.Future] = {}
+
+    def node(i: int) -> asyncio.Future:
+        if i not in tasks:
+            tasks[i] = asyncio.ensure_future(run(i))
+        return tasks[i]
+
+    async def run(i: int) -> Any:
+        step = steps[i]
+        fn_name = step.get("fn")
+        args = step.get("args", {})
+
+        hit, cached = result_cache.get(version, keys[i])
+        if hit:
+            emit("cached", {"step": i + 1, "id": ids[i], "rows": result_rows(cached)})
+            return cached
+
+        inputs = await asyncio.gather(*(node(p) for p in parents[i]))
+        async with semaphore:
+            print(f"step {i + 1}/{len(steps)} [{ids[i]}]: {fn_name}({args})")
+            emit("step_start", {"step": i + 1, "id": ids[i], "total": len(steps), "fn": fn_name, "args": args})
+            set_current_step(i + 1)
+            started = time.perf_counter()
+            result = await _call_step(fn_name, list(inputs), args)
+            emit("step_end", {
+                "step": i + 1,
+                "id": ids[i],
+                "fn": fn_name,
+                "rows": result_rows(result),
+                "seconds": round(time.perf_counter() - started, 3),
+            })
+
+        if parents[i] or _cacheable(step):
+            result_cache.put_key(version, keys[i], result)
+        return result
+
+    try:
+        result = await node(len(steps) - 1)
+    finally:
+        # a failed branch stops the ones still running
+        for task in tasks.values():
+            if not task.done():
+                task.cancel()
+
+    print(f"Flow executed successfully.")
+    return result
@@ -0,0 +1,256 @@
+import re
+import threading
+from typing import Any, Dict, List, Optional, Set, Tuple
+from query_service.dsl.plan_cache import normalize_question
+from utils.config import debug_log
+from utils.service_index import service_index
+
+# deterministic plans for the common factual questions (README examples), so they skip the LLM planner.
+# anything that needs interpretation (insights, keywords, dates, sorting) returns None and goes to the LLM.
+
+TABLE_COLUMNS = ["text", "Level", "service_demended_hebrew", "CreationDate"]
+SERVICE_COLUMN = "service_demended_hebrew"
+
+# Hebrew prefix letters that can be glued to a word (ו, ה, ב, ל, כ, מ, ש)
+PREFIX = "[והבלכמש]*"
+
+NUMBER_WORDS = {
+    "אחד": 1, "אחת": 1,
+    "שניים": 2, "שתיים": 2, "שתים": 2, "שני": 2, "שתי": 2,
+    "שלוש": 3, "שלושה": 3,
+    "ארבע": 4, "ארבעה": 4,
+    "חמש": 5, "חמישה": 5,
+}
+NUMBER = r"(?P<value>\d+|" + "|".join(sorted(NUMBER_WORDS, key=len, reverse=True)) + r")"
+SCALE = r"(?:\s*(?:ה?דירוג|ה?ציון|כוכבים)\s*(?:של\s*)?)?"
+
+# operator rules from the planner prompt; "or equal" forms are checked before the strict ones
+OPERATOR_PATTERNS: List[Tuple[str, str]] = [
+    ("gte", r"(?:מעל|יותר מ|גבוה מ)\s*או\s*שווה\s*ל?"),
+    ("lte", r"(?:מתחת|פחות מ|נמוך מ)\s*או\s*שווה\s*ל?"),
+    ("gte", r"לפחות"),
+    ("lte", r"לכל היותר"),
+    ("gt", r"מעל\s*ל?"),
+    ("gt", r"יותר מ"),
+    ("gt", r"גבוה מ"),
+    ("lt", r"מתחת\s*ל?"),
+    ("lt", r"פחות מ"),
+    ("lt", r"נמוך מ"),
+    ("eq", r"בדיוק"),
+    ("eq", r"שווה\s*ל"),
+]
+# "מעל 3 או שווה" is "3 or more"
+OR_EQUAL = {"gt": "gte", "lt": "lte"}
+TRAILING_OPERATORS = {"ומעלה": "gte", "או יותר": "gte", "ומטה": "lte", "או פחות": "lte"}
+
+# an operator, optionally joined to the previous one with ו ("מעל 3 ומתחת ל־5"), and its number
+LEVEL_RE = re.compile(
+    r"(?:^|\s)ו?(?:" + "|".join(f"(?P<op{i}>{pattern})" for i, (_, pattern) in enumerate(OPERATOR_PATTERNS)) + ")"
+    + SCALE + r"\s*[למ]?\s*" + NUMBER + r"(?P<or_equal>\s+או\s+שווה)?(?=\s|$)"
+)
+TRAILING_LEVEL_RE = re.compile(r"(?:^|\s)" + NUMBER + r"\s+(?P<word>" + "|".join(TRAILING_OPERATORS) + r")(?=\s|$)")
+
+# words that mean the question needs the LLM planner
+LLM_CUES = [
+    "למה", "מדוע", "בעיה", "בעיות", "תלונה", "תלונות", "נושא", "נושאים", "מרוצים", "מרוצה",
+    "תסכם", "סכם", "סיכום", "תובנות", "המלצה", "המלצות", "כדאי", "חושבים", "סיבה", "סיבות",
+    "מילה", "מילים", "מכיל", "מכילים", "מכילות", "כולל", "כוללים", "כוללות", "ביטוי",
+    "תאריך", "חודש", "שנה", "שבוע", "אחרונות", "אחרונים", "ממוין", "ממוינות", "מיין", "סדר",
+    "ביותר", "הכי", "מהגבוה", "מהנמוך", "חלק", "שלילי", "שליליות", "חיובי", "חיוביות",
+    # negation and exclusion: "לא קיבלו ציון מעל 3", "חוץ משירות ..."
+    "לא", "אין", "אינו", "אינה", "אינם", "אינן", "אף", "בלי", "חוץ", "מלבד", "למעט", "פרט",
+    # comparing or combining services
+    "השווה", "השוואה", "תשווה", "לעומת", "מול", "בין",
+]
+LLM_CUE_RE = re.compile(r"(?:^|\s)" + PREFIX + "(?:" + "|".join(LLM_CUES) + r")(?=\s|$)")
+# more than one service in the same question ("בשירות X ובשירות Y", "לשירותים X ו־Y", "X או Y")
+SERVICE_WORD_RE = re.compile(r"(?:^|\s)ו?[בלמ]?ה?שירות(?=\s|$)")
+SERVICES_WORD_RE = re.compile(r"(?:^|\s)ו?[בלמ]?ה?שירותים(?=\s|$)")
+# "או" that is not part of an operator ("מעל או שווה ל־3", "3 או יותר")
+OR_RE = re.compile(r"(?:^|\s)או(?!\s+(?:שווה|יותר|פחות)(?:\s|$))(?=\s|$)")
+
+FEEDBACK_WORDS = r"(?:ביקורות|ביקורת|משובים|משוב|פידבקים|פידבק)"
+FEEDBACK_RE = re.compile(r"(?:^|\s)" + PREFIX + FEEDBACK_WORDS + r"(?=\s|$)")
+COUNT_RE = re.compile(r"(?:^|\s)כמה(?=\s|$)")
+AVERAGE_RE = re.compile(r"(?:^|\s)" + PREFIX + r"ממוצע(?=\s|$)")
+RATING_RE = re.compile(r"(?:^|\s)" + PREFIX + r"(?:דירוג|ציון|כוכבים)(?=\s|$)")
+SHOW_RE = re.compile(r"(?:^|\s)(?:תציג|תראה|הצג|הראה|תביא|תן)(?=\s|$)")
+PER_SERVICE_RE = re.compile(r"(?:^|\s)(?:" + PREFIX + r"כל (?:ה)?שירות(?:ים)?|לפי (?:ה)?שירות(?:ים)?)(?=\s|$)")
+
+# the service name runs up to the next word of the grammar
+SERVICE_STOP = (
+    r"(?=\s(?:שקיבלו|שקיבל|שקיבלה|שדורגו|עם|בדירוג|בציון|ש?ה?דירוג|ש?ה?ציון|ו?מעל|ו?מתחת|ו?יותר|ו?פחות|בדיוק|לפחות|לכל|לפי|או|יש"
+    r"|ו[בלמ]?ה?שירות|" + PREFIX + FEEDBACK_WORDS + r")(?:\s|$)|$)"
+)
+SERVICE_RE = re.compile(r"(?:^|\s)(?:של\s+)?[בלמ]?ה?שירות\s+(?P<name>(?!כל\s)\S.*?)" + SERVICE_STOP)
+
+# words that may be left over once the grammar matched, they don't change the plan.
+# anything else (a qualifier like "טובות" or "היום") means the question was not understood
+FILLER_WORDS = {
+    "יש", "ישנן", "ישנם", "לי", "את", "כל", "של", "מה", "הוא", "היא", "עם", "בבקשה",
+    "קיבלו", "שקיבלו", "קיבל", "שקיבל", "קיבלה", "שקיבלה", "דורגו", "שדורגו",
+}
+
+
+def _to_number(token: str) -> Optional[int]:
+    if token.isdigit():
+        return int(token)
+    return NUMBER_WORDS.get(token)
+
+
+# every rating condition with the span it was read from, in the order of the question
+def extract_level_conditions(text: str) -> List[Tuple[str, int, Tuple[int, int]]]:
+    found = []
+    for match in LEVEL_RE.finditer(text):
+        index = next(i for i in range(len(OPERATOR_PATTERNS)) if match.group(f"op{i}") is not None)
+        operator = OPERATOR_PATTERNS[index][0]
+        if match.group("or_equal"):
+            operator = OR_EQUAL.get(operator, operator)
+        found.append((operator, _to_number(match.group("value")), match.span()))
+    taken = [span for _, _, span in found]
+    for match in TRAILING_LEVEL_RE.finditer(text):
+        if any(start < match.end() and match.start() < end for start, end in taken):
+            continue
+        word = " ".join(match.group("word").split())
+        found.append((TRAILING_OPERATORS[word], _to_number(match.group("value")), match.span()))
+    return sorted(found, key=lambda c: c[2])
+
+
+# a name is taken as a service only if each of its words is part of a known service name
+# (with or without its prefix letters, "בויזה" -> "ויזה"). without a loaded service index anything goes
+def _is_known_service(name: str, service_words: Optional[Set[str]]) -> bool:
+    if not service_words:
+        return True
+    for word in normalize_question(name).split():
+        forms = {word, word.lstrip("והבלכמש") or word}
+        if not any(form in known for form in forms for known in service_words):
+            return False
+    return True
+
+
+def _fetch_and_filter(service: Optional[str], conditions: List[Tuple[str, int, Any]]) -> List[Dict[str, Any]]:
+    steps: List[Dict[str, Any]] = [{"fn": "fetch_all_feedbacks"}]
+    if service:
+        steps.append({"fn": "filter_by_service", "args": {"service_name": service}})
+    for operator, value, _ in conditions:
+        steps.append({"fn": "filter_by_level", "args": {"operator": operator, "value": value}})
+    return steps
+
+
+# the words of the question not matched by any part of the grammar
+def _leftover(text: str, spans: List[Tuple[int, int]]) -> List[str]:
+    chars = list(text)
+    for start, end in spans:
+        chars[start:end] = " " * (end - start)
+    return [w for w in "".join(chars).split() if w not in FILLER_WORDS]
+
+
+# a plan is returned only when every word of the question is accounted for: template words,
+# the service name, rating conditions and filler words. anything else goes to the LLM planner.
+def match_question(question: str, service_words: Optional[Set[str]] = None) -> Optional[Tuple[str, Dict[str, Any]]]:
+    # the case is kept: the service name is copied into the plan as written
+    text = normalize_question(question, lower=False)
+    if not text or LLM_CUE_RE.search(text) or OR_RE.search(text) or len(SERVICE_WORD_RE.findall(text)) > 1:
+        return None
+
+    per_service = PER_SERVICE_RE.search(text)
+    if SERVICES_WORD_RE.search(text) and not per_service:
+        return None
+    spans = [per_service.span()] if per_service else []
+
+    service = None
+    if not per_service:
+        match = SERVICE_RE.search(text)
+        if match:
+            service = match.group("name").strip()
+            if not _is_known_service(service, service_words):
+                return None
+            spans.append(match.span())
+
+    conditions = extract_level_conditions(text)
+    spans += [span for _, _, span in conditions]
+    for regex in (FEEDBACK_RE, COUNT_RE, AVERAGE_RE, RATING_RE, SHOW_RE):
+        spans += [m.span() for m in regex.finditer(text)]
+    if _leftover(text, spans):
+        return None
+
+    if AVERAGE_RE.search(text) and RATING_RE.search(text):
+        if not (per_service or service):
+            return None
+        steps = _fetch_and_filter(service, conditions)
+        steps.append({"fn": "group_by_service", "args": {"calc": "avg", "field": "Level"}})
+        steps.append({"fn": "render_table", "args": {"columns": [SERVICE_COLUMN, "avg_Level"]}})
+        return "average_rating", {"steps": steps}
+
+    if not FEEDBACK_RE.search(text):
+        return None
+
+    if COUNT_RE.search(text):
+        steps = _fetch_and_filter(service, conditions)
+        if per_service:
+            steps.append({"fn": "group_by_service", "args": {"calc": "count", "field": "Level"}})
+            steps.append({"fn": "render_table", "args": {"columns": [SERVICE_COLUMN, "count_Level"]}})
+            return "count_per_service", {"steps": steps}
+        steps.append({"fn": "count_records"})
+        steps.append({"fn": "render_table", "args": {"columns": ["total_count"]}})
+        return "count", {"steps": steps}
+
+    if SHOW_RE.search(text) and not per_service:
+        steps = _fetch_and_filter(service, conditions)
+        steps.append({"fn": "render_table", "args": {"columns": TABLE_COLUMNS}})
+        return "list", {"steps": steps}
+
+    return None
+
+
+class FastPathStats:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.templates: Dict[str, int] = {}
+
+    def record(self, template: Optional[str]):
+        with self._lock:
+            if template is None:
+                self.misses += 1
+                return
+            self.hits += 1
+            self.templates[template] = self.templates.get(template, 0) + 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 3) if total else 0.0,
+                "templates": dict(self.templates),
+            }
+
+
+fast_path_stats = FastPathStats()
+
+
+# the words of the service names in the service index, rebuilt when the index is reloaded
+_service_words: Dict[str, Any] = {"names": None, "words": None}
+
+
+def _known_service_words() -> Optional[Set[str]]:
+    if not service_index.loaded:
+        return None
+    if _service_words["names"] is not service_index.names:
+        _service_words["words"] = {w for name in service_index.names for w in normalize_question(name).split()}
+        _service_words["names"] = service_index.names
+    return _service_words["words"]
+
+
+def fast_path_plan(question: str) -> Optional[Dict[str, Any]]:
+    matched = match_question(question, _known_service_words())
+    fast_path_stats.record(matched[0] if matched else None)
+    if matched is None:
+        return None
+    template, plan = matched
+    debug_log(f"fast path '{template}' for '{question}'")
+    return plan
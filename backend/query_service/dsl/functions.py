@@ -1,14 +1,22 @@
 import pandas as pd
 import json
-from typing import Any, Dict, List
-import numpy as np
-from utils.embedding_utils import get_embedding
-from utils.qdrant_utils import search_points, SERVICE_HE_FIELD
-from utils.config import debug_log, QDRANT_COLLECTION
-from utils.llm_utils import call_llm
-from qdrant_client import QdrantClient
-
-qdrant = QdrantClient()
+import asyncio
+from typing import Any, Dict, List, Optional, Tuple
+from utils.embedding_utils import aget_embedding
+from utils.qdrant_utils import asearch_points, ascroll_points, point_row, SERVICE_HE_FIELD, POINT_ID_COLUMN
+from utils.config import (
+    debug_log, SEMANTIC_CHUNK_TOKENS, SEMANTIC_CHARS_PER_TOKEN, SEMANTIC_MAP_CONCURRENCY,
+    SEMANTIC_RETRIES, SEMANTIC_RETRY_BACKOFF_SECONDS,
+    SEMANTIC_SEARCH_PAGE_SIZE, SEMANTIC_SEARCH_MAX_RESULTS, SEMANTIC_HAS_ID_LIMIT,
+)
+from utils.llm_utils import acall_llm, acall_llm_stream
+from query_service.dsl.events import emit, is_streaming, current_step
+from query_service.dsl.schema_library import schema_library
+from qdrant_client.models import Filter, HasIdCondition
+from query_service.dsl.snapshot import feedback_snapshot
+from query_service.dsl.table import feedback_table, FEEDBACK_FIELDS
+from query_service.dsl.text_index import normalize_text
+from utils.service_index import service_index
 
 # make sure the context is a DataFrame
 def ensure_df(data: Any) -> pd.DataFrame:
@@ -20,17 +28,21 @@ def ensure_df(data: Any) -> pd.DataFrame:
 
 # ----------------------fatch and filter----------------------------------- #
 
-# get all feedbacks from Qdrant
-def fetch_all_feedbacks(limit: int = 10000) -> pd.DataFrame:
-    debug_log(f"Fetching feedbacks...")
-    results = qdrant.scroll(
-        collection_name=QDRANT_COLLECTION,
-        scroll_filter=None,
-        limit=limit,
-        with_payload=True,
-    )
-    points = results[0]
-    df = pd.DataFrame([p.payload for p in points])
+# functions that wait on Qdrant / embeddings / the LLM are async, the executor awaits them.
+# pandas-only functions stay sync, they are short CPU work.
+
+# get all feedbacks, from the in-memory snapshot when possible
+# `query_filter` is set by the planner when leading filter steps were pushed down to Qdrant,
+# in that case only the matching points are scanned from Qdrant, with only the payload fields in `columns`
+async def fetch_all_feedbacks(limit: int = None, query_filter: Filter = None, columns: List[str] = None) -> pd.DataFrame:
+    if query_filter is None:
+        df = await feedback_snapshot.get()
+    else:
+        debug_log(f"Fetching feedbacks with filter: {query_filter}")
+        fields = columns or FEEDBACK_FIELDS
+        df = feedback_table([point_row(p) async for p in ascroll_points(query_filter=query_filter, with_payload=fields)], fields)
+    if limit:
+        df = df.head(limit)
     debug_log(f"Fetched {len(df)} rows")
     return df
 
@@ -44,31 +56,38 @@ def filter_by_level(data: pd.DataFrame, operator: str, value: int) -> pd.DataFra
         "gte": df["Level"] >= value,
         "gt": df["Level"] > value,
     }
-    filtered = df[ops[operator]].copy()
+    # rows without a Level compare as NA, they never match
+    filtered = df[ops[operator].fillna(False)].copy()
     debug_log(f"{len(filtered)}/{len(df)} rows after Level {operator} {value}")
     return filtered
 
 # find the correct service name using semantic search
-def resolve_service_name(service_name: str, top_k: int = 3):
+async def resolve_service_name(service_name: str, top_k: int = 3):
     debug_log(f"finding semantecly that correct service name using user query:'{service_name}'")
-    vector = get_embedding(service_name)
+    vector = await aget_embedding(service_name, use="service")
     if not vector:
         debug_log("failed to create embedding")
         return []
 
-    results = search_points(vector, vector_name="service_vector", top_k=top_k)
-    names = [
-        r.payload.get(SERVICE_HE_FIELD)
-        for r in results
-        if r.payload and r.payload.get(SERVICE_HE_FIELD)
-    ]
+    # one vector per service in memory; the per-feedback search is only used when there is no index yet
+    matches = await service_index.search(vector, top_k=top_k)
+    if matches is not None:
+        debug_log(f"service index matches: {matches}")
+        names = [name for name, _ in matches]
+    else:
+        results = await asearch_points(vector, vector_name="service_vector", top_k=top_k)
+        names = list(dict.fromkeys(
+            r.payload.get(SERVICE_HE_FIELD)
+            for r in results
+            if r.payload and r.payload.get(SERVICE_HE_FIELD)
+        ))
     debug_log(f"found the service name:: {names}" if names else f"no match for '{service_name}'")
     return names
 
 # filter feedbacks by service name
-def filter_by_service(data: pd.DataFrame, service_name: str) -> pd.DataFrame:
+async def filter_by_service(data: pd.DataFrame, service_name: str) -> pd.DataFrame:
     df = ensure_df(data)
-    resolved_names = resolve_service_name(service_name)
+    resolved_names = await resolve_service_name(service_name)
 
     if resolved_names:
         filtered = df[df["service_demended_hebrew"].isin(resolved_names)]
@@ -79,69 +98,160 @@ def filter_by_service(data: pd.DataFrame, service_name: str) -> pd.DataFrame:
     return filtered
 
 # filter feedbacks by text containing keyword
-def filter_by_text_contains(data: pd.DataFrame, keyword: str) -> pd.DataFrame:
+# `keyword` can be a phrase, `keywords` adds more terms, `match` is "any" or "all" of them.
+# a row matches when its normalized text (lower case, no niqqud, punctuation as spaces) contains the
+# normalized term. with a fresh snapshot the full-text index finds those rows, otherwise they are scanned.
+async def filter_by_text_contains(data: pd.DataFrame, keyword: str = None, keywords: List[str] = None, match: str = "any") -> pd.DataFrame:
     df = ensure_df(data)
-    mask = df["text"].astype(str).str.contains(keyword, case=False, na=False)
-    debug_log(f"filtered by keyword '{keyword}': {mask.sum()} matches")
+    terms = [t for t in ([keyword] if keyword else []) + list(keywords or []) if t and normalize_text(t)]
+    if not terms or df.empty:
+        return df
+
+    ids = None
+    if POINT_ID_COLUMN in df.columns and await feedback_snapshot.is_fresh() and feedback_snapshot.text_index is not None:
+        ids = feedback_snapshot.text_index.search(terms, match=match)
+
+    if ids is not None:
+        mask = df[POINT_ID_COLUMN].astype(str).isin(ids)
+    else:
+        text = df["text"].map(normalize_text)
+        masks = [text.str.contains(normalize_text(t), regex=False, na=False) for t in terms]
+        mask = masks[0]
+        for m in masks[1:]:
+            mask = (mask & m) if match == "all" else (mask | m)
+
+    debug_log(f"filtered by keywords {terms} ({match}{', index' if ids is not None else ''}): {int(mask.sum())} matches")
     return df[mask].copy()
 
 # filter feedbacks by text containing keyword using semantic search
-def filter_by_text_semantic(context, query: str):
+# only the rows of the context are ranked, Qdrant returns ids and scores and the rows come from the context:
+#   - up to SEMANTIC_HAS_ID_LIMIT rows: searches with a has_id filter on their point ids, like
+#     _semantic_search_global: a probe for the best SEMANTIC_MIN_RESULTS rows, then a search with
+#     score_threshold at the lowest threshold _select_scores can use, so Qdrant drops the rest
+#   - bigger contexts: the global ranking is paged and every page is intersected with the context,
+#     until the scores fall below the lowest possible threshold (or SEMANTIC_SEARCH_MAX_RESULTS hits)
+# the rows kept: score >= 80% of the best context score (72% when that leaves fewer than 5 rows),
+# and never fewer than the best SEMANTIC_MIN_RESULTS rows.
+SEMANTIC_RELATIVE_THRESHOLD = 0.80
+SEMANTIC_FALLBACK_FACTOR = 0.90
+SEMANTIC_MIN_RESULTS = 20
+
+
+async def filter_by_text_semantic(context, query: str):
     df = ensure_df(context)
     query = (query or "").strip()
     if not query:
         return df
+    if df.empty:
+        return df.head(0)
 
-
-    q_vec = get_embedding(query, input_type="query")
+    q_vec = await aget_embedding(query, input_type="query", use="text")
     if not q_vec:
         return df.head(0)
 
-    TOP_K = 1500
+    ids = df[POINT_ID_COLUMN].dropna().astype(str).tolist() if POINT_ID_COLUMN in df.columns else []
+    if not ids:
+        return await _semantic_search_global(df, q_vec)
 
-    res = search_points(
-        vector=q_vec,
+    if len(ids) <= SEMANTIC_HAS_ID_LIMIT:
+        scores = await _context_scores_filtered(q_vec, ids)
+    else:
+        scores = await _context_scores_paged(q_vec, set(ids))
+
+    scores, threshold = _select_scores(scores)
+    filtered = df[df[POINT_ID_COLUMN].astype(str).isin(scores.keys())].copy()
+    filtered["score"] = filtered[POINT_ID_COLUMN].astype(str).map(scores)
+    debug_log(f"semantic filter '{query}': {len(filtered)}/{len(df)} rows (threshold {threshold:.3f})")
+    return filtered.sort_values(by="score", ascending=False).reset_index(drop=True)
+
+
+# keep the scores above the relative threshold: (point id -> score, threshold used)
+def _select_scores(scores: Dict[str, float]) -> Tuple[Dict[str, float], float]:
+    if not scores:
+        return {}, 0.0
+    ranked = sorted(scores.items(), key=lambda x: x[1], reverse=True)
+    threshold = ranked[0][1] * SEMANTIC_RELATIVE_THRESHOLD
+    selected = [x for x in ranked if x[1] >= threshold]
+    if len(selected) < 5:
+        threshold *= SEMANTIC_FALLBACK_FACTOR
+        selected = [x for x in ranked if x[1] >= threshold]
+    if len(selected) < SEMANTIC_MIN_RESULTS:
+        selected = ranked[:SEMANTIC_MIN_RESULTS]
+    return dict(selected), threshold
+
+
+# scores of the context points, searched with the id filter. the probe gives the best score (and the
+# SEMANTIC_MIN_RESULTS rows kept in any case), the second search only returns scores above the floor
+async def _context_scores_filtered(q_vec, ids: List[str]) -> Dict[str, float]:
+    id_filter = Filter(must=[HasIdCondition(has_id=ids)])
+    probe = await asearch_points(
+        q_vec,
         vector_name="text_vector",
-        top_k=TOP_K
+        top_k=min(len(ids), SEMANTIC_MIN_RESULTS),
+        query_filter=id_filter,
+        with_payload=False,
+    )
+    scores = {str(r.id): float(r.score) for r in probe}
+    if not probe or len(probe) >= len(ids):
+        return scores
+    floor = float(probe[0].score) * SEMANTIC_RELATIVE_THRESHOLD * SEMANTIC_FALLBACK_FACTOR
+    hits = await asearch_points(
+        q_vec,
+        vector_name="text_vector",
+        top_k=min(len(ids), SEMANTIC_SEARCH_MAX_RESULTS),
+        query_filter=id_filter,
+        score_threshold=floor,
+        with_payload=False,
+    )
+    scores.update((str(r.id), float(r.score)) for r in hits)
+    return scores
+
+
+# scores of the context points, read from the global ranking page by page (no id list is sent).
+# the first context hit is the best one, so the lowest threshold _select_scores can use is known from it
+async def _context_scores_paged(q_vec, ids: set) -> Dict[str, float]:
+    scores: Dict[str, float] = {}
+    floor = None
+    offset = 0
+    while len(scores) < SEMANTIC_SEARCH_MAX_RESULTS:
+        page = await asearch_points(
+            q_vec,
+            vector_name="text_vector",
+            top_k=SEMANTIC_SEARCH_PAGE_SIZE,
+            offset=offset,
+            with_payload=False,
+        )
+        offset += len(page)
+        for r in page:
+            if str(r.id) in ids:
+                scores[str(r.id)] = float(r.score)
+                if floor is None:
+                    floor = float(r.score) * SEMANTIC_RELATIVE_THRESHOLD * SEMANTIC_FALLBACK_FACTOR
+        if len(page) < SEMANTIC_SEARCH_PAGE_SIZE:
+            break
+        if floor is not None and len(scores) >= SEMANTIC_MIN_RESULTS and float(page[-1].score) < floor:
+            break
+    return scores
+
+
+# context without point ids (e.g. built by hand): search the whole collection and return the hits
+async def _semantic_search_global(df: pd.DataFrame, q_vec) -> pd.DataFrame:
+    best = await asearch_points(q_vec, vector_name="text_vector", top_k=1, with_payload=False)
+    if not best:
+        return df.head(0)
+    threshold = float(best[0].score) * 0.80
+    res = await asearch_points(
+        q_vec,
+        vector_name="text_vector",
+        top_k=SEMANTIC_SEARCH_MAX_RESULTS,
+        score_threshold=threshold,
+        with_payload=FEEDBACK_FIELDS,
     )
-
     if not res:
         return df.head(0)
-
-
-    scored = [(r, float(getattr(r, "score", 0.0))) for r in res]
-    scored.sort(key=lambda x: x[1], reverse=True)
-
-    scores = [s for (_, s) in scored]
-    max_score = scores[0]
-
-    threshold = max_score * 0.80
-
-    filtered = [(r, s) for (r, s) in scored if s >= threshold]
-
-    if len(filtered) < 5:
-        threshold *= 0.90
-        filtered = [(r, s) for (r, s) in scored if s >= threshold]
-
-    MIN_RESULTS = 20
-    if len(filtered) < MIN_RESULTS:
-        filtered = scored[:MIN_RESULTS]
-
-    rows = []
-    for r, s in filtered:
-        payload = r.payload or {}
-        rows.append({
-            "ID": payload.get("ID"),
-            "text": payload.get("text"),
-            "Level": payload.get("Level"),
-            "service_demended_hebrew": payload.get("service_demended_hebrew"),
-            "CreationDate": payload.get("CreationDate"),
-            "score": s,
-        })
-
-    new_df = pd.DataFrame(rows).sort_values(by="score", ascending=False).reset_index(drop=True)
-
-    return new_df
+    found = feedback_table(point_row(r) for r in res)
+    found["score"] = [float(r.score) for r in res]
+    return found.sort_values(by="score", ascending=False).reset_index(drop=True)
 
 # group feedbacks by service and apply aggregation
 def group_by_service(data: pd.DataFrame, calc: str = "count", field: str = "Level"):
@@ -161,14 +271,14 @@ def group_by_service(data: pd.DataFrame, calc: str = "count", field: str = "Leve
 
     if calc == "none":
         grouped = (
-            df.groupby("service_demended_hebrew")[field]
+            df.groupby("service_demended_hebrew", observed=True)[field]
               .apply(list)
               .reset_index()
               .rename(columns={field: f"{field}_list"})
         )
     elif calc in agg_map:
         grouped = (
-            df.groupby("service_demended_hebrew")[field]
+            df.groupby("service_demended_hebrew", observed=True)[field]
               .agg(agg_map[calc])
               .reset_index()
               .rename(columns={field: f"{calc}_{field}"})
@@ -206,7 +316,7 @@ def filter_by_value(data: pd.DataFrame, field: str, operator: str, value: float)
         "gte": df[field] >= value,
         "gt": df[field] > value,
     }
-    filtered = df[ops[operator]].copy()
+    filtered = df[ops[operator].fillna(False)].copy()
     debug_log(f"{len(filtered)} rows after {field} {operator} {value}")
     return filtered
 
@@ -224,58 +334,68 @@ def get_texts(df):
 
 # -----------------------llm and semantic functions---------------------------------- #
 
-def semantic_dynamic(context=None, prompt: str = "", texts: List[str] = None):
-
-    if texts is None:
-        if isinstance(context, dict) and "texts" in context:
-            texts = context["texts"]
-        elif isinstance(context, dict) and "data" in context:
-            df = ensure_df(context["data"])
-            texts = df["text"].dropna().astype(str).tolist()
-        elif hasattr(context, "to_dict"):
-            df = ensure_df(context)
-            texts = df["text"].dropna().astype(str).tolist()
-        else:
+# the answer LLM call; on a streaming request every piece of the answer is sent as a token event,
+# with the step it is answering (DAG branches can stream at the same time)
+async def _answer_llm(messages, max_tokens: int) -> str:
+    if not is_streaming():
+        return await acall_llm(messages, max_tokens=max_tokens)
+    parts = []
+    step = current_step()
+    async for token in acall_llm_stream(messages, max_tokens=max_tokens):
+        parts.append(token)
+        emit("token", {"text": token, "step": step})
+    return "".join(parts).strip()
+
+
+def _extract_texts(context) -> Optional[List[str]]:
+    if isinstance(context, dict) and "texts" in context:
+        return context["texts"]
+    if isinstance(context, dict) and "data" in context:
+        df = ensure_df(context["data"])
+        return df["text"].dropna().astype(str).tolist()
+    if hasattr(context, "to_dict"):
+        df = ensure_df(context)
+        return df["text"].dropna().astype(str).tolist()
+    return None
+
+
+async def semantic_dynamic(context=None, prompt: str = "", texts: List[str] = None):
+
+    # the answer schema comes from the schema library (or the LLM for unknown questions),
+    # it is looked up while the texts are extracted and chunked
+    schema_task = asyncio.create_task(schema_library.get_schema(prompt))
+    try:
+        if texts is None:
+            texts = await asyncio.to_thread(_extract_texts, context)
+
+        if not texts:
             return {"error": "לא נמצאו טקסטים לניתוח"}
 
-    if not texts:
-        return {"error": "לא נמצאו טקסטים לניתוח"}
-
-    joined_texts = "\n".join(texts)
-
-    schema_system = (
-        "You are a Schema Planning LLM. "
-        "You receive a Hebrew question from the user. "
-        "Your task: design the IDEAL JSON structure for the answer. "
-        "The schema must:\n"
-        "1. Be a valid JSON.\n"
-        "2. Define all keys the second LLM should return.\n"
-        "3. Define value types: string, number, list[string], list[number], object, list[object].\n"
-        "4. Be minimal but expressive.\n"
-        "5. Never include markdown or code fences.\n"
-        "6. Return ONLY the schema JSON.\n"
-    )
+        chunks = await asyncio.to_thread(chunk_texts, texts)
 
-    schema_user = f"""
-    השאלה של המשתמש:
-    "{prompt}"
+        try:
+            schema = await schema_task
+        except Exception as e:
+            return {"error": f"Schema creation failed: {e}"}
+    finally:
+        # no texts, or extracting them raised: the schema lookup is not needed anymore
+        if not schema_task.done():
+            schema_task.cancel()
 
-    צור סכמה אידיאלית (JSON) עבור התשובה לשאלה הזאת.
-    """
+    if len(chunks) == 1:
+        answer_raw = ""
+        try:
+            answer_raw = await _answer_llm(_analyst_messages(prompt, schema, chunks[0]), max_tokens=100000)
+            return _parse_json(answer_raw)
+        except Exception as e:
+            return {"error": f"Answer creation failed: {e}", "raw": answer_raw}
 
-    schema_messages = [
-        {"role": "system", "content": schema_system},
-        {"role": "user", "content": schema_user}
-    ]
+    return await _map_reduce(prompt, schema, chunks)
 
-    try:
-        schema_raw = call_llm(schema_messages, max_tokens=90000)
-        schema_clean = schema_raw.strip().replace("```json", "").replace("```", "").strip()
-        schema = json.loads(schema_clean)
-    except Exception as e:
-        return {"error": f"Schema creation failed: {e}", "raw": schema_raw}
 
-    analyst_system = (
+# ---- map-reduce over large text sets ---- #
+
+ANALYST_SYSTEM = (
 """
 You are an advanced Hebrew-speaking analytics engine.
 
@@ -324,32 +444,168 @@ Do NOT return keys in Hebrew unless they represent user-facing data.
 Do NOT invent your own inconsistent structure. Follow the templates.
 """
 
-    )
+)
+
+
+def _parse_json(raw: str):
+    return json.loads(raw.strip().replace("```json", "").replace("```", "").strip())
+
 
+# split the texts into chunks that fit the analyst token budget, nothing is dropped.
+# tokens are estimated from the length (Hebrew is roughly SEMANTIC_CHARS_PER_TOKEN chars per token)
+def chunk_texts(texts: List[str], max_tokens: int = SEMANTIC_CHUNK_TOKENS) -> List[str]:
+    budget = max(int(max_tokens * SEMANTIC_CHARS_PER_TOKEN), 1)
+    chunks, current, size = [], [], 0
+    for text in texts:
+        # a single text longer than the whole budget is cut into budget sized pieces
+        pieces = [text[i:i + budget] for i in range(0, len(text), budget)] or [""]
+        for piece in pieces:
+            if current and size + len(piece) + 1 > budget:
+                chunks.append("\n".join(current))
+                current, size = [], 0
+            current.append(piece)
+            size += len(piece) + 1
+    if current:
+        chunks.append("\n".join(current))
+    return chunks
+
+
+def _analyst_messages(prompt: str, schema, texts_block: str, part: str = ""):
     analyst_user = f"""
     השאלה: "{prompt}"
 
     הסכמה:
     {json.dumps(schema, ensure_ascii=False)}
 
-    הטקסטים לניתוח:
-    {joined_texts[:50000]} 
+    {part}הטקסטים לניתוח:
+    {texts_block} 
 
     החזר JSON תקני התואם בדיוק את הסכמה.
     """
-
-    analyst_messages = [
-        {"role": "system", "content": analyst_system},
+    return [
+        {"role": "system", "content": ANALYST_SYSTEM},
         {"role": "user", "content": analyst_user},
     ]
 
+
+def _reduce_messages(prompt: str, schema, partials: List[Any]):
+    reduce_user = f"""
+    השאלה: "{prompt}"
+
+    הסכמה:
+    {json.dumps(schema, ensure_ascii=False)}
+
+    הטקסטים חולקו ל-{len(partials)} חלקים וכל חלק נותח בנפרד. אלה תוצאות הניתוח החלקיות:
+    {json.dumps(partials, ensure_ascii=False)}
+
+    מזג את התוצאות החלקיות לתשובה אחת על כל הטקסטים:
+    - אחד פריטים זהים או דומים וחבר את הספירות והמספרים שלהם.
+    - שמור על הנושאים / הבעיות החשובים ביותר לפי השכיחות הכוללת.
+    - סכם מחדש את שדות הסיכום כך שיתייחסו לכל הטקסטים.
+
+    החזר JSON תקני התואם בדיוק את הסכמה.
+    """
+    return [
+        {"role": "system", "content": ANALYST_SYSTEM},
+        {"role": "user", "content": reduce_user},
+    ]
+
+
+# one analyst call whose answer must be JSON
+async def _llm_json(messages):
+    return _parse_json(await acall_llm(messages, max_tokens=100000))
+
+
+# retries a failed (or unparsable) LLM answer, None when every attempt failed
+async def _retrying(what: str, call):
+    for attempt in range(SEMANTIC_RETRIES + 1):
+        try:
+            return await call()
+        except Exception as e:
+            debug_log(f"{what} failed (attempt {attempt + 1}/{SEMANTIC_RETRIES + 1}): {e}")
+            if attempt < SEMANTIC_RETRIES:
+                await asyncio.sleep(SEMANTIC_RETRY_BACKOFF_SECONDS * (attempt + 1))
+    return None
+
+
+# map: analyze every chunk concurrently (bounded), reduce: merge the partial JSON answers.
+# if the partial answers are too big for one reduce call they are merged in groups, level by level.
+# failed calls are retried; chunks that still could not be analyzed are listed in the answer's
+# "coverage", so a partial answer never looks like an answer about all the texts.
+async def _map_reduce(prompt: str, schema, chunks: List[str]):
+    semaphore = asyncio.Semaphore(SEMANTIC_MAP_CONCURRENCY)
+    done = 0
+    debug_log(f"semantic map-reduce over {len(chunks)} chunks (concurrency {SEMANTIC_MAP_CONCURRENCY})")
+
+    async def analyze(i: int, block: str):
+        nonlocal done
+        async with semaphore:
+            messages = _analyst_messages(prompt, schema, block, f"(חלק {i + 1} מתוך {len(chunks)} של הטקסטים) ")
+            result = await _retrying(f"chunk {i + 1}/{len(chunks)}", lambda: _llm_json(messages))
+            done += 1
+            emit("map_progress", {"done": done, "total": len(chunks)})
+            return result
+
+    results = await asyncio.gather(*(analyze(i, c) for i, c in enumerate(chunks)))
+    # (numbers of the chunks a partial answer covers, partial answer)
+    partials = [([i], r) for i, r in enumerate(results) if r is not None]
+    if not partials:
+        return {"error": "Answer creation failed: all chunks failed"}
+
+    budget = int(SEMANTIC_CHUNK_TOKENS * SEMANTIC_CHARS_PER_TOKEN)
+    while True:
+        groups = _group_partials(partials, budget)
+        if len(groups) == 1:
+            break
+        merged = await asyncio.gather(*(
+            _reduce(prompt, schema, [p for _, p in g], final=False, semaphore=semaphore) for g in groups
+        ))
+        partials = [([i for ids, _ in g for i in ids], m) for g, m in zip(groups, merged) if m is not None]
+        if not partials:
+            return {"error": "Answer creation failed: reduce step failed"}
+
+    answer = await _reduce(prompt, schema, [p for _, p in partials], final=True, semaphore=semaphore)
+    if answer is None:
+        return {"error": "Answer creation failed: reduce step failed"}
+
+    covered = {i for ids, _ in partials for i in ids}
+    failed = [i + 1 for i in range(len(chunks)) if i not in covered]
+    if failed:
+        debug_log(f"{len(failed)}/{len(chunks)} chunks could not be analyzed")
+        if not isinstance(answer, dict):
+            answer = {"answer": answer}
+        answer["coverage"] = {"chunks": len(chunks), "analyzed": len(chunks) - len(failed), "failed_chunks": failed}
+    return answer
+
+
+def _group_partials(partials: List[Any], budget: int) -> List[List[Any]]:
+    groups, current, size = [], [], 0
+    for p in partials:
+        length = len(json.dumps(p[1], ensure_ascii=False))
+        # a group needs at least two partials to make progress
+        if len(current) >= 2 and size + length > budget:
+            groups.append(current)
+            current, size = [], 0
+        current.append(p)
+        size += length
+    if current:
+        groups.append(current)
+    return groups
+
+
+async def _reduce(prompt: str, schema, partials: List[Any], final: bool, semaphore: asyncio.Semaphore):
+    if len(partials) == 1 and not final:
+        return partials[0]
+    messages = _reduce_messages(prompt, schema, partials)
+    if not final:
+        async with semaphore:
+            return await _retrying(f"reduce of {len(partials)} partial answers", lambda: _llm_json(messages))
+    # the final answer may be streamed to the client already, it is not retried
     try:
-        answer_raw = call_llm(analyst_messages, max_tokens=100000)
-        answer_clean = answer_raw.strip().replace("```json", "").replace("```", "").strip()
-        answer = json.loads(answer_clean)
-        return answer
+        return _parse_json(await _answer_llm(messages, max_tokens=100000))
     except Exception as e:
-        return {"error": f"Answer creation failed: {e}", "raw": answer_raw}
+        debug_log(f"reduce of {len(partials)} partial answers failed: {e}")
+        return None
 
 
 # ------------------------rendering result--------------------------------- #
@@ -365,14 +621,16 @@ def render_table(context, columns=None):
         debug_log("⚠️ אין נתונים להצגה")
         return {"type": "table", "data": []}
 
+    # point ids are internal, they are only shown when asked for
     if not columns:
-        columns = df.columns.tolist()
+        columns = [c for c in df.columns if c != POINT_ID_COLUMN]
 
     existing_cols = [c for c in columns if c in df.columns]
     df = df[existing_cols]
 
     debug_log(f"מציג {len(df)} שורות × {len(df.columns)} עמודות")
-    return {"type": "table", "data": df.to_dict(orient="records")}
+    # through JSON so typed columns come out as plain values: NA -> None, dates -> ISO strings
+    return {"type": "table", "data": json.loads(df.to_json(orient="records", date_format="iso", force_ascii=False))}
 
 
 # render text summary
@@ -383,7 +641,7 @@ def render_text(context=None, **kwargs):
         if "type" in context:
             return context
 
-        if any(k in context for k in ["summary", "main_issues", "recommendations", "sentiment", "topics"]):
+        if any(k in context for k in ["summary", "main_issues", "recommendations", "sentiment", "topics", "comparison"]):
             return context
 
         return {"type": "text", "content": str(context)}
@@ -399,6 +657,25 @@ def render_text(context=None, **kwargs):
 
 
 
+# join the results of several branches of a plan. tables are stacked with a `branch` column,
+# anything else (semantic answers) becomes {"comparison": {label: result}}
+def join_results(*contexts, labels: List[str] = None):
+    labels = list(labels or [])
+    labels += [f"branch_{i + 1}" for i in range(len(labels), len(contexts))]
+
+    if contexts and all(isinstance(c, pd.DataFrame) for c in contexts):
+        frames = [c.assign(branch=label) for c, label in zip(contexts, labels)]
+        joined = pd.concat(frames, ignore_index=True)
+        return joined[["branch"] + [c for c in joined.columns if c != "branch"]]
+
+    comparison = {}
+    for c, label in zip(contexts, labels):
+        if isinstance(c, pd.DataFrame):
+            c = json.loads(c.to_json(orient="records", date_format="iso", force_ascii=False))
+        comparison[label] = c
+    return {"comparison": comparison}
+
+
 # ----------------------functuins dic----------------------------------- #
 
 DSL_FUNCTIONS = {
@@ -416,4 +693,5 @@ DSL_FUNCTIONS = {
     "count_records": count_records,
     "semantic_dynamic": semantic_dynamic,
     "filter_by_text_semantic": filter_by_text_semantic,
+    "join_results": join_results,
 }
@@ -1,6 +1,9 @@
 import json
 from typing import Dict, Any
-from utils.llm_utils import call_llm
+from utils.llm_utils import acall_llm
+from query_service.dsl.plan_cache import plan_cache
+from query_service.dsl.fast_path import fast_path_plan
+from utils.config import FAST_PATH_ENABLED
 
 interpreter_dsl_prompt = """
 You are a **DSL Planning Engine** for a government feedback-analysis system.
@@ -66,8 +69,10 @@ SUPPORTED FUNCTIONS (USE ONLY THESE)
   (semantic service resolution)
 
 
-- filter_by_text_contains(keyword: str)
+- filter_by_text_contains(keyword: str, keywords: List[str] = None, match: str = "any")
   → literal keyword search inside the text field.
+  → keyword may be a phrase of several words ("הודעת שגיאה").
+  → for several keywords pass them in keywords, match="any" (one of them) or "all" (all of them).
   → Use ONLY when the user explicitly mentions exact words 
     that must appear, e.g. “המילה 404”, “בטקסט מופיעה המילה”.
 
@@ -97,6 +102,10 @@ SUPPORTED FUNCTIONS (USE ONLY THESE)
 - render_table(columns: List[str])
 - render_text()
 
+# Branches (comparisons only)
+- join_results(labels: List[str])
+  → joins the results of several branches, see COMPARISONS below.
+
 ===========================================================
 OPERATOR RULES (STRICT)
 ===========================================================
@@ -174,7 +183,7 @@ semantic_dynamic ALWAYS follows:
 ]
 
 Rules:
-1. EXACTLY ONE semantic_* function per plan.  
+1. EXACTLY ONE semantic_* function per plan (per branch in a comparison, see COMPARISONS).
 2. It MUST come AFTER get_texts().  
 3. Final step MUST be render_text().
 
@@ -263,6 +272,38 @@ User: "מה הנושא השלילי העיקרי בשירות שינוי כתו
   ]
 }
 
+===========================================================
+COMPARISONS (BRANCHES)
+===========================================================
+
+When the user compares two or more groups ("השווה בין שירות X לשירות Y",
+"מה ההבדל בין ביקורות נמוכות לגבוהות"), build ONE plan with branches:
+
+- Give steps an "id".
+- A step reads the step before it by default; use "inputs": ["<id>"] to read another step.
+- Each group gets its own branch of filters (+ get_texts + semantic_dynamic).
+- join_results takes the branch results in "inputs" and labels them in the same order.
+- The last step renders the joined result (render_text for semantic branches,
+  render_table for counts / groups).
+
+User: "השווה את התלונות בשירות שינוי כתובת ובשירות חידוש ויזה"
+
+{
+  "steps": [
+    {"id": "all", "fn": "fetch_all_feedbacks"},
+    {"id": "a", "fn": "filter_by_service", "inputs": ["all"], "args": {"service_name": "שינוי כתובת"}},
+    {"id": "a_texts", "fn": "get_texts", "inputs": ["a"]},
+    {"id": "a_answer", "fn": "semantic_dynamic", "inputs": ["a_texts"], "args": {"prompt": "מה התלונות העיקריות בשירות שינוי כתובת?"}},
+    {"id": "b", "fn": "filter_by_service", "inputs": ["all"], "args": {"service_name": "חידוש ויזה"}},
+    {"id": "b_texts", "fn": "get_texts", "inputs": ["b"]},
+    {"id": "b_answer", "fn": "semantic_dynamic", "inputs": ["b_texts"], "args": {"prompt": "מה התלונות העיקריות בשירות חידוש ויזה?"}},
+    {"id": "joined", "fn": "join_results", "inputs": ["a_answer", "b_answer"], "args": {"labels": ["שינוי כתובת", "חידוש ויזה"]}},
+    {"fn": "render_text", "inputs": ["joined"]}
+  ]
+}
+
+Questions about a single group MUST stay linear (no "id", no "inputs").
+
 ===========================================================
 FINAL REQUIREMENT
 ===========================================================
@@ -281,21 +322,33 @@ NO extra text.
 
 
 
-def interpret_question_to_dsl(question: str) -> Dict[str, Any]:
+async def interpret_question_to_dsl(question: str) -> Dict[str, Any]:
 
     print(f"Interpreting user question: {question}")
 
+    if FAST_PATH_ENABLED:
+        plan = fast_path_plan(question)
+        if plan is not None:
+            print(f"dsl from fast path, {len(plan['steps'])} steps.")
+            return plan
+
+    cached = await plan_cache.get(question)
+    if cached is not None:
+        print(f"dsl plan from cache, {len(cached['steps'])} steps.")
+        return cached
+
     messages = [
         {"role": "system", "content": interpreter_dsl_prompt},
         {"role": "user", "content": question},
     ]
 
-    result = call_llm(messages, max_tokens=9000)
+    result = await acall_llm(messages, max_tokens=9000)
 
     try:
         plan = json.loads(result)
         assert "steps" in plan, "Missing 'steps' key in JSON"
         print(f"dsl was created {len(plan['steps'])} steps generated.")
+        await plan_cache.put(question, plan)
         return plan
 
     except Exception as e:
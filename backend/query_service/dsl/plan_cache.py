@@ -0,0 +1,229 @@
+import re
+import copy
+import time
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+import numpy as np
+from utils.embedding_utils import aget_embedding
+from utils.config import (
+    PLAN_CACHE_SIZE,
+    PLAN_CACHE_TTL_SECONDS,
+    PLAN_CACHE_SEMANTIC_THRESHOLD,
+    PLAN_CACHE_SEMANTIC,
+    debug_log,
+)
+
+NIQQUD = re.compile(r"[֑-ׇ]")
+NON_WORD = re.compile(r"[^\w\s]")
+NUMBERS = re.compile(r"\d+(?:\.\d+)?")
+# plan args that name what the question is about (a service, a keyword, a search query, a prompt)
+ENTITY_ARGS = ("service_name", "keyword", "keywords", "query", "labels", "prompt")
+# a Hebrew word may carry up to two prefix letters (ו, ה, ב, ל, כ, מ, ש) before the entity
+ENTITY_PREFIX = "[והבלכמש]{0,2}"
+
+
+# same question, different spelling: case, niqqud, punctuation and extra spaces are ignored
+# (lower=False keeps the case, for text that is copied into plan args)
+def normalize_question(question: str, lower: bool = True) -> str:
+    text = unicodedata.normalize("NFKC", question or "")
+    if lower:
+        text = text.lower()
+    text = NIQQUD.sub("", text)
+    text = NON_WORD.sub(" ", text)
+    return " ".join(text.split())
+
+
+# normalized entity args of a plan. a prompt that is the question itself is left out,
+# a semantic hit replaces it with the new question
+def plan_entities(plan: Dict[str, Any], question_key: str) -> List[str]:
+    values = []
+    for step in plan.get("steps", []):
+        for name, value in (step.get("args") or {}).items():
+            if name not in ENTITY_ARGS:
+                continue
+            for v in value if isinstance(value, list) else [value]:
+                if not isinstance(v, str):
+                    continue
+                v = normalize_question(v)
+                if v and not (name == "prompt" and v == question_key):
+                    values.append(v)
+    return values
+
+
+def mentions(key: str, entity: str) -> bool:
+    return re.search(rf"(?:^|\s){ENTITY_PREFIX}{re.escape(entity)}(?:\s|$)", key) is not None
+
+
+# the prompt of a reused plan is the new question, like the planner would have written it
+def with_question(plan: Dict[str, Any], cached_key: str, question: str) -> Dict[str, Any]:
+    for step in plan.get("steps", []):
+        args = step.get("args") or {}
+        if isinstance(args.get("prompt"), str) and normalize_question(args["prompt"]) == cached_key:
+            args["prompt"] = question
+    return plan
+
+
+class _Entry:
+    def __init__(self, question: str, plan: Dict[str, Any], vector, pinned: bool):
+        self.question = question
+        self.plan = plan
+        self.vector = vector
+        self.pinned = pinned
+        self.entities = plan_entities(plan, normalize_question(question))
+        self.created_at = time.time()
+        self.hits = 0
+
+
+# cache of question -> DSL plan, in two layers:
+#   exact    - the normalized question text
+#   semantic - embedding cosine similarity >= threshold against cached questions, only between
+#              questions with the same numbers ("מתחת ל-3" must not reuse the plan of "מתחת ל-2")
+#              and only when the new question names every service / keyword / query of the cached plan
+# entries are evicted LRU and expire after the TTL, pinned entries are never evicted.
+class PlanCache:
+
+    def __init__(
+        self,
+        max_items: int = PLAN_CACHE_SIZE,
+        ttl: float = PLAN_CACHE_TTL_SECONDS,
+        semantic_threshold: float = PLAN_CACHE_SEMANTIC_THRESHOLD,
+        semantic: bool = PLAN_CACHE_SEMANTIC,
+    ):
+        self.max_items = max_items
+        self.ttl = ttl
+        self.semantic_threshold = semantic_threshold
+        self.semantic = semantic
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    async def get(self, question: str) -> Optional[Dict[str, Any]]:
+        key = normalize_question(question)
+        with self._lock:
+            entry = self._live_entry(key)
+            if entry is not None:
+                self.exact_hits += 1
+                return self._hit(key, entry)
+
+        if self.semantic:
+            vector = await self._embed(key)
+            if vector is not None:
+                with self._lock:
+                    match = self._nearest(key, vector)
+                    if match is not None:
+                        self.semantic_hits += 1
+                        debug_log(f"plan cache: '{question}' matched '{self._entries[match].question}'")
+                        return with_question(self._hit(match, self._entries[match]), match, question)
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    async def put(self, question: str, plan: Dict[str, Any], pinned: bool = False):
+        key = normalize_question(question)
+        vector = await self._embed(key) if self.semantic else None
+        with self._lock:
+            old = self._entries.get(key)
+            self._entries[key] = _Entry(question, copy.deepcopy(plan), vector, pinned or bool(old and old.pinned))
+            self._entries.move_to_end(key)
+            self._evict()
+
+    # pin a question so it is never evicted; with `plan` the cached plan is replaced as well
+    async def pin(self, question: str, plan: Optional[Dict[str, Any]] = None) -> bool:
+        key = normalize_question(question)
+        if plan is not None:
+            await self.put(question, plan, pinned=True)
+            return True
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False
+            entry.pinned = True
+            return True
+
+    def unpin(self, question: str) -> bool:
+        with self._lock:
+            entry = self._entries.get(normalize_question(question))
+            if entry is None:
+                return False
+            entry.pinned = False
+            return True
+
+    # drop one question, or every entry that is not pinned (include_pinned drops those too)
+    def invalidate(self, question: Optional[str] = None, include_pinned: bool = False) -> int:
+        with self._lock:
+            if question is not None:
+                return 1 if self._entries.pop(normalize_question(question), None) else 0
+            keys = [k for k, e in self._entries.items() if include_pinned or not e.pinned]
+            for k in keys:
+                del self._entries[k]
+            return len(keys)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.exact_hits + self.semantic_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "pinned": sum(1 for e in self._entries.values() if e.pinned),
+            "exact_hits": self.exact_hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.exact_hits + self.semantic_hits) / lookups, 3) if lookups else 0.0,
+        }
+
+    def _expired(self, entry: _Entry) -> bool:
+        return not entry.pinned and time.time() - entry.created_at > self.ttl
+
+    def _live_entry(self, key: str) -> Optional[_Entry]:
+        entry = self._entries.get(key)
+        if entry is not None and self._expired(entry):
+            del self._entries[key]
+            return None
+        return entry
+
+    def _hit(self, key: str, entry: _Entry) -> Dict[str, Any]:
+        entry.hits += 1
+        self._entries.move_to_end(key)
+        return copy.deepcopy(entry.plan)
+
+    def _nearest(self, key: str, vector) -> Optional[str]:
+        numbers = NUMBERS.findall(key)
+        candidates = [
+            (k, e) for k, e in self._entries.items()
+            if e.vector is not None and not self._expired(e) and NUMBERS.findall(k) == numbers
+            and all(mentions(key, entity) for entity in e.entities)
+        ]
+        if not candidates:
+            return None
+        matrix = np.stack([e.vector for _, e in candidates])
+        scores = matrix @ vector
+        best = int(np.argmax(scores))
+        if scores[best] < self.semantic_threshold:
+            return None
+        return candidates[best][0]
+
+    def _evict(self):
+        expired = [k for k, e in self._entries.items() if self._expired(e)]
+        for k in expired:
+            del self._entries[k]
+        for k in list(self._entries.keys()):
+            if len(self._entries) <= self.max_items:
+                break
+            if not self._entries[k].pinned:
+                del self._entries[k]
+
+    @staticmethod
+    async def _embed(text: str):
+        try:
+            vector = np.asarray(await aget_embedding(text, input_type="query", use="text"), dtype=np.float32)
+        except Exception as e:
+            debug_log(f"plan cache: embedding failed, exact match only ({e})")
+            return None
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else None
+
+
+plan_cache = PlanCache()
@@ -0,0 +1,78 @@
+from typing import Any, Dict, List, Optional, Tuple
+from qdrant_client.models import Filter, FieldCondition, Range, MatchAny
+from query_service.dsl.functions import resolve_service_name
+from query_service.dsl.snapshot import feedback_snapshot
+from query_service.dsl.table import required_fields
+from utils.qdrant_utils import SERVICE_HE_FIELD
+from utils.config import debug_log
+
+# numeric payload fields that have a Qdrant payload index
+NUMERIC_FIELDS = {"Level"}
+
+RANGE_KEYS = {"lt": "lt", "lte": "lte", "gt": "gt", "gte": "gte"}
+
+
+def _range_condition(field: str, operator: str, value) -> Optional[FieldCondition]:
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    if operator == "eq":
+        return FieldCondition(key=field, range=Range(gte=value, lte=value))
+    if operator in RANGE_KEYS:
+        return FieldCondition(key=field, range=Range(**{RANGE_KEYS[operator]: value}))
+    return None
+
+
+# translate one filter step into a Qdrant condition, None if it can't run inside Qdrant
+async def _to_condition(step: Dict[str, Any]) -> Optional[FieldCondition]:
+    fn = step.get("fn")
+    args = step.get("args") or {}
+
+    if fn == "filter_by_level":
+        return _range_condition("Level", args.get("operator"), args.get("value"))
+
+    if fn == "filter_by_value" and args.get("field") in NUMERIC_FIELDS:
+        return _range_condition(args["field"], args.get("operator"), args.get("value"))
+
+    if fn == "filter_by_service" and args.get("service_name"):
+        # an unresolved name falls back to a substring match in pandas, keep that step as is
+        names = await resolve_service_name(args["service_name"])
+        if names:
+            return FieldCondition(key=SERVICE_HE_FIELD, match=MatchAny(any=names))
+
+    return None
+
+
+# rewrite pass: filter steps right after fetch_all_feedbacks become a Qdrant filter on the fetch,
+# so only the matching points are transferred. stops at the first step that can't be pushed down.
+# when the feedback snapshot is loaded, filtering it in memory is cheaper and the plan is kept.
+# returns the new steps and how many of the original steps the first new step replaces.
+async def push_down_filters(steps: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], int]:
+    if not steps or steps[0].get("fn") != "fetch_all_feedbacks":
+        return steps, 1
+    if await feedback_snapshot.is_fresh():
+        return steps, 1
+
+    conditions = []
+    pushed = 0
+    for step in steps[1:]:
+        condition = await _to_condition(step)
+        if condition is None:
+            break
+        conditions.append(condition)
+        pushed += 1
+
+    if not conditions:
+        return steps, 1
+
+    fetch = {
+        "fn": "fetch_all_feedbacks",
+        "args": {
+            **(steps[0].get("args") or {}),
+            "query_filter": Filter(must=conditions),
+            "columns": required_fields(steps[1 + pushed:]),
+        },
+    }
+    debug_log(f"pushed {pushed} filter steps down to Qdrant")
+    return [fetch] + steps[1 + pushed:], 1 + pushed
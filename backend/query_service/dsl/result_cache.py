@@ -0,0 +1,132 @@
+import json
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+from query_service.dsl.table import FEEDBACK_FIELDS, required_fields
+from utils.config import RESULT_CACHE_SIZE, RESULT_CACHE_TTL_SECONDS, debug_log
+
+_MISSING = object()
+
+
+# canonical text of a plan prefix: same functions and args give the same key,
+# whatever the key order or spacing the LLM used
+def canonical_steps(steps: List[Dict[str, Any]]) -> str:
+    return json.dumps(
+        [{"fn": s.get("fn"), "args": s.get("args") or {}} for s in steps],
+        sort_keys=True,
+        ensure_ascii=False,
+        default=str,
+    )
+
+
+# key of a prefix whose result was computed from a projected fetch (some columns left out):
+# it can only be reused by plans whose remaining steps need exactly those columns
+def projected_key(steps: List[Dict[str, Any]], columns: Optional[List[str]]) -> str:
+    key = canonical_steps(steps)
+    if columns is None or list(columns) == FEEDBACK_FIELDS:
+        return key
+    return key + "|columns=" + json.dumps(sorted(columns), ensure_ascii=False)
+
+
+# key of a DAG step that joins several inputs: its function and args plus the keys of its inputs.
+# steps with a single chain of ancestors use canonical_steps of that chain, like a linear plan.
+def canonical_node(step: Dict[str, Any], input_keys: List[str]) -> str:
+    return json.dumps(
+        {"fn": step.get("fn"), "args": step.get("args") or {}, "inputs": input_keys},
+        sort_keys=True,
+        ensure_ascii=False,
+        default=str,
+    )
+
+
+# results of executed plan prefixes, keyed by (dataset version, canonical prefix).
+# plans that share their first steps (same fetch and filters) reuse the intermediate result.
+# entries also expire after the TTL, like the feedback snapshot: data restored straight into
+# Qdrant (a collection snapshot) never bumps the dataset version.
+# cached values are shared between requests - DSL functions must not modify their input in place.
+class ResultCache:
+
+    def __init__(self, max_items: int = RESULT_CACHE_SIZE, ttl: float = RESULT_CACHE_TTL_SECONDS):
+        self.max_items = max_items
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._version: Optional[int] = None
+        # key -> (stored at, result)
+        self._entries: "OrderedDict[Tuple[int, str], Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    # caller holds the lock
+    def _lookup(self, key: Tuple[int, str]) -> Any:
+        entry = self._entries.get(key)
+        if entry is None:
+            return _MISSING
+        if time.time() - entry[0] > self.ttl:
+            del self._entries[key]
+            return _MISSING
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    # the longest cached prefix of `steps`: (number of steps covered, result, projected columns or None),
+    # or (0, None, None). a prefix computed from a projected fetch counts only if the rest of the plan
+    # needs no other column
+    def longest_prefix(self, version: int, steps: List[Dict[str, Any]]) -> Tuple[int, Any, Optional[List[str]]]:
+        with self._lock:
+            for end in range(len(steps), 0, -1):
+                columns = None
+                value = self._lookup((version, canonical_steps(steps[:end])))
+                if value is _MISSING:
+                    columns = required_fields(steps[end:])
+                    value = self._lookup((version, projected_key(steps[:end], columns)))
+                if value is not _MISSING:
+                    self.hits += 1
+                    debug_log(f"result cache hit for the first {end}/{len(steps)} steps")
+                    return end, value, columns
+            self.misses += 1
+            return 0, None, None
+
+    # (True, result) for a cached key, (False, None) otherwise
+    def get(self, version: int, key: str) -> Tuple[bool, Any]:
+        with self._lock:
+            value = self._lookup((version, key))
+            if value is _MISSING:
+                self.misses += 1
+                return False, None
+            self.hits += 1
+            return True, value
+
+    # `columns`: the fields of a projected fetch the result was computed from
+    def put(self, version: int, steps: List[Dict[str, Any]], value: Any, columns: Optional[List[str]] = None):
+        self.put_key(version, projected_key(steps, columns), value)
+
+    def put_key(self, version: int, key: str, value: Any):
+        if isinstance(value, dict) and "error" in value:
+            return
+        with self._lock:
+            # results of an older dataset version can't be hit anymore, drop them
+            if version != self._version:
+                self._entries.clear()
+                self._version = version
+            key = (version, key)
+            self._entries[key] = (time.time(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_items:
+                self._entries.popitem(last=False)
+
+    def invalidate(self) -> int:
+        with self._lock:
+            removed = len(self._entries)
+            self._entries.clear()
+            return removed
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "dataset_version": self._version,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+result_cache = ResultCache()
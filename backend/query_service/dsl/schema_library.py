@@ -0,0 +1,231 @@
+import os
+import json
+import sqlite3
+import asyncio
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+from utils.embedding_utils import aget_embedding
+from utils.llm_utils import acall_llm
+from utils.config import SCHEMA_LIBRARY_PATH, SCHEMA_LIBRARY_SIZE, SCHEMA_MATCH_THRESHOLD, debug_log
+
+# answer schemas for the usual question classes, with example prompts to match new questions against
+SEED_SCHEMAS: Dict[str, Dict[str, Any]] = {
+    "main_issue": {
+        "examples": [
+            "מה הבעיה העיקרית בשירות?",
+            "מה התלונה העיקרית של המשתמשים?",
+            "מה הכי מפריע למשתמשים בשירות?",
+            "מה התלונה השלילית ביותר?",
+        ],
+        "schema": {
+            "summary": "string",
+            "main_issue": "string",
+            "description": "string",
+            "frequency": "number",
+            "examples": "list[string]",
+        },
+    },
+    "topics": {
+        "examples": [
+            "חלק את המשובים ל־5 נושאים מרכזיים",
+            "מה הנושאים המרכזיים בביקורות?",
+            "מה הנושא המרכזי של הביקורות שקיבלו ציון נמוך?",
+        ],
+        "schema": {
+            "summary": "string",
+            "topics": [{"title": "string", "description": "string", "count": "number", "examples": "list[string]"}],
+        },
+    },
+    "sentiment": {
+        "examples": [
+            "האם המשתמשים מרוצים מהשירות?",
+            "מה שביעות הרצון של המשתמשים מהשירות?",
+            "איך אנשים מרגישים לגבי השירות?",
+        ],
+        "schema": {
+            "summary": "string",
+            "sentiment": "string",
+            "satisfaction_score": "number",
+            "positive_points": "list[string]",
+            "negative_points": "list[string]",
+        },
+    },
+    "summary": {
+        "examples": [
+            "תסכם לי בשלוש שורות מה אנשים חושבים על השירות",
+            "תן סיכום של המשובים",
+            "מה אומרים המשתמשים על השירות?",
+        ],
+        "schema": {
+            "summary": "string",
+            "key_points": "list[string]",
+        },
+    },
+    "recommendations": {
+        "examples": [
+            "מה התלונה העיקרית ומה יפתור אותה?",
+            "מה כדאי לשפר בשירות?",
+            "תן המלצות לשיפור השירות",
+        ],
+        "schema": {
+            "summary": "string",
+            "main_issues": [{"title": "string", "description": "string", "count": "number"}],
+            "recommendations": [{"title": "string", "description": "string", "addresses": "string"}],
+        },
+    },
+}
+
+SCHEMA_SYSTEM = (
+    "You are a Schema Planning LLM. "
+    "You receive a Hebrew question from the user. "
+    "Your task: design the IDEAL JSON structure for the answer. "
+    "The schema must:\n"
+    "1. Be a valid JSON.\n"
+    "2. Define all keys the second LLM should return.\n"
+    "3. Define value types: string, number, list[string], list[number], object, list[object].\n"
+    "4. Be minimal but expressive.\n"
+    "5. Never include markdown or code fences.\n"
+    "6. Return ONLY the schema JSON.\n"
+)
+
+
+async def generate_schema(prompt: str):
+    schema_user = f"""
+    השאלה של המשתמש:
+    "{prompt}"
+
+    צור סכמה אידיאלית (JSON) עבור התשובה לשאלה הזאת.
+    """
+
+    schema_messages = [
+        {"role": "system", "content": SCHEMA_SYSTEM},
+        {"role": "user", "content": schema_user}
+    ]
+
+    schema_raw = await acall_llm(schema_messages, max_tokens=90000)
+    schema_clean = schema_raw.strip().replace("```json", "").replace("```", "").strip()
+    return json.loads(schema_clean)
+
+
+# reusable answer schemas for semantic_dynamic.
+# a new prompt is matched by embedding similarity against the example prompts of the seed classes
+# and against prompts whose schema was generated before; only unknown questions call the LLM.
+# generated schemas are stored on disk and reused after restarts, at most max_generated of them
+# (least recently used first out). the prompt vectors are kept as one matrix, rebuilt when an entry is added.
+class SchemaLibrary:
+
+    def __init__(self, path: str = SCHEMA_LIBRARY_PATH, threshold: float = SCHEMA_MATCH_THRESHOLD,
+                 max_generated: int = SCHEMA_LIBRARY_SIZE):
+        self.threshold = threshold
+        self.max_generated = max_generated
+        self.hits = 0
+        self.generated = 0
+        # [prompt, class, schema, unit vector or None until embedded]
+        self._seeds: List[List[Any]] = [
+            [example, name, seed["schema"], None]
+            for name, seed in SEED_SCHEMAS.items()
+            for example in seed["examples"]
+        ]
+        # prompt -> [prompt, "generated", schema, vector], in LRU order
+        self._generated: "OrderedDict[str, List[Any]]" = OrderedDict()
+        # stacked vectors of the entries in `_rows`, None when an entry was added since
+        self._matrix: Optional[np.ndarray] = None
+        self._rows: List[List[Any]] = []
+        self._changes = 0
+        self._db = None
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("CREATE TABLE IF NOT EXISTS schemas (prompt TEXT PRIMARY KEY, schema TEXT NOT NULL)")
+            self._db.commit()
+            rows = self._db.execute(
+                "SELECT prompt, schema FROM schemas ORDER BY rowid DESC LIMIT ?", (max(self.max_generated, 0),)
+            ).fetchall()
+            for prompt, schema in reversed(rows):
+                self._generated[prompt] = [prompt, "generated", json.loads(schema), None]
+        except sqlite3.Error as e:
+            print(f"schema library: can't open {path} ({e}), generated schemas won't be kept")
+            self._db = None
+
+    async def get_schema(self, prompt: str):
+        match = await self.lookup(prompt)
+        if match is not None:
+            self.hits += 1
+            return match
+        schema = await generate_schema(prompt)
+        self.generated += 1
+        await self._remember(prompt, schema)
+        return schema
+
+    async def lookup(self, prompt: str) -> Optional[Dict[str, Any]]:
+        vector = await self._embed(prompt)
+        if vector is None:
+            return None
+        matrix, rows = await self._index()
+        if matrix is None:
+            return None
+        scores = matrix @ vector
+        best = int(np.argmax(scores))
+        if scores[best] < self.threshold:
+            return None
+        entry = rows[best]
+        if entry[0] in self._generated:
+            self._generated.move_to_end(entry[0])
+        debug_log(f"schema library: '{prompt}' matched class '{entry[1]}' ({scores[best]:.2f})")
+        return entry[2]
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "entries": len(self._seeds) + len(self._generated),
+            "generated_entries": len(self._generated),
+            "hits": self.hits,
+            "generated": self.generated,
+        }
+
+    # the matrix of all embedded prompts and the entry of every row
+    async def _index(self) -> Tuple[Optional[np.ndarray], List[List[Any]]]:
+        if self._matrix is not None:
+            return self._matrix, self._rows
+        changes = self._changes
+        entries = self._seeds + list(self._generated.values())
+        missing = [e for e in entries if e[3] is None]
+        if missing:
+            vectors = await asyncio.gather(*(self._embed(e[0]) for e in missing))
+            for e, v in zip(missing, vectors):
+                e[3] = v
+        rows = [e for e in entries if e[3] is not None]
+        matrix = np.stack([e[3] for e in rows]) if rows else None
+        # an entry added while embedding makes the next lookup build it again
+        if changes == self._changes:
+            self._matrix, self._rows = matrix, rows
+        return matrix, rows
+
+    async def _remember(self, prompt: str, schema):
+        self._generated[prompt] = [prompt, "generated", schema, await self._embed(prompt)]
+        self._generated.move_to_end(prompt)
+        evicted = []
+        while len(self._generated) > self.max_generated:
+            evicted.append(self._generated.popitem(last=False)[0])
+        self._matrix = None
+        self._changes += 1
+        if self._db is not None:
+            self._db.execute(
+                "INSERT OR REPLACE INTO schemas (prompt, schema) VALUES (?, ?)",
+                (prompt, json.dumps(schema, ensure_ascii=False)),
+            )
+            self._db.executemany("DELETE FROM schemas WHERE prompt = ?", [(p,) for p in evicted])
+            self._db.commit()
+
+    @staticmethod
+    async def _embed(text: str) -> Optional[np.ndarray]:
+        try:
+            vector = np.asarray(await aget_embedding(text, input_type="query", use="text"), dtype=np.float32)
+        except Exception as e:
+            debug_log(f"schema library: embedding failed ({e})")
+            return None
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else None
+
+
+schema_library = SchemaLibrary()
@@ -0,0 +1,73 @@
+import time
+import asyncio
+from typing import Optional
+import pandas as pd
+from utils.qdrant_utils import ascroll_points, point_row, POINT_ID_COLUMN
+from query_service.dsl.text_index import TextIndex
+from query_service.dsl.table import feedback_table, FEEDBACK_FIELDS
+from utils.dataset_version import aget_dataset_version
+from utils.config import SNAPSHOT_TTL_SECONDS, SNAPSHOT_VERSION_CHECK_SECONDS, TEXT_INDEX_ENABLED, debug_log
+
+
+# process wide in-memory copy of the feedback table.
+# it is reloaded (full paginated scan) when the indexing service bumps the dataset version,
+# or when it is older than the TTL. the DataFrame is shared between requests - never modify it in place.
+# only the typed columns of query_service.dsl.table are kept.
+class FeedbackSnapshot:
+
+    def __init__(self, ttl: float = SNAPSHOT_TTL_SECONDS, version_check_interval: float = SNAPSHOT_VERSION_CHECK_SECONDS):
+        self.ttl = ttl
+        self.version_check_interval = version_check_interval
+        self.version: Optional[int] = None
+        self.loaded_at = 0.0
+        self._df: Optional[pd.DataFrame] = None
+        # full-text index over the snapshot rows, built with it so it always has the same version
+        self.text_index: Optional[TextIndex] = None
+        self._known_version: Optional[int] = None
+        self._checked_at = 0.0
+        self._lock = asyncio.Lock()
+
+    # latest dataset version published by the indexing service, asked at most once per check interval
+    async def dataset_version(self) -> int:
+        if self._known_version is None or time.time() - self._checked_at >= self.version_check_interval:
+            self._known_version = await aget_dataset_version()
+            self._checked_at = time.time()
+        return self._known_version
+
+    # True if the snapshot can be served without going to Qdrant for the rows
+    async def is_fresh(self) -> bool:
+        if self._df is None or time.time() - self.loaded_at > self.ttl:
+            return False
+        return await self.dataset_version() == self.version
+
+    async def get(self) -> pd.DataFrame:
+        if await self.is_fresh():
+            return self._df
+        # concurrent requests wait for one reload instead of each scanning the collection
+        async with self._lock:
+            if not await self.is_fresh():
+                await self._load()
+            return self._df
+
+    def invalidate(self):
+        self.loaded_at = 0.0
+
+    async def _load(self):
+        started = time.time()
+        # read the version first: a change during the scan then triggers another reload
+        version = await aget_dataset_version()
+        rows = [point_row(p) async for p in ascroll_points(with_payload=FEEDBACK_FIELDS)]
+        # building the table and its index is CPU work on the whole collection, kept off the event loop
+        df = await asyncio.to_thread(feedback_table, rows)
+        text_index = None
+        if TEXT_INDEX_ENABLED and "text" in df.columns:
+            text_index = await asyncio.to_thread(TextIndex, df["text"], df[POINT_ID_COLUMN].tolist())
+            debug_log(f"text index built: {text_index.vocabulary_size} terms")
+        self._df = df
+        self.text_index = text_index
+        self.version = self._known_version = version
+        self.loaded_at = self._checked_at = time.time()
+        debug_log(f"feedback snapshot loaded: {len(df)} rows, version {version}, {time.time() - started:.1f}s")
+
+
+feedback_snapshot = FeedbackSnapshot()
@@ -0,0 +1,50 @@
+import importlib.util
+from typing import Any, Dict, Iterable, List, Optional
+import pandas as pd
+from utils.qdrant_utils import SERVICE_HE_FIELD, POINT_ID_COLUMN
+
+# query-side schema of the feedback table. only these payload fields are read from Qdrant,
+# the other CSV columns stored in the payload are never used by the DSL.
+TEXT_COLUMN = "text"
+FEEDBACK_FIELDS = ["ID", SERVICE_HE_FIELD, "Level", "CreationDate", TEXT_COLUMN]
+
+# Arrow-backed strings keep the feedback text in one buffer instead of a python object per row
+STRING_DTYPE = "string[pyarrow]" if importlib.util.find_spec("pyarrow") else "string"
+
+# DSL steps that never read the text column (render_table only when its columns leave it out)
+NO_TEXT_STEPS = {
+    "filter_by_level", "filter_by_value", "filter_by_service", "group_by_service",
+    "sort_results", "count_records", "render_table",
+}
+
+
+def _typed(df: pd.DataFrame) -> pd.DataFrame:
+    if SERVICE_HE_FIELD in df.columns:
+        df[SERVICE_HE_FIELD] = df[SERVICE_HE_FIELD].astype("category")
+    if "Level" in df.columns:
+        df["Level"] = pd.to_numeric(df["Level"], errors="coerce").astype("Int8")
+    if "CreationDate" in df.columns:
+        df["CreationDate"] = pd.to_datetime(df["CreationDate"], errors="coerce")
+    for col in (TEXT_COLUMN, POINT_ID_COLUMN):
+        if col in df.columns:
+            df[col] = df[col].astype(STRING_DTYPE)
+    return df
+
+
+# rows (payload + point id) -> typed DataFrame with the known columns only
+def feedback_table(rows: Iterable[Dict[str, Any]], columns: Optional[List[str]] = None) -> pd.DataFrame:
+    return _typed(pd.DataFrame(list(rows), columns=[POINT_ID_COLUMN] + (columns or FEEDBACK_FIELDS)))
+
+
+# payload fields the rest of a plan reads: the text is left out when no step needs it
+def required_fields(steps: List[Dict[str, Any]]) -> List[str]:
+    for step in steps:
+        fn = step.get("fn")
+        args = step.get("args") or {}
+        if fn not in NO_TEXT_STEPS:
+            return FEEDBACK_FIELDS
+        if fn == "render_table" and (not args.get("columns") or TEXT_COLUMN in args["columns"]):
+            return FEEDBACK_FIELDS
+        if fn in ("group_by_service", "sort_results", "filter_by_value") and args.get("field") == TEXT_COLUMN:
+            return FEEDBACK_FIELDS
+    return [f for f in FEEDBACK_FIELDS if f != TEXT_COLUMN]
@@ -0,0 +1,93 @@
+import re
+import bisect
+import unicodedata
+from collections import defaultdict
+from functools import reduce
+from typing import Dict, List, Optional, Sequence, Set
+import numpy as np
+import pandas as pd
+
+# niqqud and cantillation marks; the maqaf (U+05BE) is punctuation and becomes a space like a hyphen
+NIQQUD = re.compile("[\u0591-\u05bd\u05bf\u05c1\u05c2\u05c4\u05c5\u05c7]")
+NON_WORD = re.compile(r"[^\w\s]")
+
+EMPTY = np.empty(0, dtype=np.int32)
+
+
+# lower case, no niqqud, punctuation turned into spaces
+def normalize_text(text) -> str:
+    if not isinstance(text, str):
+        text = "" if text is None or pd.isna(text) else str(text)
+    text = unicodedata.normalize("NFKC", text).lower()
+    text = NIQQUD.sub("", text)
+    text = NON_WORD.sub(" ", text)
+    return " ".join(text.split())
+
+
+# in-process index over the feedback text: word -> sorted row positions.
+# a term matches the rows whose normalized text contains the normalized term, the same rule as the
+# plain scan in filter_by_text_contains ("תור" matches "התורים", "שגיא" matches "שגיאות"). every word of the
+# term is a substring of some word of a matching row, so the candidates are the rows of the
+# vocabulary words that contain each term word. for a one word term they are exactly the matches,
+# a phrase is checked against the texts themselves: the index keeps a reference to the snapshot's
+# text column, not a normalized copy of it.
+class TextIndex:
+
+    def __init__(self, texts: Sequence, point_ids: Sequence):
+        self.point_ids = np.asarray([str(p) for p in point_ids], dtype=object)
+        self._texts = texts if isinstance(texts, pd.Series) else pd.Series(list(texts), dtype=object)
+        postings: Dict[str, List[int]] = defaultdict(list)
+        for pos, text in enumerate(self._texts):
+            for token in set(normalize_text(text).split()):
+                postings[token].append(pos)
+        self._words = sorted(postings)
+        self._postings = [np.asarray(postings[w], dtype=np.int32) for w in self._words]
+        # the vocabulary as one string, searched with str.find instead of a loop over the words
+        self._blob = "\n".join(self._words)
+        self._starts = []
+        offset = 0
+        for w in self._words:
+            self._starts.append(offset)
+            offset += len(w) + 1
+
+    def __len__(self):
+        return len(self._texts)
+
+    @property
+    def vocabulary_size(self) -> int:
+        return len(self._words)
+
+    # row positions of every vocabulary word that contains `part`
+    def _rows_of_words_containing(self, part: str) -> np.ndarray:
+        words = set()
+        start = self._blob.find(part)
+        while start != -1:
+            words.add(bisect.bisect_right(self._starts, start) - 1)
+            start = self._blob.find(part, start + 1)
+        if not words:
+            return EMPTY
+        return np.unique(np.concatenate([self._postings[w] for w in words]))
+
+    # row positions matching one keyword or phrase, None if it has no words to look up
+    def positions(self, term: str) -> Optional[np.ndarray]:
+        normalized = normalize_text(term)
+        if not normalized:
+            return None
+        words = normalized.split()
+        if len(words) == 1:
+            return self._rows_of_words_containing(normalized)
+        candidates = reduce(np.intersect1d, sorted((self._rows_of_words_containing(w) for w in set(words)), key=len))
+        return np.asarray([p for p in candidates if normalized in normalize_text(self._texts.iat[p])], dtype=np.int32)
+
+    # point ids of rows matching any / all of the terms, None if a term can't be looked up
+    def search(self, terms: Sequence[str], match: str = "any") -> Optional[Set[str]]:
+        found = []
+        for term in terms:
+            pos = self.positions(term)
+            if pos is None:
+                return None
+            found.append(pos)
+        if not found:
+            return set()
+        combine = np.intersect1d if match == "all" else np.union1d
+        return set(self.point_ids[reduce(combine, found)])
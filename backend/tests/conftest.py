@@ -0,0 +1,48 @@
+# the tests run offline: Qdrant in-process (:memory:) and the embedding / LLM fakes of benchmarks/fakes.py.
+# the environment is set before any project module is imported, since utils.config reads it at import time.
+#
+# usage, from the backend directory:
+#   python -m pytest -q
+import os
+import sys
+import asyncio
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+os.environ.update({
+    "QDRANT_PATH": ":memory:",
+    "DATA_DIR": tempfile.mkdtemp(prefix="inda-tests-"),
+    "NVIDIA_API_KEY": os.environ.get("NVIDIA_API_KEY") or "offline-tests",
+    "EMBED_PROVIDER_TEXT": "fake",
+    "EMBED_PROVIDER_SERVICE": "fake",
+    "DEBUG_MODE": "false",
+})
+
+import pytest
+from benchmarks.fakes import FakeLLM, install_fakes
+from benchmarks.datasets import SERVICES, write_feedback_csv
+
+FEEDBACK_ROWS = 300
+
+
+@pytest.fixture(scope="session")
+def llm() -> FakeLLM:
+    llm = FakeLLM(translations=SERVICES)
+    install_fakes(llm, dimension=64)
+    return llm
+
+
+# a small synthetic export indexed once into the in-memory collection
+@pytest.fixture(scope="session")
+def feedback(llm, tmp_path_factory):
+    from indexing_service.indexing_worker import process_csv_to_qdrant
+    from utils.dataset_version import bump_dataset_version
+    from utils.service_index import service_index
+
+    csv_path = write_feedback_csv(str(tmp_path_factory.mktemp("data") / "feedback.csv"), FEEDBACK_ROWS)
+    process_csv_to_qdrant(csv_path)
+    bump_dataset_version()
+    asyncio.run(service_index.load())
+    return csv_path
@@ -0,0 +1,51 @@
+import asyncio
+import numpy as np
+from utils.embedding_cache import EmbeddingCache
+from utils.embedding_providers import provider_for
+from utils.embedding_utils import get_embeddings
+from utils import embedding_utils
+
+MODEL = "model"
+
+
+def test_vectors_are_kept_as_float32(tmp_path):
+    cache = EmbeddingCache(path=str(tmp_path / "cache.sqlite"))
+    cache.put_many(MODEL, "query", {"שלום": [0.5, 0.25]})
+
+    vector = cache.get_many(MODEL, "query", ["שלום"])["שלום"]
+    assert isinstance(vector, np.ndarray) and vector.dtype == np.float32
+    assert vector.tolist() == [0.5, 0.25]
+
+
+def test_disk_store_keeps_the_latest_writes(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = EmbeddingCache(path=path, max_items=1, max_disk_items=3)
+    for i in range(5):
+        cache.put_many(MODEL, "query", {f"text {i}": [float(i)]})
+    assert cache.stats()["disk_items"] == 3
+
+    reopened = EmbeddingCache(path=path, max_items=10, max_disk_items=3)
+    found = reopened.get_many(MODEL, "query", [f"text {i}" for i in range(5)])
+    assert sorted(found) == ["text 2", "text 3", "text 4"]
+
+
+def test_ingest_texts_are_not_cached(llm, monkeypatch):
+    cache = EmbeddingCache(path=None)
+    monkeypatch.setattr(embedding_utils, "embedding_cache", cache)
+
+    vectors = get_embeddings(["ביקורת אחת", "ביקורת שתיים"], input_type="passage", cache=False)
+    assert len(vectors) == 2 and isinstance(vectors[0], list)
+    assert cache.stats()["memory_items"] == 0
+
+    get_embeddings(["חידוש ויזה"], input_type="passage", use="service")
+    assert list(cache.get_many(provider_for("service").model, "passage", ["חידוש ויזה"])) == ["חידוש ויזה"]
+
+
+def test_async_lookup_reads_the_disk_store(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    EmbeddingCache(path=path).put_many(MODEL, "query", {"שלום": [1.0, 2.0]})
+
+    cache = EmbeddingCache(path=path)
+    found = asyncio.run(cache.aget_many(MODEL, "query", ["שלום", "חסר"]))
+    assert list(found) == ["שלום"] and found["שלום"].tolist() == [1.0, 2.0]
+    assert cache.stats()["disk_hits"] == 1 and cache.stats()["misses"] == 1
@@ -0,0 +1,14 @@
+import pytest
+from utils.embedding_providers import EmbeddingProvider
+
+
+def test_provider_without_embed_fails_on_instantiation():
+    class NoEmbed(EmbeddingProvider):
+        name = "broken"
+
+        @property
+        def dimension(self) -> int:
+            return 8
+
+    with pytest.raises(TypeError):
+        NoEmbed()
@@ -0,0 +1,212 @@
+import asyncio
+import pytest
+from query_service.dsl import executor
+from query_service.dsl.events import start_stream
+from query_service.dsl.executor import execute_dsl_flow
+from query_service.dsl.result_cache import result_cache
+from query_service.dsl.snapshot import feedback_snapshot
+
+FETCH = {"fn": "fetch_all_feedbacks"}
+VISA = {"fn": "filter_by_service", "args": {"service_name": "חידוש ויזה"}}
+FILES = {"fn": "filter_by_text_contains", "args": {"keyword": "קבצים"}}
+
+
+@pytest.fixture
+def fresh_cache():
+    result_cache.invalidate()
+    yield
+    result_cache.invalidate()
+
+
+# without a fresh snapshot the leading filters are pushed down to Qdrant, and the text column is
+# only fetched when a later step reads it
+@pytest.fixture
+def no_snapshot(monkeypatch):
+    async def stale():
+        return False
+
+    monkeypatch.setattr(feedback_snapshot, "is_fresh", stale)
+
+
+def test_projected_prefix_is_not_reused_by_a_plan_that_reads_the_text(feedback, fresh_cache, no_snapshot):
+    count = asyncio.run(execute_dsl_flow({"steps": [FETCH, VISA, {"fn": "count_records"}]}))
+    assert count["total_count"].iloc[0] > 0
+
+    rows = asyncio.run(execute_dsl_flow({"steps": [FETCH, VISA, FILES, {"fn": "render_table"}]}))
+    assert rows["type"] == "table"
+    assert rows["data"] and all("קבצים" in r["text"] for r in rows["data"])
+
+
+def test_projected_prefix_is_not_reused_by_a_dag_plan(feedback, fresh_cache, no_snapshot):
+    asyncio.run(execute_dsl_flow({"steps": [FETCH, VISA, {"fn": "count_records"}]}))
+
+    rows = asyncio.run(execute_dsl_flow({"steps": [
+        {"id": "all", **FETCH},
+        {"id": "visa", "inputs": ["all"], **VISA},
+        {"id": "files", "inputs": ["visa"], **FILES},
+        {"id": "out", "inputs": ["files"], "fn": "render_table"},
+    ]}))
+    assert rows["data"] and all("קבצים" in r["text"] for r in rows["data"])
+
+
+def test_projected_prefix_is_reused_by_the_same_plan(feedback, fresh_cache, no_snapshot):
+    plan = {"steps": [FETCH, VISA, {"fn": "count_records"}]}
+    first = asyncio.run(execute_dsl_flow(plan))
+    hits = result_cache.hits
+    again = asyncio.run(execute_dsl_flow(plan))
+
+    assert result_cache.hits == hits + 1
+    assert again.equals(first)
+
+
+# a step computed from a projected prefix carries the projection into its own cache key
+def test_steps_after_a_projected_hit_stay_projected(feedback, fresh_cache, no_snapshot):
+    sort = {"fn": "sort_results", "args": {"order": "desc", "field": "Level"}}
+    asyncio.run(execute_dsl_flow({"steps": [FETCH, VISA, {"fn": "count_records"}]}))
+    asyncio.run(execute_dsl_flow({"steps": [FETCH, VISA, sort, {"fn": "count_records"}]}))
+
+    rows = asyncio.run(execute_dsl_flow({"steps": [FETCH, VISA, sort, FILES, {"fn": "render_table"}]}))
+    assert rows["data"] and all("קבצים" in r["text"] for r in rows["data"])
+
+
+# ---------------- DAG plans, on stand-in DSL functions ---------------- #
+
+class Probe:
+    def __init__(self):
+        self.running = 0
+        self.peak = 0
+        self.calls = []
+        self.cancelled = []
+
+
+@pytest.fixture
+def probe(monkeypatch, fresh_cache):
+    probe = Probe()
+
+    async def source(value: int = 0):
+        probe.calls.append(("source", value))
+        return value
+
+    async def slow(*inputs, add: int = 0, delay: float = 0.05):
+        probe.calls.append(("slow", add))
+        probe.running += 1
+        probe.peak = max(probe.peak, probe.running)
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            probe.cancelled.append(add)
+            raise
+        finally:
+            probe.running -= 1
+        return sum(inputs) + add
+
+    async def boom(*inputs):
+        await asyncio.sleep(0.01)
+        raise RuntimeError("boom")
+
+    for name, fn in (("source", source), ("slow", slow), ("boom", boom)):
+        monkeypatch.setitem(executor.DSL_FUNCTIONS, name, fn)
+    return probe
+
+
+def _branches(count: int, **args):
+    steps = [{"id": "src", "fn": "source", "args": {"value": 1}}]
+    steps += [{"id": f"b{i}", "fn": "slow", "inputs": ["src"], "args": {"add": i, **args}} for i in range(count)]
+    steps.append({"id": "joined", "fn": "join_results", "inputs": [f"b{i}" for i in range(count)]})
+    return steps
+
+
+def test_dag_runs_independent_branches_concurrently(probe):
+    result = asyncio.run(executor.execute_dag(_branches(3), version=1, max_parallel=4))
+
+    assert probe.peak == 3
+    assert result == {"comparison": {"branch_1": 1, "branch_2": 2, "branch_3": 3}}
+    # the shared input runs once
+    assert probe.calls.count(("source", 1)) == 1
+
+
+def test_dag_parallelism_is_capped(probe):
+    asyncio.run(executor.execute_dag(_branches(5), version=1, max_parallel=2))
+    assert probe.peak == 2
+
+
+def test_dag_join_uses_the_labels(probe):
+    steps = _branches(2)
+    steps[-1]["args"] = {"labels": ["first", "second"]}
+    result = asyncio.run(executor.execute_dag(steps, version=1))
+    assert result == {"comparison": {"first": 1, "second": 2}}
+
+
+def test_dag_step_without_inputs_consumes_the_previous_step(probe):
+    steps = [{"fn": "source", "args": {"value": 2}}, {"id": "x", "fn": "slow", "args": {"add": 3}}]
+    assert asyncio.run(executor.execute_dag(steps, version=1)) == 5
+
+
+# a single chain in a DAG plan is keyed like the same linear plan
+def test_dag_chain_shares_the_cache_with_the_linear_plan(probe):
+    linear = [{"fn": "source", "args": {"value": 1}}, {"fn": "slow", "args": {"add": 2}}]
+    assert asyncio.run(execute_dsl_flow({"steps": linear})) == 3
+    calls = len(probe.calls)
+
+    dag = [{"id": "a", **linear[0]}, {"id": "b", "inputs": ["a"], **linear[1]}]
+    assert asyncio.run(execute_dsl_flow({"steps": dag})) == 3
+    assert len(probe.calls) == calls
+
+
+def test_dag_results_are_cached_per_dataset_version(probe):
+    asyncio.run(executor.execute_dag(_branches(2), version=1))
+    calls = len(probe.calls)
+    asyncio.run(executor.execute_dag(_branches(2), version=1))
+    assert len(probe.calls) == calls
+
+    asyncio.run(executor.execute_dag(_branches(2), version=2))
+    assert len(probe.calls) > calls
+
+
+@pytest.mark.parametrize("steps", [
+    [{"id": "a", "fn": "source"}, {"id": "a", "fn": "slow", "inputs": ["a"]}],
+    [{"id": "a", "fn": "slow", "inputs": ["b"]}, {"id": "b", "fn": "source"}],
+    [{"id": "a", "fn": "source"}, {"id": "b", "fn": "slow", "inputs": ["missing"]}],
+    [{"id": "a", "fn": "slow", "inputs": ["a"]}],
+])
+def test_dag_rejects_invalid_inputs(probe, steps):
+    with pytest.raises(ValueError):
+        asyncio.run(executor.execute_dag(steps, version=1))
+    assert probe.calls == []
+
+
+def test_dag_failure_cancels_the_running_branches(probe):
+    steps = [
+        {"id": "src", "fn": "source", "args": {"value": 1}},
+        {"id": "long", "fn": "slow", "inputs": ["src"], "args": {"add": 7, "delay": 5}},
+        {"id": "bad", "fn": "boom", "inputs": ["src"]},
+        {"id": "joined", "fn": "join_results", "inputs": ["long", "bad"]},
+    ]
+    with pytest.raises(RuntimeError, match="boom"):
+        asyncio.run(executor.execute_dag(steps, version=1))
+    assert probe.cancelled == [7]
+
+
+# the answers of concurrent semantic branches stream as separate token streams
+def test_dag_token_events_carry_their_step(llm, fresh_cache):
+    steps = [
+        {"id": "a", "fn": "semantic_dynamic", "args": {"texts": ["האתר נתקע"], "prompt": "מה הבעיה?"}},
+        {"id": "b", "fn": "semantic_dynamic", "inputs": [], "args": {"texts": ["התור מתעכב"], "prompt": "מה התלונה?"}},
+        {"id": "joined", "fn": "join_results", "inputs": ["a", "b"]},
+    ]
+
+    async def run():
+        queue = start_stream()
+        await executor.execute_dag(steps, version=1)
+        events = []
+        while not queue.empty():
+            events.append(queue.get_nowait())
+        return events
+
+    events = asyncio.run(run())
+    tokens = {}
+    for event, data in events:
+        if event == "token":
+            tokens[data["step"]] = tokens.get(data["step"], "") + data["text"]
+    assert sorted(tokens) == [1, 2]
+    assert all(text.strip().startswith("{") for text in tokens.values())
@@ -0,0 +1,108 @@
+import pytest
+from query_service.dsl.fast_path import match_question, TABLE_COLUMNS
+
+FETCH = {"fn": "fetch_all_feedbacks"}
+
+
+def service(name):
+    return {"fn": "filter_by_service", "args": {"service_name": name}}
+
+
+def level(operator, value):
+    return {"fn": "filter_by_level", "args": {"operator": operator, "value": value}}
+
+
+COUNT = [{"fn": "count_records"}, {"fn": "render_table", "args": {"columns": ["total_count"]}}]
+LIST = [{"fn": "render_table", "args": {"columns": TABLE_COLUMNS}}]
+
+
+# (question, template, steps) - the plans the fast path must produce instead of the LLM planner
+MATCHED = [
+    ("כמה ביקורות יש לכל שירות?", "count_per_service", [
+        FETCH,
+        {"fn": "group_by_service", "args": {"calc": "count", "field": "Level"}},
+        {"fn": "render_table", "args": {"columns": ["service_demended_hebrew", "count_Level"]}},
+    ]),
+    ("מה הדירוג הממוצע של שירות חידוש ויזה", "average_rating", [
+        FETCH,
+        service("חידוש ויזה"),
+        {"fn": "group_by_service", "args": {"calc": "avg", "field": "Level"}},
+        {"fn": "render_table", "args": {"columns": ["service_demended_hebrew", "avg_Level"]}},
+    ]),
+    ("כמה ביקורות מתחת ל־3?", "count", [FETCH, level("lt", 3)] + COUNT),
+    ("כמה ביקורות עם ציון 4 ומעלה", "count", [FETCH, level("gte", 4)] + COUNT),
+    ("כמה ביקורות קיבלו לפחות שלושה כוכבים", "count", [FETCH, level("gte", 3)] + COUNT),
+    ("כמה ביקורות מעל או שווה ל 4", "count", [FETCH, level("gte", 4)] + COUNT),
+    ("תראה לי את כל הביקורות של שירות דרכון ביומטרי", "list", [FETCH, service("דרכון ביומטרי")] + LIST),
+    # the article (ה) before "שירות"
+    ("תציג את הביקורות של השירות ויזה", "list", [FETCH, service("ויזה")] + LIST),
+    ("כמה ביקורות יש בשירות חידוש ויזה", "count", [FETCH, service("חידוש ויזה")] + COUNT),
+    # the name ends at the template words
+    ("ממוצע הדירוג של שירות חידוש ויזה ביקורות מעל 2", "average_rating", [
+        FETCH,
+        service("חידוש ויזה"),
+        level("gt", 2),
+        {"fn": "group_by_service", "args": {"calc": "avg", "field": "Level"}},
+        {"fn": "render_table", "args": {"columns": ["service_demended_hebrew", "avg_Level"]}},
+    ]),
+    # a range is two conditions, "או שווה" after the number makes it inclusive
+    ("כמה ביקורות יש מעל 3 ומתחת ל 5", "count", [FETCH, level("gt", 3), level("lt", 5)] + COUNT),
+    ("כמה ביקורות יש מעל 3 או שווה", "count", [FETCH, level("gte", 3)] + COUNT),
+    ("כמה ביקורות עם ציון 2 או פחות", "count", [FETCH, level("lte", 2)] + COUNT),
+    # the name keeps its case
+    ("תציג ביקורות של שירות MyGov Portal", "list", [FETCH, service("MyGov Portal")] + LIST),
+]
+
+# questions the fast path must leave to the LLM planner
+FALLBACK = [
+    "כמה ביקורות לא קיבלו ציון מעל 3?",
+    "כמה ביקורות יש חוץ משירות ויזה",
+    "תציג ביקורות מלבד שירות דרכון",
+    "כמה ביקורות בלי ציון 5",
+    "כמה ביקורות יש בשירות ויזה ובשירות דרכון",
+    "כמה ביקורות יש לשירותים ויזה ודרכון",
+    "תציג ביקורות של שירות ויזה או דרכון",
+    "השווה את הביקורות של שירות ויזה לעומת שירות דרכון",
+    "מה הבעיה העיקרית בשירות שינוי כתובת?",
+    "תציג ביקורות שמכילות את המילה קבצים",
+    "מה הדירוג הממוצע?",
+    "כמה ביקורות עם 3",
+    # qualifiers the grammar does not know
+    "תן לי ביקורות גרועות",
+    "תציג ביקורות טובות",
+    "כמה ביקורות טובות יש",
+    "כמה ביקורות יש היום",
+    "תציג ביקורות של שירות חידוש דרכון לפי ציון",
+    "כמה ביקורות יש בשירות ויזה מעל 3 או מתחת ל 2",
+]
+
+# the service words of a loaded service index
+SERVICE_WORDS = {"חידוש", "ויזה", "דרכון", "ביומטרי", "לוויזה"}
+
+
+@pytest.mark.parametrize("question, template, steps", MATCHED)
+def test_fast_path_plans(question, template, steps):
+    assert match_question(question) == (template, {"steps": steps})
+
+
+@pytest.mark.parametrize("question", FALLBACK)
+def test_questions_left_to_the_planner(question):
+    assert match_question(question) is None
+
+
+@pytest.mark.parametrize("question, name", [
+    ("כמה ביקורות יש בשירות חידוש ויזה", "חידוש ויזה"),
+    ("תציג ביקורות של שירות הויזה", "הויזה"),
+])
+def test_known_service_names(question, name):
+    _, plan = match_question(question, SERVICE_WORDS)
+    assert service(name) in plan["steps"]
+
+
+# with a service index, a word that is not part of any service name is not taken as one
+@pytest.mark.parametrize("question", [
+    "תציג ביקורות של שירות חידוש ויזה גרועות",
+    "כמה ביקורות יש בשירות מיסים",
+])
+def test_unknown_service_words_go_to_the_planner(question):
+    assert match_question(question, SERVICE_WORDS) is None
@@ -0,0 +1,30 @@
+import time
+from indexing_service.jobs import JobManager, IngestJob, DONE, FAILED, RUNNING
+
+
+def _finished(manager: JobManager, status: str, finished_at: float) -> IngestJob:
+    job = IngestJob("/nonexistent.csv", "feedback.csv")
+    job.status = status
+    job.finished_at = finished_at
+    manager._jobs[job.id] = job
+    return job
+
+
+def test_finished_jobs_expire_after_retention():
+    manager = JobManager(max_concurrent=1, retention=60, max_finished=10)
+    old = _finished(manager, DONE, time.time() - 120)
+    recent = _finished(manager, FAILED, time.time() - 10)
+    running = IngestJob("/nonexistent.csv", "feedback.csv")
+    running.status = RUNNING
+    manager._jobs[running.id] = running
+
+    ids = {j.id for j in manager.list()}
+    assert old.id not in ids
+    assert {recent.id, running.id} <= ids
+
+
+def test_only_the_latest_finished_jobs_are_kept():
+    manager = JobManager(max_concurrent=1, retention=3600, max_finished=3)
+    jobs = [_finished(manager, DONE, time.time() - i) for i in range(5)]
+
+    assert [j.id for j in sorted(manager.list(), key=lambda j: -j.finished_at)] == [j.id for j in jobs[:3]]
@@ -0,0 +1,76 @@
+import asyncio
+import numpy as np
+import pytest
+from query_service.dsl.plan_cache import PlanCache
+
+
+# every question embeds to the same vector, so only the entity and number checks decide reuse
+@pytest.fixture
+def cache(monkeypatch):
+    async def same_vector(text):
+        return np.ones(4, dtype=np.float32) / 2
+
+    monkeypatch.setattr(PlanCache, "_embed", staticmethod(same_vector))
+    return PlanCache(semantic_threshold=0.95)
+
+
+def service_plan(service: str, question: str) -> dict:
+    return {"steps": [
+        {"fn": "fetch_all_feedbacks"},
+        {"fn": "filter_by_service", "args": {"service_name": service}},
+        {"fn": "get_texts"},
+        {"fn": "semantic_dynamic", "args": {"prompt": question}},
+        {"fn": "render_text"},
+    ]}
+
+
+def test_exact_hit_ignores_punctuation_and_case(cache):
+    asyncio.run(cache.put("How many reviews?", {"steps": [{"fn": "count_records"}]}))
+    assert asyncio.run(cache.get("how many  reviews")) == {"steps": [{"fn": "count_records"}]}
+    assert cache.exact_hits == 1
+
+
+def test_semantic_hit_rewrites_the_prompt(cache):
+    cached = "מה הבעיה העיקרית בשירות חידוש ויזה?"
+    asyncio.run(cache.put(cached, service_plan("חידוש ויזה", cached)))
+
+    question = "מהי הבעיה המרכזית בשירות חידוש ויזה"
+    plan = asyncio.run(cache.get(question))
+    assert plan["steps"][1]["args"]["service_name"] == "חידוש ויזה"
+    assert plan["steps"][3]["args"]["prompt"] == question
+    assert cache.semantic_hits == 1
+
+
+@pytest.mark.parametrize("cached, plan, question", [
+    # another service
+    ("מה הבעיה העיקרית בשירות חידוש ויזה?",
+     service_plan("חידוש ויזה", "מה הבעיה העיקרית בשירות חידוש ויזה?"),
+     "מה הבעיה העיקרית בשירות דרכון ביומטרי?"),
+    # another keyword
+    ("תציג ביקורות שמכילות את המילה קבצים",
+     {"steps": [
+         {"fn": "fetch_all_feedbacks"},
+         {"fn": "filter_by_text_contains", "args": {"keyword": "קבצים"}},
+         {"fn": "render_table"},
+     ]},
+     "תציג ביקורות שמכילות את המילה תשלום"),
+    # another number
+    ("כמה ביקורות מתחת ל 3",
+     {"steps": [
+         {"fn": "fetch_all_feedbacks"},
+         {"fn": "filter_by_level", "args": {"operator": "lt", "value": 3}},
+         {"fn": "count_records"},
+     ]},
+     "כמה ביקורות מתחת ל 2"),
+])
+def test_semantic_reuse_requires_the_same_entities(cache, cached, plan, question):
+    asyncio.run(cache.put(cached, plan))
+
+    assert asyncio.run(cache.get(question)) is None
+    assert cache.misses == 1
+
+
+def test_service_with_a_prefix_letter_is_recognized(cache):
+    cached = "תן סיכום של התלונות על חידוש ויזה"
+    asyncio.run(cache.put(cached, service_plan("חידוש ויזה", cached)))
+    assert asyncio.run(cache.get("תן סיכום תלונות בחידוש ויזה")) is not None
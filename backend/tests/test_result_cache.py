@@ -0,0 +1,53 @@
+from types import SimpleNamespace
+from query_service.dsl import result_cache as result_cache_module
+from query_service.dsl.result_cache import ResultCache
+
+FETCH = {"fn": "fetch_all_feedbacks"}
+LOW = {"fn": "filter_by_level", "args": {"operator": "lt", "value": 3}}
+COUNT = {"fn": "count_records"}
+
+
+def test_longest_prefix_is_reused():
+    cache = ResultCache()
+    cache.put(1, [FETCH, LOW], "low rows")
+
+    assert cache.longest_prefix(1, [FETCH, LOW, COUNT]) == (2, "low rows", None)
+    assert cache.longest_prefix(1, [FETCH, COUNT]) == (0, None, None)
+
+
+def test_args_order_does_not_change_the_key():
+    cache = ResultCache()
+    cache.put(1, [FETCH, LOW], "low rows")
+    reordered = {"args": {"value": 3, "operator": "lt"}, "fn": "filter_by_level"}
+
+    assert cache.longest_prefix(1, [FETCH, reordered]) == (2, "low rows", None)
+
+
+def test_new_dataset_version_drops_old_results():
+    cache = ResultCache()
+    cache.put(1, [FETCH, LOW], "low rows")
+    cache.put(2, [FETCH, COUNT], "count")
+
+    assert cache.longest_prefix(1, [FETCH, LOW]) == (0, None, None)
+    assert cache.stats()["entries"] == 1
+
+
+def test_errors_are_not_cached():
+    cache = ResultCache()
+    cache.put(1, [FETCH, LOW], {"error": "boom"})
+    assert cache.longest_prefix(1, [FETCH, LOW]) == (0, None, None)
+    assert cache.stats()["entries"] == 0
+
+
+# data restored into Qdrant without the indexing service keeps version 0, only the TTL expires it
+def test_entries_expire_after_the_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(result_cache_module, "time", SimpleNamespace(time=lambda: now[0]))
+    cache = ResultCache(ttl=60)
+    cache.put(0, [FETCH, LOW], "low rows")
+
+    now[0] += 30
+    assert cache.longest_prefix(0, [FETCH, LOW]) == (2, "low rows", None)
+    now[0] += 61
+    assert cache.longest_prefix(0, [FETCH, LOW]) == (0, None, None)
+    assert cache.stats()["entries"] == 0
@@ -0,0 +1,60 @@
+import asyncio
+import sqlite3
+import pytest
+from query_service.dsl import functions, schema_library as schema_library_module
+from query_service.dsl.schema_library import SchemaLibrary
+
+
+@pytest.fixture
+def generated(monkeypatch, llm):
+    async def generate_schema(prompt):
+        return {"summary": "string", "prompt": prompt}
+
+    monkeypatch.setattr(schema_library_module, "generate_schema", generate_schema)
+
+
+def test_generated_schemas_are_capped_lru(tmp_path, generated):
+    path = str(tmp_path / "schemas.sqlite")
+    # a threshold above 1 never matches, every prompt is generated
+    library = SchemaLibrary(path=path, threshold=1.01, max_generated=2)
+    for prompt in ("שאלה ראשונה", "שאלה שנייה", "שאלה שלישית"):
+        asyncio.run(library.get_schema(prompt))
+
+    assert list(library._generated) == ["שאלה שנייה", "שאלה שלישית"]
+    stored = sqlite3.connect(path).execute("SELECT prompt FROM schemas").fetchall()
+    assert sorted(p for (p,) in stored) == sorted(["שאלה שנייה", "שאלה שלישית"])
+    assert list(SchemaLibrary(path=path, max_generated=2)._generated) == ["שאלה שנייה", "שאלה שלישית"]
+
+
+def test_matrix_is_rebuilt_only_on_insert(tmp_path, generated):
+    library = SchemaLibrary(path=str(tmp_path / "schemas.sqlite"))
+    seed_example = "מה הבעיה העיקרית בשירות?"
+
+    assert asyncio.run(library.lookup(seed_example)) is not None
+    matrix = library._matrix
+    asyncio.run(library.lookup(seed_example))
+    assert library._matrix is matrix
+
+    asyncio.run(library._remember("שאלה חדשה לגמרי", {"summary": "string"}))
+    assert library._matrix is None
+    asyncio.run(library.lookup(seed_example))
+    assert library._matrix.shape[0] == matrix.shape[0] + 1
+
+
+def test_schema_task_is_cancelled_when_extraction_fails(monkeypatch):
+    async def slow_schema(prompt):
+        await asyncio.sleep(60)
+
+    def broken_extract(context):
+        raise ValueError("bad context")
+
+    monkeypatch.setattr(functions.schema_library, "get_schema", slow_schema)
+    monkeypatch.setattr(functions, "_extract_texts", broken_extract)
+
+    async def scenario():
+        with pytest.raises(ValueError):
+            await functions.semantic_dynamic({"unexpected": 1}, prompt="שאלה")
+        await asyncio.sleep(0)
+        return [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+
+    assert asyncio.run(scenario()) == []
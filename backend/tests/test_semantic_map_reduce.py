@@ -0,0 +1,48 @@
+import json
+import asyncio
+import pytest
+from query_service.dsl import functions
+
+SCHEMA = {"summary": "string"}
+
+
+@pytest.fixture
+def llm_calls(monkeypatch):
+    monkeypatch.setattr(functions, "SEMANTIC_RETRY_BACKOFF_SECONDS", 0)
+    calls = []
+
+    def install(fails):
+        async def acall_llm(messages, max_tokens=None):
+            user = messages[-1]["content"]
+            calls.append(user)
+            for marker, times in fails.items():
+                if marker in user and calls.count(user) <= times:
+                    raise RuntimeError("llm unavailable")
+            return json.dumps({"summary": "ok"})
+
+        monkeypatch.setattr(functions, "acall_llm", acall_llm)
+        return calls
+
+    return install
+
+
+def test_failed_chunk_is_retried(llm_calls):
+    calls = llm_calls({"חלק 2 מתוך 3": 1})
+    answer = asyncio.run(functions._map_reduce("שאלה", SCHEMA, ["א", "ב", "ג"]))
+
+    assert answer == {"summary": "ok"}
+    assert sum("חלק 2 מתוך 3" in c for c in calls) == 2
+
+
+def test_chunks_that_keep_failing_are_reported(llm_calls):
+    llm_calls({"חלק 3 מתוך 3": 100})
+    answer = asyncio.run(functions._map_reduce("שאלה", SCHEMA, ["א", "ב", "ג"]))
+
+    assert answer["summary"] == "ok"
+    assert answer["coverage"] == {"chunks": 3, "analyzed": 2, "failed_chunks": [3]}
+
+
+def test_all_chunks_failing_is_an_error(llm_calls):
+    llm_calls({"מתוך": 100})
+    answer = asyncio.run(functions._map_reduce("שאלה", SCHEMA, ["א", "ב"]))
+    assert "error" in answer
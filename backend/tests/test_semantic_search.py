@@ -0,0 +1,51 @@
+import asyncio
+import pytest
+from query_service.dsl import functions
+from query_service.dsl.snapshot import feedback_snapshot
+
+
+@pytest.fixture
+def searches(monkeypatch):
+    calls = []
+    search = functions.asearch_points
+
+    async def spy(*args, **kwargs):
+        calls.append(kwargs)
+        return await search(*args, **kwargs)
+
+    monkeypatch.setattr(functions, "asearch_points", spy)
+    return calls
+
+
+def context():
+    df = asyncio.run(feedback_snapshot.get())
+    return df[df["Level"] <= 2]
+
+
+# a probe for the best score, then Qdrant applies the threshold
+def test_small_context_is_thresholded_by_qdrant(feedback, searches):
+    df = context()
+    result = asyncio.run(functions.filter_by_text_semantic(df, "האתר נתקע"))
+
+    assert len(searches) == 2
+    assert all(c["query_filter"] is not None for c in searches)
+    assert searches[0]["top_k"] == functions.SEMANTIC_MIN_RESULTS
+    assert searches[1]["score_threshold"] > 0
+    assert set(result["point_id"]) <= set(df["point_id"])
+    assert len(result) >= min(len(df), functions.SEMANTIC_MIN_RESULTS)
+    assert result["score"].is_monotonic_decreasing
+
+
+# above the id limit the global ranking is paged, the rows kept must be the same
+def test_large_context_pages_the_global_ranking(feedback, searches, monkeypatch):
+    df = context()
+    expected = asyncio.run(functions.filter_by_text_semantic(df, "האתר נתקע"))
+
+    monkeypatch.setattr(functions, "SEMANTIC_HAS_ID_LIMIT", 10)
+    monkeypatch.setattr(functions, "SEMANTIC_SEARCH_PAGE_SIZE", 25)
+    searches.clear()
+    result = asyncio.run(functions.filter_by_text_semantic(df, "האתר נתקע"))
+
+    assert all(c.get("query_filter") is None for c in searches)
+    assert len(result) > 0
+    assert set(result["point_id"]) == set(expected["point_id"])
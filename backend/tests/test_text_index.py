@@ -0,0 +1,56 @@
+import asyncio
+import pytest
+from query_service.dsl import functions
+from query_service.dsl.snapshot import feedback_snapshot
+from query_service.dsl.text_index import TextIndex, normalize_text
+
+TEXTS = [
+    "שלום, חיכיתי הרבה בתורים",
+    "קיבלתי הודעת שגיאה 404",
+    "הודעות שגיאות חוזרות",
+    "המשלוח לא הגיע",
+    "Error in the FORM",
+    "הַתּוֹר היה ארוך",
+    "תור קצר, שירות טוב",
+    "חידשתי דרכון־ביומטרי",
+    None,
+]
+TERMS = ["תור", "התורים", "לום", "שלום", "שגיאה", "שגיא", "שלוח", "הודעת שגיאה", "404", "error", "form!", "תּוֹר", "תור קצר", "לא הגיע", "דרכון ביומטרי", "דרכון־ביומטרי", "ןב"]
+
+
+def scan(term):
+    return {str(i) for i, t in enumerate(TEXTS) if normalize_text(term) in normalize_text(t)}
+
+
+@pytest.mark.parametrize("term", TERMS)
+def test_index_matches_the_plain_scan(term):
+    index = TextIndex(TEXTS, range(len(TEXTS)))
+    assert index.search([term]) == scan(term)
+
+
+def test_any_and_all():
+    index = TextIndex(TEXTS, range(len(TEXTS)))
+    assert index.search(["404", "משלוח"], match="any") == scan("404") | scan("משלוח")
+    assert index.search(["הודעת", "שגיאה"], match="all") == {"1"}
+
+
+def test_punctuation_only_term_cannot_be_looked_up():
+    assert TextIndex(TEXTS, range(len(TEXTS))).search(["?!"]) is None
+
+
+# with a fresh snapshot the index answers, without it the rows are scanned: same rows either way
+@pytest.mark.parametrize("keyword", ["קבצים", "שגיאה", "נתקע", "ההמתנה", "לום", "הודעת שגיאה"])
+def test_filter_by_text_contains_does_not_depend_on_the_snapshot(feedback, monkeypatch, keyword):
+    df = asyncio.run(feedback_snapshot.get())
+    indexed = asyncio.run(functions.filter_by_text_contains(df, keyword=keyword))
+
+    monkeypatch.setattr(feedback_snapshot, "text_index", None)
+    scanned = asyncio.run(functions.filter_by_text_contains(df, keyword=keyword))
+
+    assert set(indexed["point_id"]) == set(scanned["point_id"])
+
+
+# the maqaf separates words like a hyphen, it doesn't glue them
+def test_maqaf_is_a_word_break():
+    assert normalize_text("דרכון־ביומטרי") == "דרכון ביומטרי"
+    assert normalize_text("הַתּוֹר") == "התור"
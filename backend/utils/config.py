@@ -16,12 +16,131 @@ NVIDIA_LLM_BASE_URL = os.getenv("NVIDIA_LLM_BASE_URL", "https://integrate.api.nv
 
 NVIDIA_EMBED_MODEL = os.getenv("NVIDIA_EMBED_MODEL", "nvidia/llama-3.2-nemoretriever-300m-embed-v2")
 NVIDIA_EMBED_BASE_URL = os.getenv("NVIDIA_EMBED_BASE_URL", "https://integrate.api.nvidia.com/v1")
+NVIDIA_EMBED_DIM = int(os.getenv("NVIDIA_EMBED_DIM", "2048"))
+# כמה טקסטים נשלחים בבקשת embedding אחת
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "64"))
+
+# ---------------------------------------------------------
+# EMBEDDING PROVIDERS
+# ---------------------------------------------------------
+# איזה ספק מייצר את הוקטורים של כל שדה: nvidia (מרוחק) או local (מודל CPU בתהליך).
+# חייב להיות אותו ספק באינדוקס ובשאילתות - שינוי דורש אינדוקס מחדש
+EMBED_PROVIDER_TEXT = os.getenv("EMBED_PROVIDER_TEXT", "nvidia")
+EMBED_PROVIDER_SERVICE = os.getenv("EMBED_PROVIDER_SERVICE", "nvidia")
+LOCAL_EMBED_MODEL = os.getenv("LOCAL_EMBED_MODEL", "intfloat/multilingual-e5-small")
+LOCAL_EMBED_DEVICE = os.getenv("LOCAL_EMBED_DEVICE", "cpu")
+LOCAL_EMBED_QUERY_PREFIX = os.getenv("LOCAL_EMBED_QUERY_PREFIX", "query: ")
+LOCAL_EMBED_PASSAGE_PREFIX = os.getenv("LOCAL_EMBED_PASSAGE_PREFIX", "passage: ")
+
+# ---------------------------------------------------------
+# HTTP CLIENTS (async query path)
+# ---------------------------------------------------------
+# גודל מאגר החיבורים ו-timeouts של הלקוחות ה-async (LLM, embeddings, Qdrant)
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "200"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "50"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "10"))
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "300"))
+EMBED_TIMEOUT_SECONDS = float(os.getenv("EMBED_TIMEOUT_SECONDS", "30"))
+QDRANT_TIMEOUT_SECONDS = int(os.getenv("QDRANT_TIMEOUT_SECONDS", "30"))
+
+# ---------------------------------------------------------
+# LOCAL CACHE CONFIG
+# ---------------------------------------------------------
+# תיקייה לקבצי מטמון מקומיים (נשמרים בין הפעלות)
+DATA_DIR = os.getenv("DATA_DIR", ".inda_cache")
+EMBED_CACHE_PATH = os.getenv("EMBED_CACHE_PATH", os.path.join(DATA_DIR, "embeddings.sqlite"))
+# כמה וקטורים נשמרים בזיכרון (float32, כ-8KB לוקטור של 2048) וכמה בקובץ; בקובץ נמחקים הישנים ראשונים
+EMBED_CACHE_SIZE = int(os.getenv("EMBED_CACHE_SIZE", "20000"))
+EMBED_DISK_CACHE_SIZE = int(os.getenv("EMBED_DISK_CACHE_SIZE", "200000"))
 
 # ---------------------------------------------------------
 # QDRANT CONFIG
 # ---------------------------------------------------------
 QDRANT_URL = os.getenv("QDRANT_URL", "http://localhost:6333")
+# Qdrant בתוך התהליך (נתיב לתיקייה או :memory:) במקום שרת - לפיתוח ולבנצ'מרקים בלי רשת
+QDRANT_PATH = os.getenv("QDRANT_PATH", "")
 QDRANT_COLLECTION = os.getenv("QDRANT_COLLECTION", "feedback_embeddings")
+# כתיבה ל-Qdrant במנות: גודל מנה וכמה מנות נכתבות במקביל
+UPSERT_BATCH_SIZE = int(os.getenv("UPSERT_BATCH_SIZE", "256"))
+UPSERT_PARALLEL = int(os.getenv("UPSERT_PARALLEL", "2"))
+# גודל עמוד בסריקה מלאה של הקולקשן
+SCROLL_PAGE_SIZE = int(os.getenv("SCROLL_PAGE_SIZE", "2000"))
+# אופן שמירת הוקטורים: default / on_disk / scalar / binary (ראו utils/storage_profiles.py)
+QDRANT_STORAGE_PROFILE = os.getenv("QDRANT_STORAGE_PROFILE", "default")
+HNSW_M = int(os.getenv("HNSW_M", "16"))
+HNSW_EF_CONSTRUCT = int(os.getenv("HNSW_EF_CONSTRUCT", "100"))
+# 0 = ברירת המחדל של Qdrant
+HNSW_EF_SEARCH = int(os.getenv("HNSW_EF_SEARCH", "0"))
+
+# ---------------------------------------------------------
+# INGESTION CONFIG
+# ---------------------------------------------------------
+# כמה שורות CSV נקראות ומעובדות בכל פעם
+CSV_CHUNK_ROWS = int(os.getenv("CSV_CHUNK_ROWS", "2000"))
+# גודל הבלוק בהעתקת קובץ שהועלה לדיסק
+UPLOAD_SPOOL_BYTES = int(os.getenv("UPLOAD_SPOOL_BYTES", str(1024 * 1024)))
+# כמה משימות אינדוקס רצות במקביל, וכמה יכולות לחכות בתור
+MAX_CONCURRENT_JOBS = int(os.getenv("MAX_CONCURRENT_JOBS", "2"))
+MAX_QUEUED_JOBS = int(os.getenv("MAX_QUEUED_JOBS", "10"))
+# משימות שהסתיימו נשמרות לצפייה בסטטוס לזמן מוגבל, ולכל היותר מספר קבוע מהן
+FINISHED_JOB_RETENTION_SECONDS = int(os.getenv("FINISHED_JOB_RETENTION_SECONDS", str(24 * 3600)))
+MAX_FINISHED_JOBS = int(os.getenv("MAX_FINISHED_JOBS", "100"))
+# תרגום שמות השירותים: כמה קריאות LLM במקביל, והטבלה שבה נשמרים התרגומים
+TRANSLATE_CONCURRENCY = int(os.getenv("TRANSLATE_CONCURRENCY", "8"))
+TRANSLATE_MAX_TOKENS = int(os.getenv("TRANSLATE_MAX_TOKENS", "256"))
+TRANSLATION_DB_PATH = os.getenv("TRANSLATION_DB_PATH", os.path.join(DATA_DIR, "translations.sqlite"))
+
+# ---------------------------------------------------------
+# QUERY SERVICE CACHES
+# ---------------------------------------------------------
+# טבלת המשובים נשמרת בזיכרון ומתרעננת כשגרסת הנתונים משתנה או אחרי TTL
+SNAPSHOT_TTL_SECONDS = int(os.getenv("SNAPSHOT_TTL_SECONDS", "3600"))
+# כל כמה שניות בודקים מול Qdrant אם גרסת הנתונים השתנתה
+SNAPSHOT_VERSION_CHECK_SECONDS = float(os.getenv("SNAPSHOT_VERSION_CHECK_SECONDS", "5"))
+# אינדקס טקסט מלא (עברית, בלי ניקוד ואותיות שימוש) שנבנה יחד עם העותק בזיכרון
+TEXT_INDEX_ENABLED = os.getenv("TEXT_INDEX_ENABLED", "true").lower() == "true"
+
+# תבניות קבועות לשאלות הנפוצות (ספירה, ממוצע, הצגה) שלא עוברות דרך ה־LLM
+FAST_PATH_ENABLED = os.getenv("FAST_PATH_ENABLED", "true").lower() == "true"
+
+# אינדקס שמות השירותים: שירותים שהדמיון שלהם נמוך מהטוב ביותר ביותר מהמרווח הזה לא נכללים
+SERVICE_MATCH_MARGIN = float(os.getenv("SERVICE_MATCH_MARGIN", "0.05"))
+
+# מטמון תוכניות DSL לשאלות: התאמה מדויקת ואז התאמה סמנטית מעל הסף
+PLAN_CACHE_SIZE = int(os.getenv("PLAN_CACHE_SIZE", "1000"))
+PLAN_CACHE_TTL_SECONDS = int(os.getenv("PLAN_CACHE_TTL_SECONDS", str(24 * 3600)))
+PLAN_CACHE_SEMANTIC = os.getenv("PLAN_CACHE_SEMANTIC", "true").lower() == "true"
+PLAN_CACHE_SEMANTIC_THRESHOLD = float(os.getenv("PLAN_CACHE_SEMANTIC_THRESHOLD", "0.95"))
+
+# מטמון תוצאות של תוכניות (לפי קידומת צעדים וגרסת נתונים)
+RESULT_CACHE_SIZE = int(os.getenv("RESULT_CACHE_SIZE", "256"))
+# תוקף תוצאה במטמון - גם כשהגרסה לא משתנה (למשל נתונים ששוחזרו ישירות ל-Qdrant, גרסה 0)
+RESULT_CACHE_TTL_SECONDS = int(os.getenv("RESULT_CACHE_TTL_SECONDS", "3600"))
+
+# תוכניות עם ענפים (DAG): כמה צעדים רצים במקביל לכל היותר
+DAG_MAX_PARALLEL = int(os.getenv("DAG_MAX_PARALLEL", "4"))
+
+# ---------------------------------------------------------
+# SEMANTIC ANALYSIS (semantic_dynamic)
+# ---------------------------------------------------------
+# תקציב הטוקנים של כל חלק טקסט שנשלח לניתוח, ואומדן תווים לטוקן בעברית
+SEMANTIC_CHUNK_TOKENS = int(os.getenv("SEMANTIC_CHUNK_TOKENS", "16000"))
+SEMANTIC_CHARS_PER_TOKEN = float(os.getenv("SEMANTIC_CHARS_PER_TOKEN", "3"))
+# כמה חלקים מנותחים במקביל
+SEMANTIC_MAP_CONCURRENCY = int(os.getenv("SEMANTIC_MAP_CONCURRENCY", "6"))
+# כמה פעמים מנסים שוב ניתוח של חלק שנכשל, והמתנה בין הניסיונות
+SEMANTIC_RETRIES = int(os.getenv("SEMANTIC_RETRIES", "2"))
+SEMANTIC_RETRY_BACKOFF_SECONDS = float(os.getenv("SEMANTIC_RETRY_BACKOFF_SECONDS", "1"))
+# חיפוש סמנטי בטקסט: גודל עמוד, תקרת תוצאות, ומספר השורות המקסימלי שמצמצמים אליהן לפי מזהה
+# (הקשר גדול יותר נסרק בעמודים מהדירוג הכללי וחותכים אותו עם ההקשר)
+SEMANTIC_SEARCH_PAGE_SIZE = int(os.getenv("SEMANTIC_SEARCH_PAGE_SIZE", "500"))
+SEMANTIC_SEARCH_MAX_RESULTS = int(os.getenv("SEMANTIC_SEARCH_MAX_RESULTS", "10000"))
+SEMANTIC_HAS_ID_LIMIT = int(os.getenv("SEMANTIC_HAS_ID_LIMIT", "20000"))
+# ספריית סכמות תשובה: סף דמיון לשימוש חוזר בסכמה קיימת, והקובץ שבו נשמרות סכמות שנוצרו
+SCHEMA_MATCH_THRESHOLD = float(os.getenv("SCHEMA_MATCH_THRESHOLD", "0.85"))
+SCHEMA_LIBRARY_PATH = os.getenv("SCHEMA_LIBRARY_PATH", os.path.join(DATA_DIR, "schemas.sqlite"))
+# כמה סכמות שנוצרו נשמרות לכל היותר (הכי פחות בשימוש נמחקת ראשונה)
+SCHEMA_LIBRARY_SIZE = int(os.getenv("SCHEMA_LIBRARY_SIZE", "500"))
 
 # ---------------------------------------------------------
 # LOGGING SETTINGS
@@ -0,0 +1,51 @@
+import time
+from qdrant_client.models import VectorParams, Distance, PointStruct
+from utils.config import QDRANT_COLLECTION
+from utils.qdrant_utils import qdrant, async_qdrant
+
+# the dataset version lives in a tiny side collection, so every process that talks to
+# Qdrant (indexing service, query service workers) sees the same value
+META_COLLECTION = f"{QDRANT_COLLECTION}_meta"
+VERSION_POINT_ID = 1
+
+
+def _ensure_meta_collection():
+    if not qdrant.collection_exists(META_COLLECTION):
+        qdrant.create_collection(
+            collection_name=META_COLLECTION,
+            vectors_config=VectorParams(size=1, distance=Distance.DOT),
+        )
+
+
+# called by the indexing service whenever the feedback collection changed
+def bump_dataset_version() -> int:
+    _ensure_meta_collection()
+    version = time.time_ns()
+    qdrant.upsert(
+        collection_name=META_COLLECTION,
+        points=[PointStruct(id=VERSION_POINT_ID, vector=[0.0], payload={"version": version})],
+        wait=True,
+    )
+    print(f"dataset version is now {version}")
+    return version
+
+
+# 0 when nothing was indexed yet (or the collection was created before versions existed)
+def get_dataset_version() -> int:
+    try:
+        records = qdrant.retrieve(collection_name=META_COLLECTION, ids=[VERSION_POINT_ID], with_payload=True)
+    except Exception:
+        return 0
+    if not records or not records[0].payload:
+        return 0
+    return int(records[0].payload.get("version", 0))
+
+
+async def aget_dataset_version() -> int:
+    try:
+        records = await async_qdrant.retrieve(collection_name=META_COLLECTION, ids=[VERSION_POINT_ID], with_payload=True)
+    except Exception:
+        return 0
+    if not records or not records[0].payload:
+        return 0
+    return int(records[0].payload.get("version", 0))
@@ -0,0 +1,143 @@
+import os
+import asyncio
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from utils.config import EMBED_CACHE_PATH, EMBED_CACHE_SIZE, EMBED_DISK_CACHE_SIZE, debug_log
+
+CacheKey = Tuple[str, str, str]
+
+
+# two level cache for embeddings: bounded LRU in memory and a SQLite table on disk
+# keys are (model, input_type, text) so vectors of different models never mix.
+# vectors are kept as float32 arrays (8 KB for 2048 dims, a list of floats would take ~65 KB);
+# the disk table keeps the last max_disk_items written, the oldest rows are deleted first.
+class EmbeddingCache:
+
+    def __init__(self, path: Optional[str] = EMBED_CACHE_PATH, max_items: int = EMBED_CACHE_SIZE,
+                 max_disk_items: int = EMBED_DISK_CACHE_SIZE):
+        self.max_items = max_items
+        self.max_disk_items = max_disk_items
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._lru: "OrderedDict[CacheKey, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                " model TEXT NOT NULL, input_type TEXT NOT NULL, text TEXT NOT NULL, vector BLOB NOT NULL,"
+                " PRIMARY KEY (model, input_type, text))"
+            )
+            self._db.commit()
+            self._disk_items = self._db.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    # returns the cached vectors, texts that are not cached are missing from the dict
+    def get_many(self, model: str, input_type: str, texts: Sequence[str]) -> Dict[str, np.ndarray]:
+        found = self._from_memory(model, input_type, texts)
+        missing = [t for t in dict.fromkeys(texts) if t not in found]
+        if missing and self._db is not None:
+            found.update(self._from_disk(model, input_type, missing))
+        self._count(texts, found)
+        return found
+
+    # get_many for the event loop: memory hits are answered directly, the SQLite read runs in a thread
+    async def aget_many(self, model: str, input_type: str, texts: Sequence[str]) -> Dict[str, np.ndarray]:
+        found = self._from_memory(model, input_type, texts)
+        missing = [t for t in dict.fromkeys(texts) if t not in found]
+        if missing and self._db is not None:
+            found.update(await asyncio.to_thread(self._from_disk, model, input_type, missing))
+        self._count(texts, found)
+        return found
+
+    def _from_memory(self, model: str, input_type: str, texts: Sequence[str]) -> Dict[str, np.ndarray]:
+        found = {}
+        with self._lock:
+            for text in texts:
+                key = (model, input_type, text)
+                if key in self._lru:
+                    self._lru.move_to_end(key)
+                    found[text] = self._lru[key]
+        return found
+
+    def _from_disk(self, model: str, input_type: str, texts: List[str]) -> Dict[str, np.ndarray]:
+        found = {}
+        with self._lock:
+            for text, vector in self._read_disk(model, input_type, texts):
+                found[text] = vector
+                self._remember((model, input_type, text), vector)
+                self.disk_hits += 1
+        return found
+
+    def _count(self, texts: Sequence[str], found: Dict[str, np.ndarray]):
+        with self._lock:
+            self.hits += sum(1 for t in texts if t in found)
+            self.misses += sum(1 for t in texts if t not in found)
+
+    def put_many(self, model: str, input_type: str, items: Dict[str, Sequence[float]]):
+        if not items:
+            return
+        vectors = {text: np.asarray(vector, dtype=np.float32) for text, vector in items.items()}
+        with self._lock:
+            for text, vector in vectors.items():
+                self._remember((model, input_type, text), vector)
+            if self._db is not None:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO embeddings (model, input_type, text, vector) VALUES (?, ?, ?, ?)",
+                    [(model, input_type, text, vector.tobytes()) for text, vector in vectors.items()],
+                )
+                self._trim_disk(len(vectors))
+                self._db.commit()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "memory_items": len(self._lru),
+            "disk_items": self._disk_items if self._db is not None else 0,
+        }
+
+    # a replaced row gets a new rowid, so the smallest rowids are the oldest writes
+    def _trim_disk(self, added: int):
+        if self._disk_items + added <= self.max_disk_items:
+            self._disk_items += added
+            return
+        self._disk_items = self._db.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        extra = self._disk_items - self.max_disk_items
+        if extra > 0:
+            self._db.execute("DELETE FROM embeddings WHERE rowid IN (SELECT rowid FROM embeddings ORDER BY rowid LIMIT ?)", (extra,))
+            self._disk_items -= extra
+
+    def _remember(self, key: CacheKey, vector: np.ndarray):
+        self._lru[key] = vector
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.max_items:
+            self._lru.popitem(last=False)
+
+    def _read_disk(self, model: str, input_type: str, texts: List[str]):
+        # sqlite limits the number of bound parameters, read in slices
+        for start in range(0, len(texts), 500):
+            part = texts[start:start + 500]
+            placeholders = ",".join("?" * len(part))
+            rows = self._db.execute(
+                f"SELECT text, vector FROM embeddings WHERE model = ? AND input_type = ? AND text IN ({placeholders})",
+                [model, input_type, *part],
+            ).fetchall()
+            for text, blob in rows:
+                yield text, np.frombuffer(blob, dtype=np.float32)
+
+
+try:
+    embedding_cache = EmbeddingCache()
+except sqlite3.Error as e:
+    # the disk store is an optimization, fall back to memory only if it can't be opened
+    print(f"embedding cache: can't open {EMBED_CACHE_PATH} ({e}), using memory only")
+    embedding_cache = EmbeddingCache(path=None)
+debug_log(f"embedding cache ready (max {EMBED_CACHE_SIZE} in memory, {EMBED_DISK_CACHE_SIZE} on disk)")
@@ -0,0 +1,165 @@
+import asyncio
+import threading
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, List
+from openai import OpenAI, AsyncOpenAI
+from utils.http_clients import async_openai_http_client
+from utils.config import (
+    NVIDIA_API_KEY,
+    NVIDIA_EMBED_MODEL,
+    NVIDIA_EMBED_BASE_URL,
+    NVIDIA_EMBED_DIM,
+    LOCAL_EMBED_MODEL,
+    LOCAL_EMBED_DEVICE,
+    LOCAL_EMBED_QUERY_PREFIX,
+    LOCAL_EMBED_PASSAGE_PREFIX,
+    EMBED_PROVIDER_TEXT,
+    EMBED_PROVIDER_SERVICE,
+    EMBED_TIMEOUT_SECONDS,
+    debug_log,
+)
+
+
+# an embedding backend: turns a batch of texts into vectors, in input order
+class EmbeddingProvider(ABC):
+    name = ""
+    model = ""
+
+    @property
+    @abstractmethod
+    def dimension(self) -> int:
+        ...
+
+    @abstractmethod
+    def embed(self, texts: List[str], input_type: str = "query") -> List[List[float]]:
+        ...
+
+    # async variant for the query path, providers without an async client run `embed` in a thread
+    async def aembed(self, texts: List[str], input_type: str = "query") -> List[List[float]]:
+        return await asyncio.to_thread(self.embed, texts, input_type)
+
+    # load models / open connections ahead of the first request
+    def warm_up(self):
+        pass
+
+
+# the remote NVIDIA endpoint (OpenAI compatible API)
+class NvidiaEmbeddingProvider(EmbeddingProvider):
+    name = "nvidia"
+
+    def __init__(self, model: str = NVIDIA_EMBED_MODEL, base_url: str = NVIDIA_EMBED_BASE_URL, dimension: int = NVIDIA_EMBED_DIM):
+        self.model = model
+        self._dimension = dimension
+        self.client = OpenAI(api_key=NVIDIA_API_KEY, base_url=base_url)
+        self.async_client = AsyncOpenAI(
+            api_key=NVIDIA_API_KEY,
+            base_url=base_url,
+            http_client=async_openai_http_client(EMBED_TIMEOUT_SECONDS),
+        )
+
+    @property
+    def dimension(self) -> int:
+        return self._dimension
+
+    def embed(self, texts: List[str], input_type: str = "query") -> List[List[float]]:
+        response = self.client.embeddings.create(
+            input=texts,
+            model=self.model,
+            encoding_format="float",
+            extra_body={"input_type": input_type, "truncate": "NONE"},
+        )
+        # the API may return items out of order, index tells the original position
+        return [d.embedding for d in sorted(response.data, key=lambda d: d.index)]
+
+    async def aembed(self, texts: List[str], input_type: str = "query") -> List[List[float]]:
+        response = await self.async_client.embeddings.create(
+            input=texts,
+            model=self.model,
+            encoding_format="float",
+            extra_body={"input_type": input_type, "truncate": "NONE"},
+        )
+        return [d.embedding for d in sorted(response.data, key=lambda d: d.index)]
+
+
+# in-process CPU model (sentence-transformers), loaded once and reused by all requests
+class LocalEmbeddingProvider(EmbeddingProvider):
+    name = "local"
+
+    def __init__(self, model: str = LOCAL_EMBED_MODEL, device: str = LOCAL_EMBED_DEVICE):
+        self.model = model
+        self.device = device
+        self._encoder = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._encoder is None:
+            with self._lock:
+                if self._encoder is None:
+                    try:
+                        from sentence_transformers import SentenceTransformer
+                    except ImportError as e:
+                        raise RuntimeError(
+                            "the local embedding provider needs sentence-transformers (pip install sentence-transformers)"
+                        ) from e
+                    debug_log(f"loading local embedding model {self.model} on {self.device}")
+                    self._encoder = SentenceTransformer(self.model, device=self.device)
+        return self._encoder
+
+    @property
+    def dimension(self) -> int:
+        return self._load().get_sentence_embedding_dimension()
+
+    def embed(self, texts: List[str], input_type: str = "query") -> List[List[float]]:
+        prefix = LOCAL_EMBED_QUERY_PREFIX if input_type == "query" else LOCAL_EMBED_PASSAGE_PREFIX
+        vectors = self._load().encode(
+            [prefix + t for t in texts],
+            batch_size=len(texts),
+            normalize_embeddings=True,
+            convert_to_numpy=True,
+        )
+        return vectors.tolist()
+
+    def warm_up(self):
+        self._load()
+
+
+_factories: Dict[str, Callable[[], EmbeddingProvider]] = {
+    NvidiaEmbeddingProvider.name: NvidiaEmbeddingProvider,
+    LocalEmbeddingProvider.name: LocalEmbeddingProvider,
+}
+_providers: Dict[str, EmbeddingProvider] = {}
+_providers_lock = threading.Lock()
+
+# which provider embeds each vector field. the same provider must be used at ingest and at
+# query time, otherwise the query vector and the stored vectors are in different spaces.
+PROVIDER_FOR_USE = {
+    "text": EMBED_PROVIDER_TEXT,
+    "service": EMBED_PROVIDER_SERVICE,
+}
+
+
+def register_provider(name: str, factory: Callable[[], EmbeddingProvider]):
+    with _providers_lock:
+        _factories[name] = factory
+        _providers.pop(name, None)
+
+
+def get_provider(name: str) -> EmbeddingProvider:
+    if name not in _providers:
+        with _providers_lock:
+            if name not in _providers:
+                if name not in _factories:
+                    raise ValueError(f"unknown embedding provider '{name}', expected one of {list(_factories)}")
+                _providers[name] = _factories[name]()
+    return _providers[name]
+
+
+def provider_for(use: str) -> EmbeddingProvider:
+    if use not in PROVIDER_FOR_USE:
+        raise ValueError(f"unknown embedding use '{use}', expected one of {list(PROVIDER_FOR_USE)}")
+    return get_provider(PROVIDER_FOR_USE[use])
+
+
+def warm_up_providers():
+    for name in set(PROVIDER_FOR_USE.values()):
+        get_provider(name).warm_up()
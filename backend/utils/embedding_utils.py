@@ -1,18 +1,68 @@
-from utils.config import NVIDIA_API_KEY, NVIDIA_EMBED_MODEL, NVIDIA_EMBED_BASE_URL, debug_log
-from openai import OpenAI
+import asyncio
+from typing import List
+from utils.config import EMBED_BATCH_SIZE, debug_log
+from utils.embedding_cache import embedding_cache
+from utils.embedding_providers import provider_for
+from utils.metrics import timed
 
-client = OpenAI(api_key=NVIDIA_API_KEY, base_url=NVIDIA_EMBED_BASE_URL)
 
+# `use` picks the provider of the vector field the embedding is for: "text" or "service"
+def get_embedding(text: str, input_type="query", use: str = "text"):
 
-def get_embedding(text: str, input_type="query"):
+    provider = provider_for(use)
+    cached = embedding_cache.get_many(provider.model, input_type, [text])
+    if text in cached:
+        debug_log(f"embedding cache hit for: '{text[:40]}...'")
+        return cached[text].tolist()
 
-    print(f"[Generating embedding for: '{text}...'")
-    response = client.embeddings.create(
-        input=[text],
-        model=NVIDIA_EMBED_MODEL,
-        encoding_format="float",
-        extra_body={"input_type": input_type, "truncate": "NONE"},
-    )
-    vector = response.data[0].embedding
+    print(f"[Generating embedding for: '{text}...' ({provider.name})")
+    with timed("embedding", provider.name, texts=1):
+        vector = provider.embed([text], input_type=input_type)[0]
+    embedding_cache.put_many(provider.model, input_type, {text: vector})
+    print(f"MBEDDING DONE length={len(vector)}")
+    return vector
+
+
+# embed many texts with one request per batch, vectors are returned in input order
+# texts that are already cached (or repeated in the input) are not sent again.
+# cache=False for texts that are embedded once, like the feedback texts of an ingest: they would
+# only push the service and query vectors out of the cache
+def get_embeddings(texts: List[str], input_type="passage", batch_size: int = EMBED_BATCH_SIZE, use: str = "text",
+                   cache: bool = True) -> List[List[float]]:
+    if batch_size < 1:
+        raise ValueError("batch_size must be >= 1")
+
+    provider = provider_for(use)
+    known = {t: v.tolist() for t, v in embedding_cache.get_many(provider.model, input_type, texts).items()} if cache else {}
+    missing = [t for t in dict.fromkeys(texts) if t not in known]
+    debug_log(f"embedding {len(texts)} texts, {len(missing)} not cached ({provider.name})")
+
+    for start in range(0, len(missing), batch_size):
+        batch = missing[start:start + batch_size]
+        debug_log(f"embedding batch {start // batch_size + 1} ({len(batch)} texts)")
+        with timed("embedding", provider.name, texts=len(batch)):
+            computed = dict(zip(batch, provider.embed(batch, input_type=input_type)))
+        if cache:
+            embedding_cache.put_many(provider.model, input_type, computed)
+        known.update(computed)
+
+    vectors = [known[t] for t in texts]
+    print(f"EMBEDDING BATCH DONE count={len(vectors)}")
+    return vectors
+
+
+# async version of get_embedding for the query path
+async def aget_embedding(text: str, input_type="query", use: str = "text"):
+
+    provider = provider_for(use)
+    cached = await embedding_cache.aget_many(provider.model, input_type, [text])
+    if text in cached:
+        debug_log(f"embedding cache hit for: '{text[:40]}...'")
+        return cached[text].tolist()
+
+    print(f"[Generating embedding for: '{text}...' ({provider.name})")
+    with timed("embedding", provider.name, texts=1):
+        vector = (await provider.aembed([text], input_type=input_type))[0]
+    await asyncio.to_thread(embedding_cache.put_many, provider.model, input_type, {text: vector})
     print(f"MBEDDING DONE length={len(vector)}")
     return vector
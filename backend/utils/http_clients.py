@@ -0,0 +1,16 @@
+import httpx
+from openai import DefaultAsyncHttpxClient
+from utils.config import HTTP_MAX_CONNECTIONS, HTTP_MAX_KEEPALIVE, HTTP_CONNECT_TIMEOUT
+
+
+def pool_limits() -> httpx.Limits:
+    return httpx.Limits(max_connections=HTTP_MAX_CONNECTIONS, max_keepalive_connections=HTTP_MAX_KEEPALIVE)
+
+
+def pool_timeout(seconds: float) -> httpx.Timeout:
+    return httpx.Timeout(seconds, connect=HTTP_CONNECT_TIMEOUT)
+
+
+# pooled keep-alive http client for the async OpenAI compatible clients
+def async_openai_http_client(timeout_seconds: float) -> httpx.AsyncClient:
+    return DefaultAsyncHttpxClient(limits=pool_limits(), timeout=pool_timeout(timeout_seconds))
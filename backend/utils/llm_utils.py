@@ -1,19 +1,77 @@
 import os
-from openai import OpenAI
-from utils.config import NVIDIA_API_KEY, NVIDIA_LLM_MODEL, NVIDIA_LLM_BASE_URL, debug_log
-from openai import OpenAI
+from openai import OpenAI, AsyncOpenAI
+from utils.config import NVIDIA_API_KEY, NVIDIA_LLM_MODEL, NVIDIA_LLM_BASE_URL, LLM_TIMEOUT_SECONDS, debug_log
+from utils.http_clients import async_openai_http_client
+from utils.metrics import timed
 
 client = OpenAI(api_key=NVIDIA_API_KEY, base_url=NVIDIA_LLM_BASE_URL)
 
+# used by the async query path, shares one connection pool between all requests
+async_client = AsyncOpenAI(
+    api_key=NVIDIA_API_KEY,
+    base_url=NVIDIA_LLM_BASE_URL,
+    http_client=async_openai_http_client(LLM_TIMEOUT_SECONDS),
+)
+
+
+# token counts reported by the API, when it sends them
+def _record_usage(fields, completion):
+    usage = getattr(completion, "usage", None)
+    if usage is not None:
+        fields.update(prompt_tokens=usage.prompt_tokens, completion_tokens=usage.completion_tokens)
+
+
 def call_llm(messages, max_tokens=90000):
 
     print(f"Calling llm model")
-    completion = client.chat.completions.create(
-        model=NVIDIA_LLM_MODEL,
-        messages=messages,
-        temperature=0.3,
-        max_tokens=max_tokens,
-    )
+    with timed("llm", "call_llm") as m:
+        completion = client.chat.completions.create(
+            model=NVIDIA_LLM_MODEL,
+            messages=messages,
+            temperature=0.3,
+            max_tokens=max_tokens,
+        )
+        _record_usage(m, completion)
     content = completion.choices[0].message.content.strip()
     print(f"llm done, Output length: {len(content)} chars")
     return content
+
+
+async def acall_llm(messages, max_tokens=90000):
+
+    print(f"Calling llm model (async)")
+    with timed("llm", "acall_llm") as m:
+        completion = await async_client.chat.completions.create(
+            model=NVIDIA_LLM_MODEL,
+            messages=messages,
+            temperature=0.3,
+            max_tokens=max_tokens,
+        )
+        _record_usage(m, completion)
+    content = completion.choices[0].message.content.strip()
+    print(f"llm done, Output length: {len(content)} chars")
+    return content
+
+
+# streams the completion, yields the text pieces as they arrive
+async def acall_llm_stream(messages, max_tokens=90000):
+
+    print(f"Calling llm model (stream)")
+    # the stream has no usage block, every content chunk is counted as one completion token
+    with timed("llm", "acall_llm_stream") as m:
+        stream = await async_client.chat.completions.create(
+            model=NVIDIA_LLM_MODEL,
+            messages=messages,
+            temperature=0.3,
+            max_tokens=max_tokens,
+            stream=True,
+        )
+        length = 0
+        chunks = 0
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                length += len(chunk.choices[0].delta.content)
+                chunks += 1
+                m["completion_tokens"] = chunks
+                yield chunk.choices[0].delta.content
+    print(f"llm done, Output length: {length} chars")
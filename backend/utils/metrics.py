@@ -0,0 +1,166 @@
+import time
+import bisect
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+# process wide counters and histograms, rendered in the Prometheus text format on /metrics,
+# plus an optional per-request list of timed events (the `timings` block of /query).
+
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+
+def _label_text(names: Sequence[str], values: Tuple[str, ...], extra: str = "") -> str:
+    parts = [n + '="' + str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", " ") + '"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Counter:
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(str(labels.get(n, "")) for n in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_label_text(self.labels, key)} {value}")
+        return lines
+
+
+class Histogram:
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = (), buckets: Sequence[float] = SECONDS_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [count per bucket (+Inf last), sum]
+        self._series: Dict[Tuple[str, ...], List[Any]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels.get(n, "")) for n in self.labels)
+        with self._lock:
+            series = self._series.setdefault(key, [[0] * (len(self.buckets) + 1), 0.0])
+            series[0][bisect.bisect_left(self.buckets, value)] += 1
+            series[1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (counts, total) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float("inf"),), counts):
+                    cumulative += count
+                    le = 'le="' + ("+Inf" if bound == float("inf") else repr(bound)) + '"'
+                    lines.append(f"{self.name}_bucket{_label_text(self.labels, key, le)} {cumulative}")
+                lines.append(f"{self.name}_sum{_label_text(self.labels, key)} {total}")
+                lines.append(f"{self.name}_count{_label_text(self.labels, key)} {cumulative}")
+        return lines
+
+
+_registry: List[Any] = []
+
+
+def counter(name: str, help_text: str, labels: Sequence[str] = ()) -> Counter:
+    metric = Counter(name, help_text, labels)
+    _registry.append(metric)
+    return metric
+
+
+def histogram(name: str, help_text: str, labels: Sequence[str] = (), buckets: Sequence[float] = SECONDS_BUCKETS) -> Histogram:
+    metric = Histogram(name, help_text, labels, buckets)
+    _registry.append(metric)
+    return metric
+
+
+def render_metrics() -> str:
+    return "\n".join(line for metric in _registry for line in metric.render()) + "\n"
+
+
+# ---------------- metrics shared by both services ---------------- #
+
+OPERATION_SECONDS = histogram("inda_operation_seconds", "Duration of requests, planner, DSL steps, LLM, embedding and Qdrant calls.", ("kind", "name"))
+ROWS = counter("inda_rows_total", "Rows going into and out of DSL steps.", ("name", "direction"))
+TOKENS = counter("inda_llm_tokens_total", "LLM tokens by type (prompt / completion).", ("type",))
+EMBEDDED_TEXTS = counter("inda_embedded_texts_total", "Texts sent to an embedding provider.", ("provider",))
+QDRANT_POINTS = counter("inda_qdrant_points_total", "Points read from or written to Qdrant.", ("name",))
+PAYLOAD_BYTES = counter("inda_qdrant_payload_bytes_total", "Approximate payload bytes read from or written to Qdrant.", ("name",))
+
+
+# ---------------- per-request timings ---------------- #
+
+_timings: ContextVar[Optional[List[Dict[str, Any]]]] = ContextVar("inda_timings", default=None)
+
+
+# collect the timed events of the current request (tasks started from it share the list)
+def start_timings() -> List[Dict[str, Any]]:
+    events: List[Dict[str, Any]] = []
+    _timings.set(events)
+    return events
+
+
+def record(kind: str, name: str, seconds: float, **fields):
+    OPERATION_SECONDS.observe(seconds, kind=kind, name=name)
+    if "rows_in" in fields and fields["rows_in"] is not None:
+        ROWS.inc(fields["rows_in"], name=name, direction="in")
+    if "rows_out" in fields and fields["rows_out"] is not None:
+        ROWS.inc(fields["rows_out"], name=name, direction="out")
+    for token_type in ("prompt", "completion"):
+        if fields.get(f"{token_type}_tokens"):
+            TOKENS.inc(fields[f"{token_type}_tokens"], type=token_type)
+    if kind == "embedding" and fields.get("texts"):
+        EMBEDDED_TEXTS.inc(fields["texts"], provider=name)
+    if kind == "qdrant":
+        if fields.get("points"):
+            QDRANT_POINTS.inc(fields["points"], name=name)
+        if fields.get("payload_bytes"):
+            PAYLOAD_BYTES.inc(fields["payload_bytes"], name=name)
+
+    events = _timings.get()
+    if events is not None:
+        events.append({"kind": kind, "name": name, "seconds": round(seconds, 4),
+                       **{k: v for k, v in fields.items() if v is not None}})
+
+
+# times the block; fields set on the yielded dict (rows_out, tokens, ...) are recorded with it
+@contextmanager
+def timed(kind: str, name: str, **fields):
+    started = time.perf_counter()
+    try:
+        yield fields
+    finally:
+        record(kind, name, time.perf_counter() - started, **fields)
+
+
+# per-request breakdown: totals per kind and the individual events in order
+def timings_summary(events: List[Dict[str, Any]]) -> Dict[str, Any]:
+    by_kind: Dict[str, Dict[str, float]] = {}
+    for e in events:
+        total = by_kind.setdefault(e["kind"], {"count": 0, "seconds": 0.0})
+        total["count"] += 1
+        total["seconds"] = round(total["seconds"] + e["seconds"], 4)
+    return {"by_kind": by_kind, "events": events}
+
+
+# approximate size of point payloads: utf-8 length of their values
+def payload_bytes(points) -> int:
+    size = 0
+    for p in points:
+        payload = getattr(p, "payload", None) if not isinstance(p, dict) else p.get("payload")
+        for value in (payload or {}).values():
+            size += len(str(value).encode("utf-8"))
+    return size
@@ -1,24 +1,111 @@
-from utils.config import QDRANT_URL, QDRANT_COLLECTION, debug_log
-from qdrant_client import QdrantClient
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, ALL_COMPLETED, FIRST_COMPLETED
+from typing import Any, Dict, List
+from utils.config import (
+    QDRANT_URL, QDRANT_PATH, QDRANT_COLLECTION, UPSERT_BATCH_SIZE, UPSERT_PARALLEL, QDRANT_STORAGE_PROFILE, SCROLL_PAGE_SIZE,
+    QDRANT_TIMEOUT_SECONDS, debug_log,
+)
+from utils.storage_profiles import search_params
+from utils.http_clients import pool_limits
+from utils.metrics import timed, payload_bytes
+from qdrant_client import QdrantClient, AsyncQdrantClient
+from qdrant_client.models import Batch, PointIdsList
 
-qdrant = QdrantClient(url=QDRANT_URL)
+# local mode: the storage can be opened by one client only, and that client is not thread safe.
+# the sync client is shared by the worker threads with one call at a time,
+# and the async client is a thin async facade over the same instance.
+class _SerializedClient:
+
+    def __init__(self, client: QdrantClient):
+        self._client = client
+        self._lock = threading.RLock()
+
+    def __getattr__(self, name):
+        attr = getattr(self._client, name)
+        if not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            with self._lock:
+                return attr(*args, **kwargs)
+        return call
+
+
+class _LocalAsyncClient:
+
+    def __init__(self, client: _SerializedClient):
+        self._client = client
+
+    def __getattr__(self, name):
+        attr = getattr(self._client, name)
+        if not callable(attr):
+            return attr
+
+        async def call(*args, **kwargs):
+            return attr(*args, **kwargs)
+        return call
+
+    # the sync client owns the storage, it is closed with it
+    async def close(self):
+        pass
+
+
+if QDRANT_PATH:
+    qdrant = _SerializedClient(QdrantClient(location=QDRANT_PATH) if QDRANT_PATH == ":memory:" else QdrantClient(path=QDRANT_PATH))
+    async_qdrant = _LocalAsyncClient(qdrant)
+else:
+    qdrant = QdrantClient(url=QDRANT_URL)
+
+    # used by the async query path, extra kwargs go to the pooled httpx client
+    async_qdrant = AsyncQdrantClient(url=QDRANT_URL, timeout=QDRANT_TIMEOUT_SECONDS, limits=pool_limits())
 
 SERVICE_HE_FIELD = "service_demended_hebrew"
+POINT_ID_COLUMN = "point_id"
 
 
-def search_points(vector, vector_name="service_vector", top_k=5):
+def search_points(vector, vector_name="service_vector", top_k=5, collection_name=QDRANT_COLLECTION, profile=QDRANT_STORAGE_PROFILE):
 
     print(f"QDRANT SEARCH vector='{vector_name}', limit={top_k}")
-    results = qdrant.search(
-        collection_name=QDRANT_COLLECTION,
-        query_vector=(vector_name, vector),
-        with_payload=True,
-        limit=top_k,
-    )
+    with timed("qdrant", "search", vector=vector_name) as m:
+        results = qdrant.search(
+            collection_name=collection_name,
+            query_vector=(vector_name, vector),
+            with_payload=True,
+            limit=top_k,
+            search_params=search_params(profile),
+        )
+        m.update(points=len(results), payload_bytes=payload_bytes(results))
     print(f"QDRANT Found {len(results)} results.")
     return results
 
 
+async def asearch_points(
+    vector, vector_name="service_vector", top_k=5, collection_name=QDRANT_COLLECTION, profile=QDRANT_STORAGE_PROFILE,
+    query_filter=None, score_threshold=None, offset=0, with_payload=True,
+):
+
+    print(f"QDRANT SEARCH vector='{vector_name}', limit={top_k}, offset={offset}, threshold={score_threshold}")
+    with timed("qdrant", "search", vector=vector_name) as m:
+        results = await async_qdrant.search(
+            collection_name=collection_name,
+            query_vector=(vector_name, vector),
+            query_filter=query_filter,
+            score_threshold=score_threshold,
+            offset=offset,
+            with_payload=with_payload,
+            limit=top_k,
+            search_params=search_params(profile),
+        )
+        m.update(points=len(results), payload_bytes=payload_bytes(results))
+    print(f"QDRANT Found {len(results)} results.")
+    return results
+
+
+# a scrolled point as a table row: its payload plus the point id, so later steps can go back to Qdrant
+def point_row(point) -> Dict[str, Any]:
+    return {**(point.payload or {}), POINT_ID_COLUMN: str(point.id)}
+
+
 def upsert_point(point_id, vector_dict, payload):
 
     print(f"QDRANT UPSERT id={point_id} vectors={list(vector_dict.keys())}")
@@ -35,6 +122,190 @@ def upsert_point(point_id, vector_dict, payload):
     print("UPSERT DONE")
 
 
+# write one batch of points in a single request, wait for qdrant to confirm it once
+def _upsert_batch(points: List[Dict[str, Any]]):
+    vector_names = points[0]["vector"].keys()
+    with timed("qdrant", "upsert", points=len(points), payload_bytes=payload_bytes(points)):
+        qdrant.upsert(
+            collection_name=QDRANT_COLLECTION,
+            points=Batch(
+                ids=[p["id"] for p in points],
+                vectors={name: [p["vector"][name] for p in points] for name in vector_names},
+                payloads=[p["payload"] for p in points],
+            ),
+            wait=True,
+        )
+
+
+# buffers points and writes them in batches, optionally from several workers in parallel
+class PointBuffer:
+
+    def __init__(self, batch_size: int = UPSERT_BATCH_SIZE, parallel: int = UPSERT_PARALLEL):
+        if batch_size < 1 or parallel < 1:
+            raise ValueError("batch_size and parallel must be >= 1")
+        self.batch_size = batch_size
+        self.parallel = parallel
+        self.failures: List[Dict[str, Any]] = []
+        self.written = 0
+        self._points: List[Dict[str, Any]] = []
+        self._batches = 0
+        self._pending = {}
+        self._executor = ThreadPoolExecutor(max_workers=parallel) if parallel > 1 else None
+
+    def add(self, point_id, vector_dict, payload):
+        self._points.append({"id": point_id, "vector": vector_dict, "payload": payload})
+        if len(self._points) >= self.batch_size:
+            self._submit()
+
+    def flush(self) -> List[Dict[str, Any]]:
+        if self._points:
+            self._submit()
+        self._collect(wait_all=True)
+        return self.failures
+
+    def close(self) -> List[Dict[str, Any]]:
+        failures = self.flush()
+        if self._executor:
+            self._executor.shutdown(wait=True)
+        return failures
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _submit(self):
+        points, self._points = self._points, []
+        self._batches += 1
+        batch_no = self._batches
+
+        if self._executor is None:
+            self._record(batch_no, points, _run_batch(points))
+            return
+
+        # keep at most `parallel` batches in flight so the buffer memory stays bounded
+        if len(self._pending) >= self.parallel:
+            self._collect(wait_all=False)
+        future = self._executor.submit(_run_batch, points)
+        self._pending[future] = (batch_no, points)
+
+    def _collect(self, wait_all: bool):
+        if not self._pending:
+            return
+        done, _ = wait(self._pending, return_when=ALL_COMPLETED if wait_all else FIRST_COMPLETED)
+        for future in done:
+            batch_no, points = self._pending.pop(future)
+            self._record(batch_no, points, future.result())
+
+    def _record(self, batch_no: int, points: List[Dict[str, Any]], error):
+        if error is None:
+            self.written += len(points)
+            debug_log(f"QDRANT BATCH {batch_no} upserted {len(points)} points")
+            return
+        print(f"QDRANT BATCH {batch_no} failed ({len(points)} points): {error}")
+        self.failures.append({
+            "batch": batch_no,
+            "count": len(points),
+            "ids": [p["id"] for p in points],
+            "error": str(error),
+        })
+
+
+def _run_batch(points: List[Dict[str, Any]]):
+    try:
+        _upsert_batch(points)
+        return None
+    except Exception as e:
+        return e
+
+
+# upsert many points in batches, returns the list of failed batches
+def upsert_points(points: List[Dict[str, Any]], batch_size: int = UPSERT_BATCH_SIZE, parallel: int = UPSERT_PARALLEL):
+
+    print(f"QDRANT BULK UPSERT {len(points)} points, batch_size={batch_size}, parallel={parallel}")
+    with PointBuffer(batch_size=batch_size, parallel=parallel) as buffer:
+        for p in points:
+            buffer.add(p["id"], p["vector"], p["payload"])
+    print(f"BULK UPSERT DONE written={buffer.written} failed_batches={len(buffer.failures)}")
+    return buffer.failures
+
+
+# content_hash stored in the payload of the given points, points that don't exist are left out
+def get_content_hashes(point_ids: List[str]) -> Dict[str, str]:
+    hashes = {}
+    for start in range(0, len(point_ids), 1000):
+        with timed("qdrant", "retrieve") as m:
+            records = qdrant.retrieve(
+                collection_name=QDRANT_COLLECTION,
+                ids=point_ids[start:start + 1000],
+                with_payload=["content_hash"],
+                with_vectors=False,
+            )
+            m.update(points=len(records))
+        for r in records:
+            if r.payload and r.payload.get("content_hash"):
+                hashes[str(r.id)] = r.payload["content_hash"]
+    return hashes
+
+
+# scan the whole collection page by page (a single scroll call stops at its limit)
+def scroll_points(query_filter=None, page_size: int = SCROLL_PAGE_SIZE, with_payload=True, collection_name=QDRANT_COLLECTION, with_vectors=False):
+    offset = None
+    while True:
+        with timed("qdrant", "scroll") as m:
+            points, offset = qdrant.scroll(
+                collection_name=collection_name,
+                scroll_filter=query_filter,
+                limit=page_size,
+                offset=offset,
+                with_payload=with_payload,
+                with_vectors=with_vectors,
+            )
+            m.update(points=len(points), payload_bytes=payload_bytes(points))
+        yield from points
+        if offset is None:
+            break
+
+
+async def ascroll_points(query_filter=None, page_size: int = SCROLL_PAGE_SIZE, with_payload=True, collection_name=QDRANT_COLLECTION, with_vectors=False):
+    offset = None
+    while True:
+        with timed("qdrant", "scroll") as m:
+            points, offset = await async_qdrant.scroll(
+                collection_name=collection_name,
+                scroll_filter=query_filter,
+                limit=page_size,
+                offset=offset,
+                with_payload=with_payload,
+                with_vectors=with_vectors,
+            )
+            m.update(points=len(points), payload_bytes=payload_bytes(points))
+        for p in points:
+            yield p
+        if offset is None:
+            break
+
+
+# ids of every point in the collection, scrolled page by page without payloads
+def iter_point_ids(page_size: int = 10000):
+    for p in scroll_points(page_size=page_size, with_payload=False):
+        yield p.id
+
+
+def delete_points(point_ids: List[str], batch_size: int = 1000) -> int:
+
+    print(f"QDRANT DELETE {len(point_ids)} points")
+    for start in range(0, len(point_ids), batch_size):
+        with timed("qdrant", "delete", points=len(point_ids[start:start + batch_size])):
+            qdrant.delete(
+                collection_name=QDRANT_COLLECTION,
+                points_selector=PointIdsList(points=point_ids[start:start + batch_size]),
+                wait=True,
+            )
+    return len(point_ids)
+
+
 def delete_collection():
 
     print(f"QDRANT DELETE Dropping collection {QDRANT_COLLECTION}")
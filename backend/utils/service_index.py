@@ -0,0 +1,130 @@
+import time
+import uuid
+import asyncio
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from qdrant_client.models import VectorParams, Distance, PointStruct
+from utils.config import QDRANT_COLLECTION, SNAPSHOT_VERSION_CHECK_SECONDS, SERVICE_MATCH_MARGIN, debug_log
+from utils.qdrant_utils import qdrant, scroll_points, ascroll_points, SERVICE_HE_FIELD
+from utils.dataset_version import aget_dataset_version
+from utils.embedding_utils import get_embeddings
+
+# one point per distinct service name, so resolving a service costs the number of services
+# and not the number of feedbacks. written by the indexing service, read by the query service.
+SERVICE_COLLECTION = f"{QDRANT_COLLECTION}_services"
+SERVICE_ID_NAMESPACE = uuid.UUID("5b0c7f0e-6f43-4c52-9a8e-2d7f3f1e9c21")
+
+
+def _service_point(name: str, vector) -> PointStruct:
+    return PointStruct(id=str(uuid.uuid5(SERVICE_ID_NAMESPACE, name)), vector=list(vector), payload={SERVICE_HE_FIELD: name})
+
+
+def _create_service_collection(size: int):
+    qdrant.recreate_collection(
+        collection_name=SERVICE_COLLECTION,
+        vectors_config=VectorParams(size=size, distance=Distance.COSINE),
+    )
+
+
+# add the services embedded during an ingest; existing names are overwritten with the same vector
+def update_service_index(service_vectors: Dict[str, list]):
+    if not service_vectors:
+        return
+    if not qdrant.collection_exists(SERVICE_COLLECTION):
+        rebuild_service_index()
+        return
+    points = [_service_point(name, vec) for name, vec in service_vectors.items()]
+    qdrant.upsert(collection_name=SERVICE_COLLECTION, points=points, wait=True)
+    debug_log(f"service index: {len(points)} services written")
+
+
+# rebuild from the distinct service names in the feedback collection. used the first time
+# (data ingested before the index existed) and after deletes, when services may have disappeared
+def rebuild_service_index() -> int:
+    names = sorted({
+        p.payload[SERVICE_HE_FIELD]
+        for p in scroll_points(with_payload=[SERVICE_HE_FIELD])
+        if p.payload and p.payload.get(SERVICE_HE_FIELD)
+    })
+    if not names:
+        return 0
+    vectors = get_embeddings(names, input_type="passage", use="service")
+    _create_service_collection(len(vectors[0]))
+    qdrant.upsert(
+        collection_name=SERVICE_COLLECTION,
+        points=[_service_point(name, vec) for name, vec in zip(names, vectors)],
+        wait=True,
+    )
+    print(f"service index rebuilt with {len(names)} services")
+    return len(names)
+
+
+# the service index as a normalized NumPy matrix, so a lookup is one matrix-vector product.
+# reloaded when the dataset version changes.
+class ServiceIndex:
+
+    def __init__(self, version_check_interval: float = SNAPSHOT_VERSION_CHECK_SECONDS):
+        self.version_check_interval = version_check_interval
+        self.version: Optional[int] = None
+        self.names: List[str] = []
+        self._matrix: Optional[np.ndarray] = None
+        self._checked_at = 0.0
+        self._lock = asyncio.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._matrix is not None and len(self.names) > 0
+
+    async def load(self):
+        version = await aget_dataset_version()
+        names, vectors = [], []
+        try:
+            async for p in ascroll_points(collection_name=SERVICE_COLLECTION, with_vectors=True):
+                if p.payload and p.payload.get(SERVICE_HE_FIELD) and p.vector:
+                    names.append(p.payload[SERVICE_HE_FIELD])
+                    vectors.append(p.vector)
+        except Exception as e:
+            debug_log(f"service index not available ({e})")
+            names, vectors = [], []
+
+        if vectors:
+            matrix = np.asarray(vectors, dtype=np.float32)
+            norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            self._matrix = matrix / norms
+        else:
+            self._matrix = None
+        self.names = names
+        self.version = version
+        self._checked_at = time.time()
+        debug_log(f"service index loaded: {len(names)} services, version {version}")
+
+    async def _refresh(self):
+        if self.version is not None and time.time() - self._checked_at < self.version_check_interval:
+            return
+        async with self._lock:
+            if self.version is not None and time.time() - self._checked_at < self.version_check_interval:
+                return
+            if self.version is None or await aget_dataset_version() != self.version:
+                await self.load()
+            self._checked_at = time.time()
+
+    # distinct services ordered by cosine similarity. services far below the best one are dropped,
+    # they would widen filter_by_service to unrelated services. None when there is no index to search.
+    async def search(self, vector, top_k: int = 3, margin: float = SERVICE_MATCH_MARGIN) -> Optional[List[Tuple[str, float]]]:
+        await self._refresh()
+        if not self.loaded:
+            return None
+        query = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if not norm:
+            return []
+        scores = self._matrix @ (query / norm)
+        k = min(top_k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        best = float(scores[top[0]])
+        return [(self.names[i], float(scores[i])) for i in top if scores[i] >= best - margin]
+
+
+service_index = ServiceIndex()
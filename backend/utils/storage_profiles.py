@@ -0,0 +1,83 @@
+from typing import Any, Dict, Optional, Union
+from qdrant_client.models import (
+    VectorParams,
+    Distance,
+    HnswConfigDiff,
+    ScalarQuantization,
+    ScalarQuantizationConfig,
+    ScalarType,
+    BinaryQuantization,
+    BinaryQuantizationConfig,
+    SearchParams,
+    QuantizationSearchParams,
+)
+from utils.config import HNSW_M, HNSW_EF_CONSTRUCT, HNSW_EF_SEARCH
+
+VECTOR_NAMES = ("text_vector", "service_vector")
+
+# how the vectors of the collection are stored:
+#   default - float32 vectors and HNSW graph in RAM
+#   on_disk - float32 vectors on disk (mmap), HNSW graph in RAM
+#   scalar  - int8 quantized copy in RAM, originals on disk for rescoring (~4x less RAM)
+#   binary  - 1 bit quantized copy in RAM, originals on disk for rescoring (~32x less RAM)
+STORAGE_PROFILES: Dict[str, Dict[str, Any]] = {
+    "default": {"on_disk": False, "quantization": None, "oversampling": None},
+    "on_disk": {"on_disk": True, "quantization": None, "oversampling": None},
+    "scalar": {"on_disk": True, "quantization": "scalar", "oversampling": 2.0},
+    "binary": {"on_disk": True, "quantization": "binary", "oversampling": 3.0},
+}
+
+
+def _profile(name: str) -> Dict[str, Any]:
+    if name not in STORAGE_PROFILES:
+        raise ValueError(f"unknown storage profile '{name}', expected one of {list(STORAGE_PROFILES)}")
+    return STORAGE_PROFILES[name]
+
+
+# `size` is one dimension for both vectors, or a dict of vector name -> dimension
+def vectors_config(profile: str, size: Union[int, Dict[str, int]]) -> Dict[str, VectorParams]:
+    on_disk = _profile(profile)["on_disk"]
+    sizes = size if isinstance(size, dict) else {name: size for name in VECTOR_NAMES}
+    return {
+        name: VectorParams(size=sizes[name], distance=Distance.COSINE, on_disk=on_disk)
+        for name in VECTOR_NAMES
+    }
+
+
+# extra arguments for create_collection / recreate_collection
+def collection_config(profile: str) -> Dict[str, Any]:
+    quantization = _profile(profile)["quantization"]
+    config: Dict[str, Any] = {"hnsw_config": HnswConfigDiff(m=HNSW_M, ef_construct=HNSW_EF_CONSTRUCT)}
+    if quantization == "scalar":
+        config["quantization_config"] = ScalarQuantization(
+            scalar=ScalarQuantizationConfig(type=ScalarType.INT8, quantile=0.99, always_ram=True)
+        )
+    elif quantization == "binary":
+        config["quantization_config"] = BinaryQuantization(binary=BinaryQuantizationConfig(always_ram=True))
+    return config
+
+
+# search params matching the profile: quantized profiles search the quantized vectors
+# with oversampling and rescore the candidates with the original vectors
+def search_params(profile: str) -> Optional[SearchParams]:
+    p = _profile(profile)
+    if p["quantization"] is None:
+        return SearchParams(hnsw_ef=HNSW_EF_SEARCH) if HNSW_EF_SEARCH else None
+    return SearchParams(
+        hnsw_ef=HNSW_EF_SEARCH or None,
+        quantization=QuantizationSearchParams(rescore=True, oversampling=p["oversampling"]),
+    )
+
+
+# rough RAM needed for the vectors of one point, without the HNSW graph
+def vector_ram_bytes(profile: str, size: Union[int, Dict[str, int]]) -> int:
+    p = _profile(profile)
+    sizes = size if isinstance(size, dict) else {name: size for name in VECTOR_NAMES}
+    total = 0
+    for dims in sizes.values():
+        total += 0 if p["on_disk"] else dims * 4
+        if p["quantization"] == "scalar":
+            total += dims
+        elif p["quantization"] == "binary":
+            total += dims // 8
+    return total
@@ -6,7 +6,8 @@ import { UniversalRenderer } from "./components/UniversalRenderer";
 const API_BASE =
   process.env.NEXT_PUBLIC_QUERY_SERVICE_URL ?? "http://localhost:8004";
 
-const INDEX_API = "http://localhost:8010/ingest_csv";
+const INDEX_BASE = "http://localhost:8010";
+const INDEX_API = `${INDEX_BASE}/ingest_csv`;
 
 export default function DSLChatPage() {
   const [question, setQuestion] = useState("");
@@ -14,12 +15,37 @@ export default function DSLChatPage() {
   const [plan, setPlan] = useState<any | null>(null);
   const [result, setResult] = useState<any | null>(null);
   const [error, setError] = useState<string | null>(null);
+  const [steps, setSteps] = useState<any[]>([]);
+  // תשובות ה-LLM בזמן יצירתן, לפי מספר הצעד (ענפים של תוכנית DAG עונים במקביל)
+  const [answerStreams, setAnswerStreams] = useState<Record<string, string>>({});
 
   // מצב להעלאת CSV
   const [csvStatus, setCsvStatus] = useState<string | null>(null);
   const [uploading, setUploading] = useState(false);
 
   // ====== שאילתת DSL ======
+  // התשובה מגיעה כ-Server-Sent Events: התוכנית, התקדמות הצעדים, ותשובת ה-LLM תוך כדי יצירה
+  const handleEvent = (event: string, data: any) => {
+    if (event === "plan") setPlan(data);
+    if (event === "step_start") {
+      setSteps((prev) => [...prev, { ...data, status: "running" }]);
+    }
+    if (event === "step_end") {
+      setSteps((prev) =>
+        prev.map((s) => (s.step === data.step ? { ...s, ...data, status: "done" } : s))
+      );
+    }
+    if (event === "token") {
+      const key = String(data.step ?? "");
+      setAnswerStreams((prev) => ({ ...prev, [key]: (prev[key] ?? "") + data.text }));
+    }
+    if (event === "result") {
+      setPlan(data.dsl);
+      setResult(data.result);
+    }
+    if (event === "error") setError(data.detail ?? "שגיאה במהלך הבקשה");
+  };
+
   const askQuestion = async () => {
     const trimmed = question.trim();
     if (!trimmed || loading) return;
@@ -28,19 +54,35 @@ export default function DSLChatPage() {
     setError(null);
     setResult(null);
     setPlan(null);
+    setSteps([]);
+    setAnswerStreams({});
 
     try {
-      const response = await fetch(`${API_BASE}/query`, {
+      const response = await fetch(`${API_BASE}/query/stream`, {
         method: "POST",
         headers: { "Content-Type": "application/json" },
         body: JSON.stringify({ question: trimmed }),
       });
 
-      if (!response.ok) throw new Error(`שגיאת שרת (${response.status})`);
+      if (!response.ok || !response.body) throw new Error(`שגיאת שרת (${response.status})`);
 
-      const data = await response.json();
-      setPlan(data.dsl);
-      setResult(data.result);
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = "";
+
+      while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        const messages = buffer.split("\n\n");
+        buffer = messages.pop() ?? "";
+        for (const message of messages) {
+          const event = message.match(/^event: (.*)$/m)?.[1];
+          const data = message.match(/^data: (.*)$/m)?.[1];
+          if (event && data) handleEvent(event, JSON.parse(data));
+        }
+      }
     } catch (err: any) {
       setError(err.message ?? "שגיאה במהלך הבקשה");
     } finally {
@@ -64,8 +106,27 @@ export default function DSLChatPage() {
 
       if (!res.ok) throw new Error(`שגיאת שרת (${res.status})`);
 
-      const data = await res.json();
-      setCsvStatus("✔ הקובץ נשלח ואינדקס הושלם בהצלחה!");
+      const { job_id } = await res.json();
+
+      // האינדוקס רץ ברקע, בודקים את סטטוס המשימה עד שהיא מסתיימת
+      while (true) {
+        await new Promise((r) => setTimeout(r, 2000));
+        const jobRes = await fetch(`${INDEX_BASE}/jobs/${job_id}`);
+        if (!jobRes.ok) throw new Error(`שגיאת שרת (${jobRes.status})`);
+        const job = await jobRes.json();
+
+        if (job.status === "done") {
+          setCsvStatus(`✔ האינדוקס הושלם בהצלחה! (${job.rows_done} שורות)`);
+          break;
+        }
+        if (job.status === "failed" || job.status === "cancelled") {
+          throw new Error(job.errors?.at(-1) ?? job.status);
+        }
+
+        const total = job.rows_total ? ` מתוך ${job.rows_total}` : "";
+        const eta = job.eta_seconds != null ? `, עוד כ־${Math.ceil(job.eta_seconds)} שניות` : "";
+        setCsvStatus(`מאנדקס... ${job.rows_done}${total} שורות${eta}`);
+      }
     } catch (err: any) {
       setCsvStatus("❌ שגיאה: " + err.message);
     } finally {
@@ -171,6 +232,42 @@ export default function DSLChatPage() {
           {loading ? "מריץ..." : "שלח"}
         </button>
 
+        {/* צעדי ה-DSL בלייב */}
+        {steps.length > 0 && (
+          <div className="mt-6 rounded-xl bg-slate-50 p-4 border border-slate-200 text-sm">
+            <h2 className="text-slate-700 font-semibold mb-2">⚙️ צעדים:</h2>
+            <ol className="space-y-1">
+              {steps.map((s) => (
+                <li key={s.step}>
+                  {s.status === "done" ? "✔" : "⏳"} {s.step}/{s.total} {s.fn}
+                  {s.rows != null && ` · ${s.rows} שורות`}
+                  {s.seconds != null && ` · ${s.seconds}s`}
+                </li>
+              ))}
+            </ol>
+          </div>
+        )}
+
+        {/* תשובת ה-LLM בזמן יצירתה */}
+        {!result &&
+          Object.entries(answerStreams).map(([step, text]) => {
+            const info = steps.find((s) => String(s.step) === step);
+            return (
+              <div key={step} className="mt-4">
+                {Object.keys(answerStreams).length > 1 && (
+                  <div className="text-xs text-gray-500 mb-1">
+                    {info ? `${info.id ?? info.step} · ${info.fn}` : step}
+                  </div>
+                )}
+                <pre className="p-3 bg-gray-100 rounded text-sm whitespace-pre-wrap overflow-x-auto">{text}</pre>
+              </div>
+            );
+          })}
+
+        {error && (
+          <div className="mt-4 p-3 rounded bg-red-50 border border-red-200 text-red-700">{error}</div>
+        )}
+
         {/* תוצאה */}
         {result && (
           <div className="mt-6 rounded-xl bg-slate-50 p-4 border border-slate-200">